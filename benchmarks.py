@@ -0,0 +1,286 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from datetime import datetime, timedelta
+from graph import Graph
+from hash_table import HashTable
+from nodes import Node
+from package_setup import PackageSetup
+from event_log import EventLog, EventLogReader
+from route_engine import RouteEngine
+from trucks import Truck
+
+# Scales every case runs at by default
+PACKAGE_SCALES = [40, 1000, 10000, 100000]
+LOCATION_SCALES = [27, 500, 5000]
+QUICK_PACKAGE_SCALES = [40, 1000]
+QUICK_LOCATION_SCALES = [27, 500]
+HUB = "Western Governors University"
+
+# Build a graph of random points in memory, straight-line distances already obey the triangle inequality
+def synthetic_graph(num_locations, seed=0):
+    rng = np.random.default_rng(seed)
+    points = rng.random((num_locations, 2)) * 20
+    graph = Graph()
+    graph.location_names = [HUB] + [f"Location {index}" for index in range(1, num_locations)]
+    graph.address_names = {f"{index} Synthetic St": name for index, name in enumerate(graph.location_names)}
+    graph.location_index = {name: index for index, name in enumerate(graph.location_names)}
+    graph.nodes = {name: Node(name) for name in graph.location_names}
+    difference = points[:, None, :] - points[None, :, :]
+    graph.direct_distance_matrix = np.ascontiguousarray(np.hypot(difference[..., 0], difference[..., 1]), dtype=graph.dtype)
+    graph.distance_matrix = graph.direct_distance_matrix
+    graph.next_hop = np.tile(np.arange(num_locations, dtype=np.intp), (num_locations, 1))
+    graph.route_engine = RouteEngine(graph.distance_matrix)
+    return graph
+
+# Write a package file with packages spread over the graph's locations, returns its path
+def synthetic_package_file(num_packages, graph, folder, seed=0):
+    rng = np.random.default_rng(seed)
+    addresses = list(graph.address_names)
+    path = os.path.join(folder, f"packages_{num_packages}.csv")
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["PackageID", "Address", "City", "State", "Zip", "Delivery Deadline", "Mass KILO", "Special Notes"])
+        for package_id in range(1, num_packages + 1):
+            address = addresses[1 + int(rng.integers(len(addresses) - 1))]
+            deadline = "10:30 AM" if rng.random() < 0.3 else "EOD"
+            writer.writerow([package_id, address, "Salt Lake City", "UT", "84111", deadline, int(rng.integers(1, 50)), ""])
+    return path
+
+# Load a synthetic package file into a PackageSetup
+def synthetic_package_setup(num_packages, graph, folder, seed=0):
+    path = synthetic_package_file(num_packages, graph, folder, seed)
+    return PackageSetup(path, address_names=graph.address_names)
+
+# Each case takes a scale and returns (run, ops), run is timed and does ops operations
+def case_hash_table_search(scale, folder):
+    table = HashTable.from_items((package_id, package_id) for package_id in range(scale))
+
+    def run():
+        for package_id in range(scale):
+            table.search(package_id)
+    return run, scale
+
+def case_update_package_status(scale, folder):
+    Truck.trucks.clear()
+    graph = synthetic_graph(27)
+    package_setup = synthetic_package_setup(scale, graph, folder)
+    package_ids = [package.package_id for package in package_setup]
+    # Load the packages on three trucks so every update goes through the truck lookup,
+    # one truck at the hub and two out on the route
+    for number in range(3):
+        truck = Truck(f"Truck {number + 1}", graph, [], package_setup.get_all_packages())
+        truck.sinks = []
+        truck.capacity = scale
+        truck.load_packages_by_id(package_ids[number::3])
+        truck.current_location = graph.location_names[number]
+    departure = datetime(2021, 7, 1, 8)
+
+    def run():
+        for package_id in package_ids:
+            package_setup.update_package_status(package_id, "IN TRANSIT", departure)
+    return run, scale
+
+def case_load_packages_by_id(scale, folder):
+    Truck.trucks.clear()
+    graph = synthetic_graph(27)
+    package_setup = synthetic_package_setup(scale, graph, folder)
+    truck = Truck("Truck 1", graph, [], package_setup.get_all_packages())
+    truck.sinks = []
+    truck.capacity = scale
+    package_ids = [package.package_id for package in package_setup]
+
+    def run():
+        truck.load_packages_by_id(package_ids)
+    return run, scale
+
+def case_start_delivery_route(scale, folder, improve=False):
+    graph = synthetic_graph(scale)
+    stops = set(graph.location_names[1:])
+
+    def run():
+        graph.start_delivery_route(stops, HUB, improve=improve)
+    return run, len(stops)
+
+def case_start_delivery_route_improved(scale, folder):
+    return case_start_delivery_route(scale, folder, improve=True)
+
+def case_deliver_packages(scale, folder):
+    Truck.trucks.clear()
+    # About four packages per stop, like today's manifest, with at most 2500 stops so the
+    # distance matrix fits in memory
+    graph = synthetic_graph(min(max(27, scale // 4), 2500))
+    package_setup = synthetic_package_setup(scale, graph, folder)
+    truck = Truck("Truck 1", graph, [], package_setup.get_all_packages())
+    truck.sinks = []
+    truck.stop_delay = 0
+    truck.update_delay = 0
+    truck.capacity = scale
+    truck.load_packages_by_id([package.package_id for package in package_setup])
+    _, truck.delivery_route = graph.start_delivery_route(truck.delivery_nodes, truck.current_location)
+
+    # Package #9's correction is left out, any truck carrying it would stop to ask about it
+    def run():
+        truck.deliver_packages(datetime(2021, 7, 1, 8), package_setup, {}, True, [0], truck.packages)
+    return run, scale
+
+# Three status changes per package (at the hub, in transit, delivered) spread over the day
+def synthetic_status_events(num_packages, seed=0):
+    rng = np.random.default_rng(seed)
+    start = datetime(2021, 7, 1, 8)
+    events = []
+    for package_id in range(1, num_packages + 1):
+        in_transit, delivered = sorted(rng.integers(60, 5 * 3600, size=2).tolist())
+        truck_id = f"Truck {package_id % 3 + 1}"
+        location = f"Location {package_id % 26 + 1}"
+        events.append((package_id, truck_id, "AT HUB", start, HUB))
+        events.append((package_id, truck_id, "IN TRANSIT", start + timedelta(seconds=in_transit), location))
+        events.append((package_id, truck_id, "DELIVERED", start + timedelta(seconds=delivered), location))
+    return events
+
+def case_event_log_append(scale, folder):
+    events = synthetic_status_events(scale)
+    location_index = synthetic_graph(27).location_index
+    path = os.path.join(folder, f"events_{scale}.log")
+
+    def run():
+        with EventLog(path, location_index) as log:
+            for event in events:
+                log.append(*event)
+    return run, len(events)
+
+# The same number of changes written the way the trucks write them: each truck's packages at
+# the hub and in transit as one batch each, then the deliveries a stop of four packages at a time
+def case_event_log_append_batch(scale, folder):
+    location_index = synthetic_graph(27).location_index
+    path = os.path.join(folder, f"batches_{scale}.log")
+    start = datetime(2021, 7, 1, 8)
+    trucks = {f"Truck {number + 1}": list(range(number + 1, scale + 1, 3)) for number in range(3)}
+
+    def run():
+        with EventLog(path, location_index) as log:
+            for truck_id, package_ids in trucks.items():
+                log.append_batch(package_ids, truck_id, "AT HUB", start, HUB)
+                log.append_batch(package_ids, truck_id, "IN TRANSIT", start + timedelta(minutes=5), "Location 1")
+                for stop, first in enumerate(range(0, len(package_ids), 4)):
+                    log.append_batch(package_ids[first:first + 4], truck_id, "DELIVERED", start + timedelta(minutes=5 + stop), f"Location {stop % 26 + 1}")
+    return run, 3 * scale
+
+def case_event_log_replay(scale, folder):
+    path = os.path.join(folder, f"replay_{scale}.log")
+    if os.path.exists(path):
+        os.remove(path)
+    with EventLog(path, synthetic_graph(27).location_index) as log:
+        for event in synthetic_status_events(scale):
+            log.append(*event)
+    when = datetime(2021, 7, 1, 10, 30)
+
+    # Open the log, rebuild every package's state at 10:30 and look up single packages
+    def run():
+        with EventLogReader(path) as reader:
+            reader.fleet_state(when)
+            for package_id in range(1, min(scale, 1000) + 1):
+                reader.package_state(package_id, when)
+    return run, scale
+
+# name -> (case, scales, quick scales)
+CASES = {
+    "hash_table_search": (case_hash_table_search, PACKAGE_SCALES, QUICK_PACKAGE_SCALES),
+    "update_package_status": (case_update_package_status, PACKAGE_SCALES, QUICK_PACKAGE_SCALES),
+    "load_packages_by_id": (case_load_packages_by_id, PACKAGE_SCALES, QUICK_PACKAGE_SCALES),
+    "start_delivery_route": (case_start_delivery_route, LOCATION_SCALES, QUICK_LOCATION_SCALES),
+    "start_delivery_route_improved": (case_start_delivery_route_improved, LOCATION_SCALES, QUICK_LOCATION_SCALES),
+    "deliver_packages": (case_deliver_packages, PACKAGE_SCALES, QUICK_PACKAGE_SCALES),
+    "event_log_append": (case_event_log_append, PACKAGE_SCALES, QUICK_PACKAGE_SCALES),
+    "event_log_append_batch": (case_event_log_append_batch, PACKAGE_SCALES, QUICK_PACKAGE_SCALES),
+    "event_log_replay": (case_event_log_replay, PACKAGE_SCALES, QUICK_PACKAGE_SCALES),
+}
+
+# Time one case at one scale, best of repeats, then measure its peak memory in one more run
+def measure(case, scale, repeats, folder):
+    best = None
+    for _ in range(repeats):
+        run, ops = case(scale, folder)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            run()
+            seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    # tracemalloc slows the run down, so memory is measured apart from the timing
+    run, ops = case(scale, folder)
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "peak_mb": peak / 1e6, "ops": ops, "ops_per_second": ops / best if best > 0 else float("inf")}
+
+# Run the cases and return the results as a JSON-ready dict
+def run_benchmarks(case_names=None, quick=False, repeats=3, sinks=None):
+    sinks = [print] if sinks is None else sinks
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for name in case_names or CASES:
+            case, scales, quick_scales = CASES[name]
+            for scale in (quick_scales if quick else scales):
+                result = dict(case=name, scale=scale, **measure(case, scale, repeats, folder))
+                results.append(result)
+                for sink in sinks:
+                    sink(f"{name:32} {scale:>7}  {result['seconds'] * 1000:10.2f} ms  {result['peak_mb']:8.2f} MB  {result['ops_per_second']:14,.0f} ops/s")
+    Truck.trucks.clear()
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "repeats": repeats,
+        "results": results,
+    }
+
+# Compare results with a baseline run, returns the cases that got slower by more than tolerance
+def find_regressions(report, baseline, tolerance=0.2):
+    baseline_seconds = {(result["case"], result["scale"]): result["seconds"] for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        before = baseline_seconds.get((result["case"], result["scale"]))
+        if before is not None and result["seconds"] > before * (1 + tolerance):
+            regressions.append(dict(result, baseline_seconds=before, slowdown=result["seconds"] / before))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark routing, loading, delivery, status updates and lookups")
+    parser.add_argument("cases", nargs="*", help=f"cases to run, all by default: {', '.join(CASES)}")
+    parser.add_argument("--quick", action="store_true", help="only run the small scales")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default="benchmark_results.json", help="where to save the results")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before a case counts as a regression")
+    args = parser.parse_args()
+    for name in args.cases:
+        if name not in CASES:
+            parser.error(f"unknown case {name}")
+
+    report = run_benchmarks(args.cases, args.quick, args.repeats)
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results saved to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = find_regressions(report, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression['case']} at {regression['scale']} took {regression['seconds'] * 1000:.2f} ms, "
+                  f"{regression['slowdown']:.2f}x the baseline {regression['baseline_seconds'] * 1000:.2f} ms")
+        if regressions:
+            sys.exit(1)
+        print("No regressions")
@@ -0,0 +1,133 @@
+import argparse
+import csv
+import os
+import numpy as np
+
+class CityGenerator:
+    # CityGenerator class to write synthetic cities and package manifests for scale testing
+    # Writes the same three files the program reads (addresses, distance table and package
+    # file) into a data folder. The same seed always gives the same files, and the city does
+    # not change when only the number of packages changes
+    hub_name = "Western Governors University"
+    hub_address = "4001 South 700 East"
+    street_names = ["Main", "State", "Oak", "Maple", "Canyon", "River", "Lake", "Hill", "Park", "Center",
+                    "Temple", "Highland", "Redwood", "Bangerter", "Wasatch", "Dalton", "Oakland", "Valley"]
+    city_names = ["Salt Lake City", "West Valley City", "Murray", "Millcreek", "Holladay", "Taylorsville",
+                  "South Salt Lake", "Midvale", "Cottonwood Heights", "West Jordan"]
+
+    def __init__(self, seed=0):
+        self.seed = seed
+        # Share of packages with each deadline and each kind of special note the loader understands
+        self.deadline_mix = {"9:00:00": 0.03, "10:30:00": 0.3, "EOD": 0.67}
+        self.note_mix = {"truck": 0.1, "delayed": 0.1, "together": 0.075, "wrong_address": 0.025}
+
+    # Separate random streams for the city and the manifest
+    def rng(self, stream):
+        return np.random.default_rng([self.seed, stream])
+
+    # Random points in a size x size mile square, either spread evenly or bunched into clusters
+    def generate_points(self, num_locations, layout="random", clusters=8, size=20.0):
+        rng = self.rng(0)
+        if layout == "random":
+            return rng.random((num_locations, 2)) * size
+        if layout == "clustered":
+            centers = rng.random((clusters, 2)) * size
+            spread = size / (4 * np.sqrt(clusters))
+            points = centers[rng.integers(clusters, size=num_locations)] + rng.normal(0, spread, (num_locations, 2))
+            return np.clip(points, 0, size)
+        raise ValueError(f"Unknown layout {layout}, use 'random' or 'clustered'")
+
+    # Names, street addresses, cities and zip codes of the locations, the hub first
+    def generate_locations(self, points):
+        rng = self.rng(1)
+        locations = [(self.hub_name, self.hub_address, "Salt Lake City", "84107")]
+        for index in range(1, len(points)):
+            street = self.street_names[int(rng.integers(len(self.street_names)))]
+            address = f"{index * 10 + int(rng.integers(10))} {street} St"
+            # Nearby locations share a city and zip code
+            x, y = points[index]
+            area = int(x // 5) * 4 + int(y // 5)
+            city = self.city_names[area % len(self.city_names)]
+            locations.append((f"Stop {index} {street}", address, city, f"84{100 + area % 100:03d}"))
+        return locations
+
+    # Write the addresses file: ID, location name and street address
+    def write_addresses(self, path, locations):
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["PackageId", "location_name", "Address"])
+            for index, (name, address, city, zip_code) in enumerate(locations):
+                writer.writerow([index, name, address])
+
+    # Write the distance table in the lower triangular layout, one row at a time
+    # Straight-line distances are rounded up to a tenth of a mile, which keeps the
+    # triangle inequality and never turns two different locations into a 0.0 (no edge)
+    def write_distance_table(self, path, locations, points):
+        num_locations = len(points)
+        with open(path, "w", newline="") as file:
+            file.write(",".join(["location_name"] + [name for name, *_ in locations]) + "\n")
+            for row in range(num_locations):
+                distances = np.hypot(*(points[:row + 1] - points[row]).T)
+                distances = np.maximum(np.ceil(np.round(distances * 10, 6)) / 10, 0.1)
+                distances[row] = 0.0
+                cells = ",".join(f"{distance:.1f}" for distance in distances.tolist())
+                file.write(f"{locations[row][0]},{cells}{',0.0' * (num_locations - row - 1)}\n")
+
+    # Write the package file with a realistic mix of deadlines, weights and special notes
+    def write_manifest(self, path, num_packages, locations):
+        rng = self.rng(2)
+        deadlines = list(self.deadline_mix)
+        deadline_choices = rng.choice(len(deadlines), size=num_packages, p=list(self.deadline_mix.values()))
+        stops = rng.integers(1, len(locations), size=num_packages) if len(locations) > 1 else np.zeros(num_packages, dtype=int)
+        # Most packages are light, a few are heavy
+        weights = np.clip(np.round(rng.lognormal(1.5, 0.9, size=num_packages)), 1, 88).astype(int)
+        kinds = list(self.note_mix) + [None]
+        chances = list(self.note_mix.values())
+        note_kinds = rng.choice(len(kinds), size=num_packages, p=chances + [1 - sum(chances)])
+        notes = {}
+        package_id = 1
+        while package_id <= num_packages:
+            kind = kinds[note_kinds[package_id - 1]]
+            if kind == "together" and package_id + 2 <= num_packages:
+                # Three packages that must ride together, each note names the other two
+                group = [package_id, package_id + 1, package_id + 2]
+                for member in group:
+                    others = [other for other in group if other != member]
+                    notes[member] = f"Must be delivered with {others[0]} & {others[1]}"
+                package_id += 3
+                continue
+            if kind == "truck":
+                notes[package_id] = "Can only be on truck 2"
+            elif kind == "delayed":
+                notes[package_id] = "Delayed on flight---will not arrive to depot until 9:05 am"
+            elif kind == "wrong_address":
+                notes[package_id] = "Wrong address listed"
+            package_id += 1
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["PackageID", "Address", "City", "State", "Zip", "deadline", "Weight", "special_notes"])
+            for index in range(num_packages):
+                name, address, city, zip_code = locations[int(stops[index])]
+                writer.writerow([index + 1, address, city, "UT", zip_code, deadlines[deadline_choices[index]], int(weights[index]), notes.get(index + 1, "None")])
+
+    # Write a whole city and manifest into folder/data, run the program from folder to use them
+    def generate(self, folder, num_locations, num_packages, layout="random"):
+        data_folder = os.path.join(folder, "data")
+        os.makedirs(data_folder, exist_ok=True)
+        points = self.generate_points(num_locations, layout)
+        locations = self.generate_locations(points)
+        self.write_addresses(os.path.join(data_folder, "WGUPS_Addresses.csv"), locations)
+        self.write_distance_table(os.path.join(data_folder, "WGUPS_Distance_Table.csv"), locations, points)
+        self.write_manifest(os.path.join(data_folder, "WGUPS_Package_File.csv"), num_packages, locations)
+        return data_folder
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic city and package manifest")
+    parser.add_argument("folder", help="the files are written to folder/data")
+    parser.add_argument("--locations", type=int, default=500)
+    parser.add_argument("--packages", type=int, default=10000)
+    parser.add_argument("--layout", choices=["random", "clustered"], default="random")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    data_folder = CityGenerator(args.seed).generate(args.folder, args.locations, args.packages, args.layout)
+    print(f"Wrote {args.locations} locations and {args.packages} packages to {data_folder}")
@@ -0,0 +1,19 @@
+import os
+import shutil
+import pytest
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+DATA_FILES = ("WGUPS_Addresses.csv", "WGUPS_Distance_Table.csv", "WGUPS_Package_File.csv")
+
+# The program reads its CSV files from data/ under the working directory, so tests that run
+# on today's files work in a folder that has them there
+@pytest.fixture
+def data_folder(tmp_path, monkeypatch):
+    source = os.path.join(REPO, "data") if os.path.isdir(os.path.join(REPO, "data")) else REPO
+    if not all(os.path.exists(os.path.join(source, name)) for name in DATA_FILES):
+        pytest.skip("today's CSV files are not in the repository")
+    os.makedirs(tmp_path / "data")
+    for name in DATA_FILES:
+        shutil.copy(os.path.join(source, name), tmp_path / "data" / name)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
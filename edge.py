@@ -2,6 +2,8 @@ import csv
 
 class Edge:
     # Edge class to represent a connection between two nodes
+    __slots__ = ("from_node", "to_node", "weight")
+
     def __init__(self, from_node, to_node, weight):
         # Setup the edge with a from_node, to_node, and weight
         self.from_node = from_node
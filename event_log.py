@@ -0,0 +1,255 @@
+import mmap
+import os
+import struct
+from datetime import datetime, timedelta
+import numpy as np
+
+# Timestamps count whole seconds from here on the program's own clock, so no time zone is involved
+EPOCH = datetime(1970, 1, 1)
+SECOND = timedelta(seconds=1)
+
+class EventLog:
+    # EventLog class to keep every package status change on disk as an append-only binary log
+    # The file is a 16 byte header followed by fixed-width 24 byte records of package ID,
+    # truck number, status code, timestamp (whole seconds since 1970-01-01), location index
+    # and run number. Every EventLog opened on a file starts the next run, so the days run
+    # into the same file stay apart. Records are only ever added at the end, through a write
+    # buffer, one at a time or a batch per stop. Reading maps the file into memory and views
+    # it as a numpy array, so any package's state or the whole fleet's state at a time is a
+    # couple of binary searches
+    magic = b"WGUPSLOG"
+    version = 2
+    header = struct.Struct("<8sII")
+    record = struct.Struct("<ihhqii")
+    record_dtype = np.dtype([("package_id", "<i4"), ("truck", "<i2"), ("status", "<i2"), ("seconds", "<i8"), ("location", "<i4"), ("run", "<i4")])
+    # Status codes are part of the file format, new statuses may only be added at the end
+    statuses = ["AT THE HUB", "AT HUB", "IN TRANSIT", "DELIVERED"]
+    status_codes = {status: code for code, status in enumerate(statuses)}
+
+    # Open a log for appending as a new run, writing the header if the file is new
+    # location_index (location name -> index, e.g. the graph's) turns location names into indexes
+    def __init__(self, path, location_index=None, buffer_size=1 << 20):
+        self.path = path
+        self.location_index = location_index if location_index is not None else {}
+        self.buffer_size = buffer_size
+        self.buffer = bytearray()
+        self.pack = self.record.pack
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.file = open(path, "a+b")
+        try:
+            self.run = self.open_run()
+        except ValueError:
+            self.file.close()
+            raise
+        # Truck ID -> truck number, e.g. "Truck 3" -> 3 (0 for no truck)
+        self.truck_numbers = {}
+
+    # Get the file ready for the next run's records, returns the run number (1 for a new log)
+    def open_run(self):
+        header = self.header.pack(self.magic, self.version, self.record.size)
+        size = self.file.seek(0, os.SEEK_END)
+        if size < len(header):
+            self.file.seek(0)
+            # A crash while a new log's header was written leaves part of it, start the log again
+            if not header.startswith(self.file.read(size)):
+                raise ValueError(f"{self.path} is not a version {self.version} event log")
+            os.ftruncate(self.file.fileno(), 0)
+            self.file.write(header)
+            self.file.flush()
+            return 1
+        self.check_header(self.path)
+        # A record cut short by a crash is dropped so new records start on a record boundary
+        torn = (size - len(header)) % self.record.size
+        if torn:
+            size -= torn
+            os.ftruncate(self.file.fileno(), size)
+        if size == len(header):
+            return 1
+        self.file.seek(size - self.record.size)
+        return self.record.unpack(self.file.read(self.record.size))[-1] + 1
+
+    # Make sure an existing file is a log this version can append to
+    @classmethod
+    def check_header(cls, path):
+        with open(path, "rb") as file:
+            data = file.read(cls.header.size)
+        if len(data) < cls.header.size:
+            raise ValueError(f"{path} is not a version {cls.version} event log")
+        magic, version, record_size = cls.header.unpack(data)
+        if magic != cls.magic or version != cls.version or record_size != cls.record.size:
+            raise ValueError(f"{path} is not a version {cls.version} event log")
+
+    # Get the small number stored for a truck ID
+    def truck_number(self, truck_id):
+        number = self.truck_numbers.get(truck_id)
+        if number is None:
+            digits = str(truck_id or "").rsplit(" ", 1)[-1]
+            number = int(digits) if digits.isdigit() else 0
+            self.truck_numbers[truck_id] = number
+        return number
+
+    # Add one status change, when is a datetime
+    def append(self, package_id, truck_id, status, when, location_name=None):
+        self.buffer += self.pack(package_id, self.truck_number(truck_id), self.status_codes[status],
+                                 (when - EPOCH) // SECOND, self.location_index.get(location_name, -1), self.run)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    # Add the status changes of one stop at once, statuses is one status for every package or one per package
+    # The fields the records share are worked out once. A few records are packed one by one,
+    # more are filled in as a numpy array since setting one up costs about as much as 30 packs
+    def append_batch(self, package_ids, truck_id, statuses, when, location_name=None):
+        truck = self.truck_number(truck_id)
+        seconds = (when - EPOCH) // SECOND
+        location = self.location_index.get(location_name, -1)
+        status_codes = self.status_codes
+        codes = [status_codes[statuses]] * len(package_ids) if isinstance(statuses, str) else [status_codes[status] for status in statuses]
+        if len(package_ids) < 32:
+            pack = self.pack
+            buffer = self.buffer
+            for package_id, code in zip(package_ids, codes):
+                buffer += pack(package_id, truck, code, seconds, location, self.run)
+        else:
+            records = np.empty(len(package_ids), dtype=self.record_dtype)
+            records["package_id"] = package_ids
+            records["truck"] = truck
+            records["status"] = codes
+            records["seconds"] = seconds
+            records["location"] = location
+            records["run"] = self.run
+            self.buffer += records.tobytes()
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    # Add many records at once from an array with the fields of record_dtype, they are stored in this run
+    def append_records(self, records):
+        records = np.array(records, dtype=self.record_dtype)
+        records["run"] = self.run
+        self.flush()
+        self.file.write(records.tobytes())
+
+    # Write the buffered records to the file
+    def flush(self):
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+class EventLogReader:
+    # EventLogReader class to replay an event log without reading it into memory
+    # The records are a numpy view over the memory-mapped file. The first query sorts their
+    # positions by package and time once, after that each lookup is a binary search
+    # Pass location_names (index -> name, e.g. the graph's) to get location names back
+    # Only one run is replayed, the last one unless run is given
+    def __init__(self, path, location_names=None, run=None):
+        EventLog.check_header(path)
+        self.path = path
+        self.location_names = location_names
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        # A record cut short by a crash is left out
+        count = (size - EventLog.header.size) // EventLog.record.size
+        if count > 0:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            records = np.frombuffer(self.map, dtype=EventLog.record_dtype, count=count, offset=EventLog.header.size)
+        else:
+            self.map = None
+            records = np.zeros(0, dtype=EventLog.record_dtype)
+        self.all_records = records
+        self.run = int(records["run"][-1]) if run is None and count > 0 else run
+        # Runs follow each other in the file, so a run's records are one slice of it
+        if self.run is not None:
+            runs = records["run"]
+            records = records[np.searchsorted(runs, self.run, side="left"):np.searchsorted(runs, self.run, side="right")]
+        self.records = records
+        self.order = None
+
+    # Get the numbers of the runs in the log
+    def runs(self):
+        return np.unique(self.all_records["run"]).tolist()
+
+    # Sort the record positions by package, then time, then position in the file
+    def build_order(self):
+        if self.order is None:
+            self.order = np.lexsort((np.arange(len(self.records)), self.records["seconds"], self.records["package_id"]))
+            self.sorted_package_ids = self.records["package_id"][self.order]
+            self.sorted_seconds = self.records["seconds"][self.order]
+        return self.order
+
+    # Turn a datetime (or seconds since 1970-01-01) into seconds, None means the end of the log
+    def seconds(self, when):
+        if when is None:
+            return np.iinfo(np.int64).max
+        return (when - EPOCH) // SECOND if isinstance(when, datetime) else int(when)
+
+    # Turn records into dicts of the packages' states
+    def states(self, records):
+        statuses = EventLog.statuses
+        location_names = self.location_names
+        return [{
+            "package_id": package_id,
+            "truck": f"Truck {truck}" if truck else None,
+            "status": statuses[status],
+            "time": EPOCH + timedelta(seconds=seconds),
+            "location": location_names[location] if location_names is not None and location >= 0 else location,
+        } for package_id, truck, status, seconds, location, _ in records.tolist()]
+
+    # Get the state of a package at a time (its last change at or before it), None if it had none yet
+    def package_state(self, package_id, when=None):
+        order = self.build_order()
+        start = np.searchsorted(self.sorted_package_ids, package_id, side="left")
+        end = np.searchsorted(self.sorted_package_ids, package_id, side="right")
+        position = start + np.searchsorted(self.sorted_seconds[start:end], self.seconds(when), side="right") - 1
+        if position < start:
+            return None
+        return self.states(self.records[order[position:position + 1]])[0]
+
+    # Get the state of every package at a time, package ID -> state
+    def fleet_state(self, when=None):
+        order = self.build_order()
+        candidates = np.flatnonzero(self.sorted_seconds <= self.seconds(when))
+        if len(candidates) == 0:
+            return {}
+        package_ids = self.sorted_package_ids[candidates]
+        # The last candidate of each package is its latest change
+        last = candidates[np.append(package_ids[1:] != package_ids[:-1], True)]
+        return {state["package_id"]: state for state in self.states(self.records[order[last]])}
+
+    # Get every change of a package in time order as (time, status)
+    def history(self, package_id):
+        order = self.build_order()
+        start = np.searchsorted(self.sorted_package_ids, package_id, side="left")
+        end = np.searchsorted(self.sorted_package_ids, package_id, side="right")
+        return [(state["time"], state["status"]) for state in self.states(self.records[order[start:end]])]
+
+    def __len__(self):
+        return len(self.records)
+
+    def close(self):
+        # Drop the views before closing the map they point into
+        self.records = self.all_records = self.sorted_package_ids = self.sorted_seconds = self.order = None
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
@@ -0,0 +1,52 @@
+import heapq
+
+class EventScheduler:
+    # EventScheduler class to run events from all trucks on one virtual clock
+    # Pending events sit in a heap ordered by time, so scheduling and taking the
+    # next event both cost O(log E). Events at the same time run in the order
+    # they were scheduled
+    def __init__(self):
+        # Heap of (time, sequence, kind, truck, details) tuples
+        self.pending = []
+        self.sequence = 0
+        # Current virtual time, the time of the last event that ran
+        self.clock = None
+        # Functions that handle each kind of event
+        self.handlers = {}
+        # Every event that ran, in global time order
+        self.events = []
+        # Functions called with every event after it runs, e.g. to show progress
+        self.listeners = []
+
+    # Register the function that handles a kind of event
+    def on(self, kind, handler):
+        self.handlers[kind] = handler
+
+    # Register a function to call with every event after it runs
+    def listen(self, listener):
+        self.listeners.append(listener)
+
+    # Schedule an event of the given kind at the given time
+    def schedule(self, time, kind, truck=None, **details):
+        heapq.heappush(self.pending, (time, self.sequence, kind, truck, details))
+        self.sequence += 1
+
+    # Check if there are events left to run
+    def empty(self):
+        return not self.pending
+
+    # Run events in time order until none are left or the next one is after until
+    def run(self, until=None):
+        while self.pending:
+            if until is not None and self.pending[0][0] > until:
+                break
+            time, _, kind, truck, details = heapq.heappop(self.pending)
+            self.clock = time
+            event = {"time": time, "kind": kind, "truck_id": truck.truck_id if truck else None}
+            event.update(details)
+            # The handler may add details to the event and schedule new events
+            self.handlers[kind](event, truck)
+            self.events.append(event)
+            for listener in self.listeners:
+                listener(event)
+        return self.events
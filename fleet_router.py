@@ -0,0 +1,105 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from queue import Queue
+import numpy as np
+from graph import Graph
+
+# Graph each worker process routes on, attached to the shared distance matrix once per worker
+worker_graph = None
+worker_memory = None
+
+# Attach a worker to the shared distance matrix and build a graph around it
+def init_worker(memory_name, shape, dtype, location_names, exact_route_threshold):
+    global worker_graph, worker_memory
+    worker_memory = shared_memory.SharedMemory(name=memory_name)
+    distance_matrix = np.ndarray(shape, dtype=dtype, buffer=worker_memory.buf)
+    # Nothing in a worker may change the shared matrix
+    distance_matrix.flags.writeable = False
+    worker_graph = route_graph(distance_matrix, location_names, exact_route_threshold)
+
+# Build a graph that can only route, around an existing distance matrix
+def route_graph(distance_matrix, location_names, exact_route_threshold):
+    graph = Graph(dtype=distance_matrix.dtype)
+    graph.location_names = list(location_names)
+    graph.location_index = {name: index for index, name in enumerate(graph.location_names)}
+    graph.distance_matrix = distance_matrix
+    graph.route_engine.distance_matrix = distance_matrix
+    graph.exact_route_threshold = exact_route_threshold
+    return graph
+
+# Route one truck, returns (truck ID, total distance, route stops, mileage before and after local search)
+def route_job(job, graph=None):
+    truck_id, delivery_nodes, current_location, improve, mode, time_budget = job
+    graph = graph if graph is not None else worker_graph
+    total_distance, delivery_route = graph.start_delivery_route(delivery_nodes, current_location, improve=improve, mode=mode, time_budget=time_budget)
+    return truck_id, total_distance, list(delivery_route.queue), graph.last_route_mileage
+
+class FleetRouter:
+    # FleetRouter class to build the routes of many trucks on a pool of processes
+    # The distance matrix is copied once into shared memory and every worker maps it
+    # read-only, so a job only sends the truck's stops. Every route is built by the same
+    # Graph.start_delivery_route code as a serial run, so the results are identical.
+    # With workers=0 the jobs run one after another in this process
+    def __init__(self, graph, workers=None, improve=False, mode="nearest", time_budget=None):
+        self.graph = graph
+        # Number of worker processes, None for one per CPU
+        self.workers = workers
+        self.improve = improve
+        self.mode = mode
+        # Seconds of local search allowed per truck, None for no limit
+        self.time_budget = time_budget
+        self.memory = None
+        self.pool = None
+        # truck ID -> (mileage before, mileage after) local search of the last routes
+        self.route_mileage = {}
+
+    # Copy the distance matrix into shared memory and start the workers
+    def start(self):
+        if self.pool is not None or self.workers == 0:
+            return
+        matrix = np.ascontiguousarray(self.graph.distance_matrix)
+        self.memory = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+        shared = np.ndarray(matrix.shape, dtype=matrix.dtype, buffer=self.memory.buf)
+        shared[...] = matrix
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                        initargs=(self.memory.name, matrix.shape, matrix.dtype.str, self.graph.location_names, self.graph.exact_route_threshold))
+
+    # Stop the workers and free the shared memory
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        if self.memory is not None:
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    # Build the route of every truck
+    # trucks maps truck ID to (delivery nodes, current location), returns truck ID -> (total distance, delivery route Queue)
+    def route(self, trucks):
+        # Sort the stops so every job sees them in the same order however the set was built
+        jobs = [(truck_id, sorted(delivery_nodes), current_location, self.improve, self.mode, self.time_budget)
+                for truck_id, (delivery_nodes, current_location) in trucks.items()]
+        if self.workers == 0:
+            results = [route_job(job, self.graph) for job in jobs]
+        else:
+            self.start()
+            # map keeps the job order, so results come back in the order the trucks were given
+            results = list(self.pool.map(route_job, jobs))
+        routes = {}
+        self.route_mileage = {}
+        for truck_id, total_distance, stops, route_mileage in results:
+            delivery_route = Queue()
+            for stop in stops:
+                delivery_route.put(stop)
+            routes[truck_id] = (total_distance, delivery_route)
+            self.route_mileage[truck_id] = route_mileage
+        return routes
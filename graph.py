@@ -1,18 +1,37 @@
 import csv
-import networkx as nx
+import numpy as np
 from nodes import Node
 from edge import Edge
+from route_engine import RouteEngine
 from queue import Queue
-import sys
+from time import perf_counter
 
 class Graph:
-    def __init__(self):
+    def __init__(self, dtype=np.float64):
         # Setup the graph with empty data structures
         self.location_names = []
         self.adjacency_matrix = []
+        # Map each location name to its row/column in the distance matrix
+        self.location_index = {}
+        # Map each street address to its location name
+        self.address_names = {}
+        # Contiguous symmetric distance matrix built from the adjacency matrix
+        self.dtype = dtype
+        self.distance_matrix = np.zeros((0, 0), dtype=dtype)
+        # Distances exactly as listed in the CSV, before the shortest path closure
+        self.direct_distance_matrix = np.zeros((0, 0), dtype=dtype)
+        # next_hop[i, j] is the location to drive to first on the shortest path from i to j
+        self.next_hop = np.zeros((0, 0), dtype=np.intp)
+        self.route_engine = RouteEngine(self.distance_matrix)
+        # Mileage of the last route before and after local search, None when it was not improved
+        self.last_route_mileage = None
+        # Largest number of distinct stops routed exactly in "auto" mode
+        self.exact_route_threshold = 16
         self.nodes = {}
-        self.edges = []
-        self.graph = nx.Graph()
+        # Edge objects of the graph, only built when something asks for self.edges
+        self.edge_list = None
+        # networkx copy of the graph, only built when something asks for self.graph
+        self.networkx_graph = None
 
     # Setup/Take the location names in the CSV files and store them
     def setup_location_name_data(self):
@@ -25,6 +44,61 @@ class Graph:
             for entry in names_reader:
                 # choose to append location name [1] since it is in the second column
                 self.location_names.append(entry[1]) 
+                self.address_names[entry[2]] = entry[1]
+
+    # Setup the location names, distances, nodes and edges reading each CSV file once
+    # Pass a SnapshotCache to load the parsed and closed distance matrices from a binary
+    # snapshot instead, the snapshot is rebuilt whenever the CSV files change
+    def setup(self, cache=None):
+        sources = ("data/WGUPS_Addresses.csv", "data/WGUPS_Distance_Table.csv")
+        key = cache.key(sources, np.dtype(self.dtype).str) if cache is not None else None
+        snapshot = cache.load("graph", key) if cache is not None else None
+        if snapshot is not None:
+            self.load_snapshot(*snapshot)
+        else:
+            self.location_names = []
+            self.setup_location_name_data()
+            # One node per location name, like load_nodes
+            self.nodes = {name: Node(name) for name in self.location_names}
+            self.location_names = list(self.nodes.keys())
+            # Manually add any missing nodes
+            for node in ["Western Governors University"]:
+                if node not in self.nodes:
+                    self.nodes[node] = Node(node)
+                    self.location_names.append(node)
+            self.setup_location_distance_data()
+            if cache is not None:
+                cache.save("graph", key, self.snapshot_arrays(), {"location_names": self.location_names, "address_names": self.address_names})
+        # The Edge objects are built from the adjacency matrix the first time self.edges is used
+        self.edge_list = None
+        self.networkx_graph = None
+
+    # Get the adjacency matrix as a square NumPy array, distances exactly as listed in the CSV
+    def adjacency_array(self):
+        num_locations = len(self.location_names)
+        adjacency = np.zeros((num_locations, num_locations), dtype=np.float64)
+        for row_index, row in enumerate(self.adjacency_matrix[:num_locations]):
+            values = row[:num_locations]
+            adjacency[row_index, :len(values)] = values
+        return adjacency
+
+    # Get the arrays saved in a graph snapshot
+    def snapshot_arrays(self):
+        return {"adjacency": self.adjacency_array(), "direct_distance_matrix": self.direct_distance_matrix,
+                "distance_matrix": self.distance_matrix, "next_hop": self.next_hop}
+
+    # Restore the graph from the arrays and data of a snapshot
+    def load_snapshot(self, arrays, data):
+        self.location_names = data["location_names"]
+        self.address_names = data["address_names"]
+        self.location_index = {name: index for index, name in enumerate(self.location_names)}
+        self.nodes = {name: Node(name) for name in self.location_names}
+        # The matrices stay memory-mapped, pages are read from disk as they are used
+        self.adjacency_matrix = arrays["adjacency"]
+        self.direct_distance_matrix = arrays["direct_distance_matrix"]
+        self.distance_matrix = arrays["distance_matrix"]
+        self.next_hop = arrays["next_hop"]
+        self.route_engine = RouteEngine(self.distance_matrix)
 
     # Setup/Take distance data from the CSV file and store them
     def setup_location_distance_data(self):
@@ -59,6 +133,75 @@ class Graph:
         for row in self.adjacency_matrix:
             if len(row) < num_locations:
                 row.extend([0.0] * (num_locations - len(row)))
+        # Rebuild the name to index map and the NumPy distance matrix
+        self.build_distance_matrix()
+
+    # Build the location index map and the contiguous distance matrix
+    def build_distance_matrix(self):
+        # Map every location name to its index for O(1) lookups
+        self.location_index = {name: index for index, name in enumerate(self.location_names)}
+        num_locations = len(self.location_names)
+        matrix = np.zeros((num_locations, num_locations), dtype=self.dtype)
+        # Copy the adjacency matrix rows into the square array
+        for row_index, row in enumerate(self.adjacency_matrix[:num_locations]):
+            values = row[:num_locations]
+            matrix[row_index, :len(values)] = values
+        # The CSV only fills the lower triangle and distances are equal in both
+        # directions, so mirror missing cells and keep the shorter of two listed ones
+        matrix[matrix <= 0] = np.inf
+        matrix = np.minimum(matrix, matrix.T)
+        matrix[np.isinf(matrix)] = 0.0
+        self.direct_distance_matrix = np.ascontiguousarray(matrix)
+        # Replace every distance with the true shortest distance between the locations
+        self.close_distance_matrix()
+        # Point the route engine at the new matrix
+        self.route_engine = RouteEngine(self.distance_matrix)
+
+    # Close the distance matrix with the Algorithm: Floyd-Warshall
+    # Missing cells get the length of the shortest multi-stop path and direct hops that
+    # are longer than a detour are shortened, so the matrix obeys the triangle inequality
+    def close_distance_matrix(self):
+        matrix = self.direct_distance_matrix.astype(np.float64)
+        size = len(matrix)
+        # A zero between different locations means there is no direct edge
+        matrix[matrix <= 0] = np.inf
+        np.fill_diagonal(matrix, 0.0)
+        # Start with every reachable location being its own next hop
+        next_hop = np.where(np.isfinite(matrix), np.arange(size), -1).astype(np.intp)
+        via = np.empty_like(matrix)
+        shorter = np.empty(matrix.shape, dtype=bool)
+        for k in range(size):
+            # Distance from every i to every j when driving through k
+            np.add(matrix[:, k, None], matrix[None, k, :], out=via)
+            # Only take the detour when it is really shorter, so ties keep the direct hop
+            np.less(via + 1e-9, matrix, out=shorter)
+            np.copyto(matrix, via, where=shorter)
+            np.copyto(next_hop, next_hop[:, k, None], where=shorter)
+        # Locations that still cannot be reached keep the "no edge" zero
+        matrix[np.isinf(matrix)] = 0.0
+        self.distance_matrix = np.ascontiguousarray(matrix, dtype=self.dtype)
+        self.next_hop = next_hop
+
+    # Get the locations on the shortest path between two locations, including both ends
+    def shortest_path(self, from_node, to_node):
+        from_index = self.location_index.get(from_node)
+        to_index = self.location_index.get(to_node)
+        if from_index is None or to_index is None or self.next_hop[from_index, to_index] < 0:
+            return []
+        # Follow the next hop table until the destination is reached
+        path = [from_node]
+        while from_index != to_index:
+            from_index = int(self.next_hop[from_index, to_index])
+            path.append(self.location_names[from_index])
+        return path
+
+    # Get the index of a location name in the distance matrix
+    def index_of(self, location_name):
+        return self.location_index.get(location_name)
+
+    # Get the distances from one location index to an array of location indexes
+    def distances(self, from_idx, to_idx_array):
+        return self.distance_matrix[from_idx, np.asarray(to_idx_array, dtype=np.intp)]
 
     # Setup the nodes hash table
     def setup_nodes_hash_table(self):
@@ -75,25 +218,26 @@ class Graph:
                 self.nodes[node] = Node(node)
                 # Ensure it's added to location_names
                 self.location_names.append(node)  
-        # Add edges to the graph to the adjacency matrix
-        self.add_edges_from_adjacency_matrix()
+        # Make sure the index map covers any manually added nodes
+        self.build_distance_matrix()
+        # The Edge objects are built from the adjacency matrix the first time self.edges is used
+        self.edge_list = None
+        self.networkx_graph = None
 
-    # Calculate the distance between two nodes using the adjacency matrix
+    # Calculate the distance between two nodes using the distance matrix
     def distance_between(self, from_node, to_node):
-        # Find the index of the nodes in the location names list 
-        try:
-            from_index = self.location_names.index(from_node)
-        except ValueError:
+        # Find the index of the nodes in the location index map
+        from_index = self.location_index.get(from_node)
+        if from_index is None:
             print(f"Error: '{from_node}' not found in location_names")
             return None
-        # Find the index of the nodes in the location names list
-        try:
-            to_index = self.location_names.index(to_node)
-        except ValueError:
+        # Find the index of the nodes in the location index map
+        to_index = self.location_index.get(to_node)
+        if to_index is None:
             print(f"Error: '{to_node}' not found in location_names")
             return None
-        # Get the distance from the adjacency matrix
-        distance = self.adjacency_matrix[from_index][to_index]
+        # Get the distance from the distance matrix
+        distance = float(self.distance_matrix[from_index, to_index])
         # Return the distance
         return distance
     
@@ -119,73 +263,125 @@ class Graph:
                 nodes[location] = Node(location)
         return nodes
 
+    # Edge objects of the graph, built from the adjacency matrix the first time they are used
+    # Every node's edges are filled in at the same time
+    @property
+    def edges(self):
+        if self.edge_list is None:
+            self.add_edges_from_adjacency_matrix()
+        return self.edge_list
+
     def add_edges_from_adjacency_matrix(self):
+        if self.edge_list is None:
+            self.edge_list = []
         # Add edges to the graph based on the adjacency matrix
         for from_index, from_vertex in enumerate(self.location_names):
-            for to_index, distance in enumerate(self.adjacency_matrix[from_index]):
-                if distance > 0:
-                    from_node = self.nodes[from_vertex]
-                    to_node = self.nodes[self.location_names[to_index]]
-                    edge = Edge(from_node, to_node, distance)
-                    self.edges.append(edge)
-                    # Add edge to the from_node
-                    from_node.edges.append(edge)  
-                    # Add reverse edge
-                    reverse_edge = Edge(to_node, from_node, distance)
-                    self.edges.append(reverse_edge)
-                    # Add reverse edge to the to_node
-                    to_node.edges.append(reverse_edge)  
-                    self.graph.add_edge(from_vertex, self.location_names[to_index], weight=distance)
+            row = np.asarray(self.adjacency_matrix[from_index], dtype=np.float64)
+            # Only visit the cells that hold a distance
+            for to_index in np.flatnonzero(row > 0).tolist():
+                distance = float(row[to_index])
+                from_node = self.nodes[from_vertex]
+                to_node = self.nodes[self.location_names[to_index]]
+                edge = Edge(from_node, to_node, distance)
+                self.edge_list.append(edge)
+                # Add edge to the from_node
+                from_node.edges.append(edge)  
+                # Add reverse edge
+                reverse_edge = Edge(to_node, from_node, distance)
+                self.edge_list.append(reverse_edge)
+                # Add reverse edge to the to_node
+                to_node.edges.append(reverse_edge)  
+        # The networkx copy no longer matches the edges
+        self.networkx_graph = None
+
+    # networkx copy of the graph, built from the adjacency matrix the first time it is used
+    # networkx is only imported here so the core never pays for it
+    @property
+    def graph(self):
+        if self.networkx_graph is None:
+            self.networkx_graph = self.to_networkx()
+        return self.networkx_graph
+
+    # Export the locations and the distances listed in the CSV as a networkx Graph
+    def to_networkx(self):
+        import networkx as nx
+        graph = nx.Graph()
+        adjacency = self.adjacency_array()
+        # Same order as the adjacency matrix rows, so a distance listed twice keeps the last one like before
+        from_indexes, to_indexes = np.nonzero(adjacency > 0)
+        names = self.location_names
+        graph.add_weighted_edges_from((names[from_index], names[to_index], float(adjacency[from_index, to_index]))
+                                      for from_index, to_index in zip(from_indexes.tolist(), to_indexes.tolist()))
+        return graph
 
     # Calculate the distance between two locations
     def calculate_distance(self, location1, location2):
         return self.distance_between(location1, location2)
 
     # Start the delivery route using the Algorithm: Nearest Neighbor
-    def start_delivery_route(self, delivery_nodes, current_location):
-        # Setup the current node as the starting location
-        current_node = current_location
+    # Set improve to run 2-opt/Or-opt local search on the nearest neighbor route.
+    # With mode "auto", routes with at most exact_threshold distinct stops (never more than the
+    # route engine's max_exact_stops) are solved exactly with Held-Karp and larger ones fall back
+    # to the nearest neighbor heuristic
+    # time_budget limits the local search to about that many seconds, keeping the best route found so far
+    def start_delivery_route(self, delivery_nodes, current_location, improve=False, mode="nearest", exact_threshold=None, time_budget=None):
         # Create a queue to store the delivery route
         delivery_route = Queue()
-        # Setup the total distance to 0
-        total_distance = 0
-        # Convert the list of delivery nodes to a set for faster lookup
-        nodes_remaining = set(delivery_nodes)
-            
-        # Loop until all nodes have been visited
-        while nodes_remaining:
-            # Find the edges for the current node
-            edges = next((node.edges for node in self.nodes.values() if node.value == current_node), None)
-            # If no edges are found for the current node, print an error message and return default values
-            if edges is None:
-                print(f"Error: No node found with name {current_node}")
-                # Return default values to avoid crashing
-                return 0, delivery_route  
-            
-            # Setup the shortest distance to a very large number
-            shortest_distance = sys.maxsize
-            next_node_for_delivery_route = None
-            # Iterate over the edges to find the nearest neighbor
-            for edge in edges:
-                if edge.to_node.value in nodes_remaining:
-                    if float(edge.weight) < shortest_distance:
-                        shortest_distance = float(edge.weight)
-                        next_node_for_delivery_route = [edge.to_node.value, edge.weight]
-            
-            # If no valid next node is found, print an error message and return default values
-            if next_node_for_delivery_route is None:
-                print(f"Error: No valid next node found from {current_node}. Check the graph for connectivity issues.")
+        # Find the matrix index of the starting location
+        start_index = self.location_index.get(current_location)
+        # If the starting location is unknown, print an error message and return default values
+        if start_index is None:
+            print(f"Error: No node found with name {current_location}")
+            # Return default values to avoid crashing
+            return 0, delivery_route
+
+        # Convert the delivery nodes to matrix indexes
+        stop_indexes = []
+        for location_name in set(delivery_nodes):
+            stop_index = self.location_index.get(location_name)
+            if stop_index is None:
+                print(f"Error: No node found with name {location_name}")
                 # Return default values to avoid crashing
-                return 0, delivery_route  
+                return 0, delivery_route
+            stop_indexes.append(stop_index)
 
-            # Move to the next closest node
-            current_node = next_node_for_delivery_route[0]
-            # Remove the current node from the set of remaining nodes
-            nodes_remaining.discard(current_node)
-            # Add the distance to the total distance
-            total_distance += shortest_distance
-            # Add the next node to the delivery route
-            delivery_route.put(next_node_for_delivery_route)
+        if exact_threshold is None:
+            exact_threshold = self.exact_route_threshold
+        # Larger exact routes would need gigabytes of memory, they use the heuristic instead
+        exact_threshold = min(exact_threshold, self.route_engine.max_exact_stops)
+        hub_index = self.location_index.get("Western Governors University")
+        # Small routes get the provably shortest hub to hub loop
+        if mode == "auto" and hub_index is not None and len(stop_indexes) <= exact_threshold:
+            order, _ = self.route_engine.held_karp(start_index, stop_indexes, hub_index)
+            legs = None if order is None else self.route_engine.leg_distances(start_index, order)
+            # Local search cannot improve an exact route
+            improve = False
+        # Otherwise let the route engine pick the nearest remaining stop at every step
+        else:
+            order, legs = self.route_engine.nearest_neighbor(start_index, stop_indexes)
+        # If no valid next node is found, print an error message and return default values
+        if order is None:
+            print(f"Error: No valid next node found from {current_location}. Check the graph for connectivity issues.")
+            # Return default values to avoid crashing
+            return 0, delivery_route
+
+        # Improve the nearest neighbor route and keep the mileage before and after in last_route_mileage
+        self.last_route_mileage = None
+        if improve and len(order) > 1:
+            before = float(legs.sum()) + self.return_to_hub(self.location_names[order[-1]])
+            deadline = perf_counter() + time_budget if time_budget is not None else None
+            order = self.route_engine.improve(start_index, order, hub_index, deadline=deadline)
+            legs = self.route_engine.leg_distances(start_index, order)
+            after = float(legs.sum()) + self.return_to_hub(self.location_names[order[-1]])
+            self.last_route_mileage = (before, after)
+
+        # Add each stop and its leg distance to the delivery route
+        total_distance = 0
+        current_node = current_location
+        for stop_index, distance in zip(order, legs):
+            current_node = self.location_names[stop_index]
+            total_distance += float(distance)
+            delivery_route.put([current_node, float(distance)])
 
         # Add the return trip to the hub
         return_distance = self.return_to_hub(current_node)
@@ -194,17 +390,46 @@ class Graph:
         # Return the total distance and the delivery route
         return total_distance, delivery_route
 
+    # Repair a route that is already being driven instead of building it again
+    # Stops in remove_nodes are taken out and every stop in add_nodes is put where it adds the
+    # least distance, so each change costs one pass over the remaining stops. The queue is
+    # changed in place while holding its lock, a reader never sees half a route
+    # Returns the change in the remaining route's miles
+    def repair_route(self, delivery_route, current_location, add_nodes=(), remove_nodes=()):
+        hub_index = self.location_index.get("Western Governors University")
+        for location_name in [current_location, *add_nodes, *remove_nodes]:
+            if self.location_index.get(location_name) is None:
+                print(f"Error: No node found with name {location_name}")
+                return 0.0
+        with delivery_route.mutex:
+            # The path runs from the current location through the remaining stops back to the hub
+            path = [self.location_index[current_location]] + [self.location_index[stop[0]] for stop in delivery_route.queue]
+            if len(path) == 1 or path[-1] != hub_index:
+                path.append(hub_index)
+            before = self.route_engine.path_length(path)
+            removed = {self.location_index[location_name] for location_name in remove_nodes}
+            path = [path[0]] + [stop_index for stop_index in path[1:-1] if stop_index not in removed] + [path[-1]]
+            for location_name in add_nodes:
+                stop_index = self.location_index[location_name]
+                if stop_index in path[1:]:
+                    continue
+                position, _ = self.route_engine.cheapest_insertion(path, stop_index)
+                path.insert(position, stop_index)
+            legs = self.route_engine.leg_distances(path[0], path[1:])
+            delivery_route.queue.clear()
+            delivery_route.queue.extend([self.location_names[stop_index], float(distance)] for stop_index, distance in zip(path[1:], legs))
+        return self.route_engine.path_length(path) - before
+
     # Return to the hub from the current node
     def return_to_hub(self, current_node):
         hub_node = "Western Governors University"        
         # Check if the current node is already the hub
         if current_node == hub_node:
             return 0.0
-        # Find the edge weight from the current node to the hub
-        for node in self.nodes.values():
-            if node.value == current_node:
-                for edge in node.edges:
-                    if edge.to_node.value == hub_node:
-                        return float(edge.weight)
+        # Find the distance from the current node to the hub
+        from_index = self.location_index.get(current_node)
+        hub_index = self.location_index.get(hub_node)
+        if from_index is not None and hub_index is not None and self.distance_matrix[from_index, hub_index] > 0:
+            return float(self.distance_matrix[from_index, hub_index])
         # Raise an error if no path is found from the current node to the hub
         raise ValueError(f"No path found from {current_node} to the hub")
\ No newline at end of file
@@ -1,38 +1,157 @@
-from typing import Any, List, Tuple, Optional
+from typing import Any, Iterable, Iterator, List, Tuple, Optional
+
+# Markers for slots that were never used and slots whose key was removed
+_EMPTY = object()
+_DELETED = object()
+
+class HashTableView:
+    # HashTableView class to iterate over a HashTable's keys, values or items without copying them
+    def __init__(self, table: "HashTable", kind: str):
+        self.table = table
+        self.kind = kind
+
+    # Walk the slots of the table lazily
+    def __iter__(self) -> Iterator[Any]:
+        keys = self.table.slot_keys
+        values = self.table.slot_values
+        for index in range(len(keys)):
+            key = keys[index]
+            if key is _EMPTY or key is _DELETED:
+                continue
+            if self.kind == "keys":
+                yield key
+            elif self.kind == "values":
+                yield values[index]
+            else:
+                yield (key, values[index])
+
+    # Get the number of entries in the table
+    def __len__(self) -> int:
+        return len(self.table)
+
+    # Check if a key (or key-value pair for items) is in the table
+    def __contains__(self, item: Any) -> bool:
+        if self.kind == "keys":
+            return item in self.table
+        if self.kind == "items":
+            key, value = item
+            return key in self.table and self.table.search(key) == value
+        return any(value == item for value in self)
+
+    def __repr__(self) -> str:
+        return f"HashTableView({self.kind}, {list(self)})"
 
 class HashTable:
     # HashTable class to store key-value pairs
-    def __init__(self, size: int = 40):
-        # Setup with size and t table to store key-value pairs
-        self.size = size
-        self.table: List[List[Tuple[Any, Any]]] = [[] for _ in range(size)]
+    # Uses open addressing with linear probing: every key lives directly in a slot of
+    # one flat list, so a lookup walks neighboring slots instead of chasing bucket lists.
+    # The table doubles once it is fuller than load_factor, so lookups stay O(1)
+    def __init__(self, size: int = 40, load_factor: float = 0.7, items: Optional[Iterable[Tuple[Any, Any]]] = None):
+        # Setup with the number of slots (rounded up to a power of two) and the load factor
+        if not 0 < load_factor < 1:
+            raise ValueError("load_factor must be between 0 and 1")
+        self.load_factor = load_factor
+        self.size = 8
+        while self.size < size:
+            self.size *= 2
+        # log2 of the number of slots, used by the hash function
+        self.bits = self.size.bit_length() - 1
+        self.slot_keys: List[Any] = [_EMPTY] * self.size
+        self.slot_values: List[Any] = [None] * self.size
+        # Number of keys stored and number of slots holding a removed key
+        self.count = 0
+        self.deleted = 0
+        # Bulk insert any starting key-value pairs
+        if items is not None:
+            self.update(items)
+
+    # Build a HashTable from key-value pairs, sized up front for the number of pairs
+    @classmethod
+    def from_items(cls, items: Iterable[Tuple[Any, Any]], load_factor: float = 0.7) -> "HashTable":
+        items = list(items)
+        table = cls(size=int(len(items) / load_factor) + 1, load_factor=load_factor)
+        table.update(items)
+        return table
 
     # Hash function to calculate the index of the key
     def _hash(self, key: Any) -> int:
         if isinstance(key, list):
             # Convert list to string representation
-            key = str(key)  
-        return hash(key) % self.size
+            key = str(key)
+        # Multiply by a large odd constant (Fibonacci hashing) so consecutive keys spread out
+        return ((hash(key) * 11400714819323198485) & 0xFFFFFFFFFFFFFFFF) >> (64 - self.bits)
+
+    # Find the slot holding the key, or -1 if the key is not in the table
+    def _find_slot(self, key: Any) -> int:
+        if isinstance(key, list):
+            key = str(key)
+        index = self._hash(key)
+        mask = self.size - 1
+        while True:
+            slot_key = self.slot_keys[index]
+            if slot_key is _EMPTY:
+                return -1
+            if slot_key is not _DELETED and slot_key == key:
+                return index
+            index = (index + 1) & mask
+
+    # Rebuild the slots at the new size (dropping removed-key markers) and put every key back in
+    def _resize(self, new_size: int):
+        old_keys = self.slot_keys
+        old_values = self.slot_values
+        self.size = new_size
+        self.bits = new_size.bit_length() - 1
+        self.slot_keys = [_EMPTY] * new_size
+        self.slot_values = [None] * new_size
+        self.count = 0
+        self.deleted = 0
+        for key, value in zip(old_keys, old_values):
+            if key is not _EMPTY and key is not _DELETED:
+                self.insert(key, value)
 
     # Search for a key in the HashTable
     def search(self, key: Any) -> Optional[Any]:
-        # Calculate the index of the key
-        index = self._hash(key)
-        for k, v in self.table[index]:
-            if key == k:
-                return v
-        return None
+        # Calculate the slot of the key
+        index = self._find_slot(key)
+        if index < 0:
+            return None
+        return self.slot_values[index]
 
     # Insert a key-value pair into the HashTable
     def insert(self, key: Any, value: Any):
+        if isinstance(key, list):
+            key = str(key)
+        # Grow before the table gets too full to probe quickly
+        if (self.count + self.deleted + 1) > self.size * self.load_factor:
+            self._resize(self.size * 2 if self.count + 1 > self.size * self.load_factor / 2 else self.size)
         index = self._hash(key)
-        # If the key exists, update the value
-        for i, (k, v) in enumerate(self.table[index]):
-            if key == k:
-                self.table[index][i] = (key, value)
+        mask = self.size - 1
+        reuse = -1
+        while True:
+            slot_key = self.slot_keys[index]
+            if slot_key is _EMPTY:
+                break
+            if slot_key is _DELETED:
+                # Remember the first removed slot so it can be reused
+                if reuse < 0:
+                    reuse = index
+            elif slot_key == key:
+                # If the key exists, update the value
+                self.slot_values[index] = value
                 return
-        # If the key doesn't exist, append the key-value pair
-        self.table[index].append((key, value))
+            index = (index + 1) & mask
+        # If the key doesn't exist, store it in the first free slot
+        if reuse >= 0:
+            index = reuse
+            self.deleted -= 1
+        self.slot_keys[index] = key
+        self.slot_values[index] = value
+        self.count += 1
+
+    # Insert many key-value pairs
+    def update(self, items: Iterable[Tuple[Any, Any]]):
+        for key, value in items:
+            self.insert(key, value)
 
     # Calculate the hash index for a given input
     def calculate_hash_index(self, input):
@@ -43,23 +162,10 @@ class HashTable:
             pre_mod_hash += ord(c)
         # Return the caculated hash index
         return pre_mod_hash % self.size
-    
-    # Add a Key-Value pair to the Hash_Table
+
+    # Add a Key-Value pair to the Hash_Table, overwriting the value if the key exists
     def add(self, key, val):
-        # Calculate the hash value for the key(/value pair) to add
-        hash_index = self.calculate_hash_index(key)
-        value = (key, val)
-        # If the key doesn't exist in the table yet, add it
-        if not self.table[hash_index]:
-            self.table[hash_index].append(value)
-        else:
-            for i, (k, v) in enumerate(self.table[hash_index]):
-                # If the key is the same, overwrite the value
-                if k == key:
-                    self.table[hash_index][i] = value
-                    return
-            # If the key is not the same, append it to the list
-            self.table[hash_index].append(value)
+        self.insert(key, val)
 
     # Get the value of a key from the Hash_Table
     def get(self, key: Any) -> Optional[Any]:
@@ -71,45 +177,44 @@ class HashTable:
 
     # Get item from the Hash_Table
     def __getitem__(self, key: Any) -> Optional[Any]:
-        result = self.search(key)
-        if result is None:
+        index = self._find_slot(key)
+        if index < 0:
             raise KeyError(f"Key {key} not found in HashTable")
-        return result
+        return self.slot_values[index]
 
     # Check if a key is in the Hash_Table
     def __contains__(self, key: Any) -> bool:
-        return self.search(key) is not None
+        return self._find_slot(key) >= 0
+
+    # Get the number of keys in the Hash_Table
+    def __len__(self) -> int:
+        return self.count
+
+    # Iterate over the keys of the Hash_Table
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.keys())
 
     # Get the keys from the Hash_Table
-    def keys(self) -> List[Any]:
-        # Create a list to store the keys
-        keys_list = []
-        # Iterate through the table and append the keys
-        for bucket in self.table:
-            for k, _ in bucket:
-                # Append the key to the list
-                keys_list.append(k)
-        # Return the list of keys
-        return keys_list
+    def keys(self) -> HashTableView:
+        return HashTableView(self, "keys")
+
+    # Get the values from the Hash_Table
+    def values(self) -> HashTableView:
+        return HashTableView(self, "values")
 
     # Lists of items for the Hash_Table
-    def items(self) -> List[Tuple[Any, Any]]:
-        items_list = []
-        # Iterate through the table and append the key-value pairs
-        for bucket in self.table:
-            for k, v in bucket:
-                items_list.append((k, v))
-        # Return the list of key-value pairs
-        return items_list
-    
+    def items(self) -> HashTableView:
+        return HashTableView(self, "items")
+
     # Remove a key from the Hash_Table
     def remove(self, key: Any):
-        # Calculate the index of the key
-        index = self._hash(key)
-        # Iterate through the bucket and remove the key-value pair
-        for i, (k, v) in enumerate(self.table[index]):
-            if key == k:
-                del self.table[index][i]
-                return
+        # Calculate the slot of the key
+        index = self._find_slot(key)
         # If the key is not found, raise
-        raise KeyError(f"Key {key} not found in HashTable")
\ No newline at end of file
+        if index < 0:
+            raise KeyError(f"Key {key} not found in HashTable")
+        # Leave a marker so probes for later keys keep going past this slot
+        self.slot_keys[index] = _DELETED
+        self.slot_values[index] = None
+        self.count -= 1
+        self.deleted += 1
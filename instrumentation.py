@@ -0,0 +1,208 @@
+import functools
+import json
+from time import perf_counter
+
+class NullSpan:
+    # NullSpan class returned by span() while instrumentation is off, does nothing
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_SPAN = NullSpan()
+
+class Span:
+    # Span class to time a block of code with "with instrumentation.span(name):"
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.instrumentation.record(self.name, perf_counter() - self.start)
+        return False
+
+class Instrumentation:
+    # Instrumentation class to time the hot paths and count what they do
+    # The functions to measure are registered as targets. Turning instrumentation on
+    # swaps each of them for a timing wrapper and turning it off puts the original back,
+    # so while it is off the code runs exactly as if there were no instrumentation
+    def __init__(self):
+        self.enabled = False
+        # span name -> [calls, total seconds, longest seconds]
+        self.spans = {}
+        # counter name -> count
+        self.counters = {}
+        # (owner, attribute, span name, counter name) of every function to wrap
+        self.targets = []
+        # (owner, attribute) of HashTable-style _find_slot functions whose probes are counted
+        self.probe_targets = []
+        # (owner, attribute, original) of the functions currently wrapped
+        self.originals = []
+        self.default_targets_added = False
+
+    # Register a function to measure, span times it and counter counts its calls (either may be None)
+    def add_target(self, owner, attribute, span=None, counter=None):
+        self.targets.append((owner, attribute, span, counter))
+        # Targets added while on are wrapped straight away
+        if self.enabled:
+            self.wrap_target(owner, attribute, span, counter)
+
+    # Register a slot lookup function (like HashTable._find_slot) to count its probes
+    def add_probe_target(self, owner, attribute):
+        self.probe_targets.append((owner, attribute))
+        if self.enabled:
+            self.wrap_hash_probes(owner, attribute)
+
+    # Turn instrumentation on, wrapping every target
+    def enable(self):
+        if self.enabled:
+            return
+        if not self.default_targets_added:
+            self.add_default_targets()
+        self.enabled = True
+        for owner, attribute, span, counter in self.targets:
+            self.wrap_target(owner, attribute, span, counter)
+        for owner, attribute in self.probe_targets:
+            self.wrap_hash_probes(owner, attribute)
+
+    # Turn instrumentation off and put the original functions back
+    def disable(self):
+        for owner, attribute, original in reversed(self.originals):
+            setattr(owner, attribute, original)
+        self.originals = []
+        self.enabled = False
+
+    # Forget every recorded span and counter
+    def reset(self):
+        self.spans.clear()
+        self.counters.clear()
+
+    # Time a block of code, costs one attribute check while instrumentation is off
+    def span(self, name):
+        return Span(self, name) if self.enabled else NULL_SPAN
+
+    # Add to a counter
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    # Add one timed call to a span
+    def record(self, name, seconds):
+        stats = self.spans.get(name)
+        if stats is None:
+            self.spans[name] = [1, seconds, seconds]
+        else:
+            stats[0] += 1
+            stats[1] += seconds
+            if seconds > stats[2]:
+                stats[2] = seconds
+
+    # Swap a function for a wrapper that times it and counts its calls
+    def wrap_target(self, owner, attribute, span, counter):
+        original = owner.__dict__[attribute]
+        counters = self.counters
+        record = self.record
+
+        @functools.wraps(original)
+        def wrapper(*args, **kwargs):
+            if counter is not None:
+                counters[counter] = counters.get(counter, 0) + 1
+            if span is None:
+                return original(*args, **kwargs)
+            start = perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                record(span, perf_counter() - start)
+
+        self.originals.append((owner, attribute, original))
+        setattr(owner, attribute, wrapper)
+
+    # Count the slots a HashTable lookup visits, found keys cost their distance from the home slot plus one
+    def wrap_hash_probes(self, owner, attribute):
+        original = owner.__dict__[attribute]
+        counters = self.counters
+
+        @functools.wraps(original)
+        def wrapper(table, key):
+            index = original(table, key)
+            counters["hash_lookups"] = counters.get("hash_lookups", 0) + 1
+            if index >= 0:
+                probes = ((index - table._hash(str(key) if isinstance(key, list) else key)) & (table.size - 1)) + 1
+                counters["hash_probes"] = counters.get("hash_probes", 0) + probes
+            else:
+                counters["hash_misses"] = counters.get("hash_misses", 0) + 1
+            return index
+
+        self.originals.append((owner, attribute, original))
+        setattr(owner, attribute, wrapper)
+
+    # Register the hot paths of the delivery program
+    def add_default_targets(self):
+        # Imported here so importing instrumentation never pulls in the whole program
+        from graph import Graph
+        from hash_table import HashTable
+        from package_setup import PackageSetup
+        from trucks import Truck
+        self.default_targets_added = True
+        self.add_target(PackageSetup, "setup_packages_from_csv", span="csv.packages")
+        self.add_target(Graph, "setup_location_name_data", span="csv.location_names")
+        self.add_target(Graph, "setup_location_distance_data", span="csv.distance_table")
+        self.add_target(Graph, "close_distance_matrix", span="graph.close_distance_matrix")
+        self.add_target(Graph, "add_edges_from_adjacency_matrix", span="graph.add_edges")
+        self.add_target(Graph, "start_delivery_route", span="route.build", counter="routes_built")
+        self.add_target(Graph, "distance_between", counter="distance_lookups")
+        self.add_target(Truck, "load_packages_by_id", span="truck.load_packages")
+        self.add_target(Truck, "deliver_packages", span="truck.deliver_packages")
+        self.add_target(Truck, "deliver_at_stop", span="truck.deliver_at_stop", counter="stops_delivered")
+        self.add_target(PackageSetup, "update_package_status", span="package.update_status", counter="status_updates")
+        self.add_target(PackageSetup, "update_statuses", span="package.update_statuses", counter="status_batches")
+        self.add_probe_target(HashTable, "_find_slot")
+
+    # Get the spans and counters as a JSON-ready dict
+    def to_dict(self):
+        return {
+            "spans": {name: {"calls": calls, "total_seconds": total, "mean_seconds": total / calls, "max_seconds": longest}
+                      for name, (calls, total, longest) in sorted(self.spans.items())},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    # Get the spans and counters in the Prometheus text format
+    def to_prometheus(self, prefix="wgups"):
+        lines = [f"# TYPE {prefix}_span_calls_total counter",
+                 f"# TYPE {prefix}_span_seconds_total counter",
+                 f"# TYPE {prefix}_span_seconds_max gauge"]
+        for name, (calls, total, longest) in sorted(self.spans.items()):
+            lines.append(f'{prefix}_span_calls_total{{span="{name}"}} {calls}')
+            lines.append(f'{prefix}_span_seconds_total{{span="{name}"}} {total:.9f}')
+            lines.append(f'{prefix}_span_seconds_max{{span="{name}"}} {longest:.9f}')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    # Get a text table of the spans, slowest first, and the counters
+    def summary(self):
+        lines = [f"{'span':32} {'calls':>8} {'total ms':>10} {'mean ms':>10} {'max ms':>10}"]
+        for name, (calls, total, longest) in sorted(self.spans.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:32} {calls:>8} {total * 1000:>10.2f} {total / calls * 1000:>10.3f} {longest * 1000:>10.3f}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:32} {value:>8}")
+        return "\n".join(lines)
+
+    # Save the spans and counters, as JSON for a .json path and in the Prometheus text format otherwise
+    def export(self, path):
+        with open(path, "w") as file:
+            if path.endswith(".json"):
+                json.dump(self.to_dict(), file, indent=2)
+            else:
+                file.write(self.to_prometheus())
+
+# Shared instance used by the program
+instrumentation = Instrumentation()
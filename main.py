@@ -1,44 +1,74 @@
 # Ashley Pilger Student ID:011622730
 
 import tkinter as tk
-from tkinter import ttk
-from package_setup import PackageSetup
-from graph import Graph
-from trucks import Truck
-from driver import Driver
-from datetime import datetime, timedelta
+from tkinter import ttk, messagebox
+import os
+import queue
+import threading
+from time import perf_counter
+from simulation import DeliverySimulation
+from instrumentation import instrumentation
+from datetime import datetime
+from status_timeline import StatusTimeline
+from package_list_view import PackageListView
+
+class DialogDecisions:
+    # DialogDecisions class to answer the trucks' questions (like correcting package #9) with a dialog
+    # The trucks ask from the worker thread, so the question goes through the UI queue and the
+    # worker waits until the window has shown the dialog and put the answer back
+    def __init__(self, ui_queue):
+        self.ui_queue = ui_queue
+
+    # Ask the question for key and wait for the answer, "yes" or "no"
+    def get(self, key):
+        answer = queue.Queue(maxsize=1)
+        self.ui_queue.put(("ask", key, answer))
+        return answer.get()
 
 # Create a UI class to display the delivery system
 class DeliverySystemUI:
+    # Questions the dialog asks for each decision the trucks need
+    questions = {
+        "package_9": "It is 10:20 and there is an update to package #9.\nCorrect its address to 410 S State St, Salt Lake City, UT 84111?",
+    }
+    # Milliseconds between UI queue drains (about 60 frames a second) and the share of a frame spent draining
+    frame_ms = 16
+    drain_budget = 0.008
+
     # Setup/Initialize the UI with the root window
-    def __init__(self, root):
+    # Pass metrics_path to time the hot paths (including text box inserts) and save each run's metrics there
+    # Every status change of every run is appended to the binary log at event_log_path (None to keep it in memory only)
+    def __init__(self, root, metrics_path=None, event_log_path="status_events.log"):
         self.root = root
         self.root.title("WGUPS Package Delivery System")
-
-        # Setup package setup and load packages from CSV
-        self.package_setup = PackageSetup()
-        self.package_setup.setup_packages_from_csv("data/WGUPS_Package_File.csv")
-        self.all_packages = self.package_setup.get_all_packages()
+        if metrics_path:
+            instrumentation.add_target(tk.Text, "insert", span="ui.text_insert")
+
+        # Setup the delivery simulation, it loads the packages, the graph, the trucks and the drivers
+        # Realtime keeps the pauses, the log lines and the package #9 question go to the window once the day starts
+        self.simulation = DeliverySimulation(realtime=True, cache_dir=".snapshot_cache", metrics_path=metrics_path, event_log_path=event_log_path)
+        self.package_setup = self.simulation.package_setup
+        self.all_packages = self.simulation.all_packages
+        self.graph = self.simulation.graph
+        self.truck1, self.truck2, self.truck3 = self.simulation.trucks
+        self.driver1 = self.simulation.driver1
+        self.driver2 = self.simulation.driver2
 
         # Used for storing package status over time
         self.package_status_over_time = {}
-        
-        # Setup the graph and setup location data
-        self.graph = Graph()
-        self.graph.setup_location_name_data()
-        self.graph.setup_location_distance_data()
-        self.graph.setup_nodes_hash_table()
-
-        # Initialize trucks with the graph and all packages
-        self.truck1 = Truck("Truck 1", self.graph, [], self.all_packages)
-        self.truck2 = Truck("Truck 2", self.graph, [], self.all_packages)
-        self.truck3 = Truck("Truck 3", self.graph, [], self.all_packages)
-
-        # Initialize drivers and assign them to trucks
-        self.driver1 = Driver("Driver 1")
-        self.driver2 = Driver("Driver 2")
-        self.driver1.assign_truck(self.truck1)
-        self.driver2.assign_truck(self.truck2)
+        self.status_timeline = StatusTimeline()
+
+        # The day runs on a worker thread that posts log lines, progress and questions to this queue
+        self.ui_queue = queue.Queue()
+        self.worker = None
+        # True from the start of the day until the worker has posted its results, the worker
+        # changes the packages the whole time so the screens that show them wait until then
+        self.day_running = False
+        self.delivery_text = None
+        self.progress = None
+        # Packages on the trucks when the day started, and how many are still on board
+        self.progress_total = 0
+        self.progress_remaining = None
 
         # Create the main menu
         self.create_main_menu()
@@ -72,34 +102,32 @@ class DeliverySystemUI:
         # Create the text box with larger dimensions
         self.log_text = tk.Text(text_frame, height=30, width=100, wrap=tk.NONE)
         self.log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        # The running day keeps writing here even if other screens reuse log_text
+        self.delivery_text = self.log_text
 
         # Create the scrollbar and attach it to the text box
         scrollbar = tk.Scrollbar(text_frame, orient=tk.VERTICAL, command=self.log_text.yview)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.log_text.config(yscrollcommand=scrollbar.set)
 
-        # Create a progress bar
-        self.progress = ttk.Progressbar(self.root, orient="horizontal", length=500, mode="determinate")
+        # Create a progress bar, it shows the share of packages delivered
+        self.progress = ttk.Progressbar(self.root, orient="horizontal", length=500, mode="determinate", maximum=100)
         self.progress.pack(pady=10)
+        self.progress["value"] = self.progress_percent()
 
     # Create a screen to look up the package
     def create_package_lookup_screen(self):
+        if self.packages_busy():
+            return
         self.clear_screen()
         frame = tk.Frame(self.root)
         frame.pack(pady=30)
 
-        # Create a text box to display package information
-        self.package_info_text = tk.Text(frame, height=50, width=100, wrap=tk.NONE)
-        self.package_info_text.grid(row=0, column=0, padx=10, pady=10)
-
-        # Create a scrollbar and attach it to the text box
-        scrollbar = tk.Scrollbar(frame, orient=tk.VERTICAL, command=self.package_info_text.yview)
-        scrollbar.grid(row=0, column=1, sticky='ns')
-        self.package_info_text.config(yscrollcommand=scrollbar.set)
+        # Show the package information in a list that only draws the rows on screen
+        self.display_all_packages(frame)
 
         # Add a button to go back to the main menu
-        tk.Button(frame, text="Back to Main Menu", command=self.create_main_menu).grid(row=1, column=0, columnspan=2, pady=10)
-        self.display_all_packages()
+        tk.Button(frame, text="Back to Main Menu", command=self.create_main_menu).pack(pady=10)
 
     # Display a lookup package system using time to show details of each package
     def lookup_package(self, start_time_str, end_time_str):
@@ -111,47 +139,28 @@ class DeliverySystemUI:
         start_time = datetime.strptime(start_time_str, "%H:%M:%S").time()
         end_time = datetime.strptime(end_time_str, "%H:%M:%S").time()
 
-        # Create a text box to display package statuses
-        self.log_text = tk.Text(frame, height=30, width=100, wrap=tk.NONE)
-        self.log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        # Display package statuses within the time frame, a row is built only when it is on screen
+        def row_for(package_id):
+            # Only the status changes inside the time frame, found by bisecting the package's timeline
+            changes = [f"{time.strftime('%H:%M:%S')} {status}" for time, status in self.status_timeline.history_between(package_id, start_time, end_time)]
+            return package_id, ", ".join(changes)
 
-        # Create a scrollbar and attach it to the text box
-        scrollbar = tk.Scrollbar(frame, orient=tk.VERTICAL, command=self.log_text.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.log_text.config(yscrollcommand=scrollbar.set)
-
-        # Display package statuses within the time frame
-        for package_id, statuses in self.package_status_over_time.items():
-            info = f"Package ID: {package_id}\n"
-            last_status = None
-            for time, status in statuses:
-                status_time = time  # Directly use the time object
-                if start_time <= status_time <= end_time:
-                    if status != last_status:
-                        info += f"Time: {time.strftime('%H:%M:%S')}, Status: {status}\n"
-                        last_status = status
-            info += "----------------------\n"
-            self.log_text.insert(tk.END, info)
+        self.package_list = PackageListView(frame, ["Package ID", "Status changes"], self.package_status_over_time, row_for,
+                                            widths={"Package ID": 90, "Status changes": 600}).pack(fill=tk.BOTH, expand=True)
 
         # Add a button to go back to the time frames screen
         tk.Button(frame, text="Back to Time Frames", command=self.show_time_frames).pack(pady=10)
 
-    # Display all package information
-    def display_all_packages(self):
-        self.package_info_text.delete(1.0, tk.END)
-        # Display package information in the text box
-        for package in self.all_packages:
-            info = (
-                f"ID: {package.package_id}\n"
-                f"Address: {package.address}\n"
-                f"Deadline: {package.deadline}\n"
-                f"City: {package.city}\n"
-                f"Zip Code: {package.zip_code}\n"
-                f"Weight: {package.weight}\n"
-                f"Status: {package.delivery_status}\n"
-                "----------------------\n"
-            )
-            self.package_info_text.insert(tk.END, info)
+    # Display all package information in a list inside parent
+    def display_all_packages(self, parent):
+        # Rows are looked up by position in the package list when they scroll into view
+        def row_for(index):
+            package = self.all_packages[index]
+            return package.package_id, package.address, package.deadline, package.city, package.zip_code, package.weight, package.delivery_status
+
+        columns = ["ID", "Address", "Deadline", "City", "Zip Code", "Weight", "Status"]
+        self.package_list = PackageListView(parent, columns, range(len(self.all_packages)), row_for, height=35,
+                                            widths={"ID": 50, "Address": 220, "City": 140, "Weight": 60, "Status": 110}).pack(fill=tk.BOTH, expand=True)
 
     def clear_screen(self):
         # Clear all widgets from the screen
@@ -160,6 +169,8 @@ class DeliverySystemUI:
 
     # Show time frames to see delivery statuses
     def show_time_frames(self):
+        if self.packages_busy():
+            return
         self.clear_screen()
         frame = tk.Frame(self.root)
         frame.pack(pady=30)
@@ -204,19 +215,6 @@ class DeliverySystemUI:
         time_frame_label = tk.Label(frame, text=f"Selected Time Frame: {start_time_str} - {end_time_str}", font=("Helvetica", 14))
         time_frame_label.pack(pady=10)
 
-        # Create a frame to hold the text box and scrollbar
-        text_frame = tk.Frame(self.root)
-        text_frame.pack(pady=10)
-
-        # Create the text box to display the statuses
-        self.log_text = tk.Text(text_frame, height=35, width=160, wrap=tk.NONE)
-        self.log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-
-        # Create the scrollbar and attach it to the text box
-        scrollbar = tk.Scrollbar(text_frame, orient=tk.VERTICAL, command=self.log_text.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.log_text.config(yscrollcommand=scrollbar.set)
-
         # Store the original address details of package 9
         original_address = {
             "address": "300 State St",
@@ -225,119 +223,170 @@ class DeliverySystemUI:
             "weight": 2
         }
 
-        # Sort packages by ID
-        sorted_packages = sorted(self.package_status_over_time.items(), key=lambda x: x[0])
-        # Display package statuses within the time frame
-        for package_id, statuses in sorted_packages:
+        # Check if package 9 needs to show the updated address
+        package = self.package_setup.get_package_by_id(9)
+        if package and 9 in self.package_status_over_time:
+            if end_time >= datetime.strptime("10:20:00", "%H:%M:%S").time():
+                package.address = "410 S State St"
+                package.city = "Salt Lake City"
+                package.zip_code = "84111"
+                package.weight = 5
+            else:
+                package.address = original_address["address"]
+                package.city = original_address["city"]
+                package.zip_code = original_address["zip_code"]
+                package.weight = original_address["weight"]
+            # Keep the package indexes in step with the address shown
+            self.package_setup.reindex(package)
+
+        # Build a package's row when it scrolls into view
+        def row_for(package_id):
             package = self.package_setup.get_package_by_id(package_id)
             if not package:
-                continue
+                return package_id, "(Package not found)"
 
             # Collect status information within the time frame
-            status_info = []  # Store status information
-            last_status = None
-            last_time = None
-            for time, status in statuses:
-                status_time = time  # Directly use the time object
-                if status_time <= end_time:
-                    last_status = status
-                    last_time = time
-                if start_time <= status_time <= end_time:
-                    status_info.append(f"({time.strftime('%H:%M:%S')}: {status})")
+            status_info = [f"({time.strftime('%H:%M:%S')}: {status})" for time, status in self.status_timeline.history_between(package_id, start_time, end_time)]
 
             # If no status info in the time frame, use the last known status and time
             if not status_info:
-                if last_status and last_time:
-                    status_info.append(f"({last_time.strftime('%H:%M:%S')}: {last_status})")
+                last_change = self.status_timeline.last_change(package_id, end_time)
+                if last_change:
+                    status_info.append(f"({last_change[0].strftime('%H:%M:%S')}: {last_change[1]})")
                 else:
                     # If no status updates, assume the package is at the hub
                     status_info.append("(Status: At Hub)")
+            return package.package_id, " | ".join(status_info), package.truck, f"{package.address} {package.city}", package.zip_code, package.weight, package.deadline
 
-            # Check if package 9 needs to show the updated address
-            if package_id == 9:
-                if end_time >= datetime.strptime("10:20:00", "%H:%M:%S").time():
-                    package.address = "410 S State St"
-                    package.city = "Salt Lake City"
-                    package.zip_code = "84111"
-                    package.weight = 5
-                else:
-                    package.address = original_address["address"]
-                    package.city = original_address["city"]
-                    package.zip_code = original_address["zip_code"]
-                    package.weight = original_address["weight"]
-
-            # Display the package information
-            info = (
-                f"Package {package.package_id}: {' | '.join(status_info)}, {package.truck}, {package.address} {package.city}, "
-                f"{package.zip_code}, {package.weight}, {package.deadline}\n"
-            )
-            self.log_text.insert(tk.END, info)
+        # Display package statuses within the time frame, sorted by package ID
+        columns = ["Package", "Statuses", "Truck", "Address", "Zip Code", "Weight", "Deadline"]
+        self.package_list = PackageListView(self.root, columns, sorted(self.package_status_over_time), row_for, height=30,
+                                            widths={"Package": 70, "Statuses": 520, "Address": 260, "Weight": 60}).pack(fill=tk.BOTH, expand=True, pady=10)
 
         # Add the "Back to Time Frames" button at the bottom
         tk.Button(self.root, text="Back to Time Frames", command=self.show_time_frames).pack(side=tk.BOTTOM, pady=10)
                 
+    # Check if the day is running, telling the user to wait if it is
+    # The package objects are only read on this thread once the worker is done with them
+    def packages_busy(self):
+        if not self.day_running:
+            return False
+        messagebox.showinfo("WGUPS", "The delivery day is still running.\nThe packages can be looked up once it is done.", parent=self.root)
+        return True
+
     # Log messages to the UI
     def log(self, message):
         self.log_text.insert(tk.END, message + "\n")
         self.log_text.see(tk.END)
 
-    # Start the delivery process and show packages being delivered in the UI    
+    # Start the delivery process and show packages being delivered in the UI
+    # The trucks drive on a worker thread so the window stays responsive, their log lines,
+    # progress and the package #9 question come back through the UI queue
     def start_delivery(self, start_time_str=None, end_time_str=None):
+        if self.worker is not None and self.worker.is_alive():
+            self.log("Delivery is already running...")
+            return
         self.log("Delivery started...")
-        self.truck1.load_packages_by_id()
-        self.truck2.load_packages_by_id()
-        self.truck3.load_packages_by_id()
-
-        package_9_has_been_updated = False
-
-        # Start deliveries at 8:00 AM
-        base_start_time = datetime.combine(datetime.today(), datetime.min.time()) + timedelta(hours=8)
-        self.start_time = datetime.strptime(start_time_str, "%H:%M:%S") if start_time_str else base_start_time
         self.end_time = datetime.strptime(end_time_str, "%H:%M:%S") if end_time_str else None
-        # To handle the packages, store status over time, and combined total distance
-        package_handler = self.package_setup  
-        self.package_status_over_time = {}
-        combined_total_distance = [0]
-
-        # Save the current packages of Truck 3
-        current_packages_truck3 = self.truck3.get_all_packages_on_board()
 
-        # Set staggered departure times
-        departure_time1 = self.start_time
-        departure_time2 = departure_time1 + timedelta(hours=1, minutes=15)
-        departure_time3 = datetime.combine(datetime.today(), datetime.min.time()) + timedelta(hours=11, minutes=00)
-
-        # Start delivery routes for each truck
-        total_distance1, delivery_route1 = self.graph.start_delivery_route(self.truck1.delivery_nodes, self.truck1.current_location)
-        self.truck1.delivery_route = delivery_route1
-
-        total_distance2, delivery_route2 = self.graph.start_delivery_route(self.truck2.delivery_nodes, self.truck2.current_location)
-        self.truck2.delivery_route = delivery_route2
-
-        total_distance3, delivery_route3 = self.graph.start_delivery_route(self.truck3.delivery_nodes, self.truck3.current_location)
-        self.truck3.delivery_route = delivery_route3
-
-        # Deliver packages for Truck 1
-        start_time, _, _, package_9_has_been_updated, delivery_process1, _ = self.truck1.deliver_packages(departure_time1, package_handler, self.package_status_over_time, package_9_has_been_updated, combined_total_distance, current_packages_truck3)
-        self.log(f"Truck 1 starting at {start_time.strftime('%H:%M:%S')}")
-
-        # Deliver packages for Truck 2 at 9:15 AM
-        start_time2, _, _, package_9_has_been_updated, delivery_process2, _ = self.truck2.deliver_packages(departure_time2, package_handler, self.package_status_over_time, package_9_has_been_updated, combined_total_distance, current_packages_truck3)
-        self.log(f"Truck 2 starting at {start_time2.strftime('%H:%M:%S')}")
-
-        # Reassign driver from Truck 1 to Truck 3
-        self.driver1.assign_truck(self.truck3)
-
-        # Ensure Truck 3 starts at 11:30 AM
-        start_time3, _, _, package_9_has_been_updated, delivery_process3, _ = self.truck3.deliver_packages(departure_time3, package_handler, self.package_status_over_time, package_9_has_been_updated, combined_total_distance, current_packages_truck3)
-        self.log(f"Truck 3 starting at {start_time3.strftime('%H:%M:%S')}")
-
-        # Combine delivery processes
-        delivery_process = delivery_process1 + delivery_process2 + delivery_process3
-        self.log("Delivery Process:\n" + "\n".join(delivery_process))
+        self.progress_total = 0
+        self.progress_remaining = None
+        self.progress["value"] = 0
+        self.day_running = True
+        for truck in self.simulation.trucks:
+            truck.sinks = [lambda message: self.ui_queue.put(("log", message))]
+            truck.decisions = DialogDecisions(self.ui_queue)
+        self.worker = threading.Thread(target=self.run_simulation, args=(start_time_str,), daemon=True)
+        self.worker.start()
+        self.root.after(self.frame_ms, self.drain_ui_queue)
+
+    # Run all three trucks through the simulation on the worker thread
+    def run_simulation(self, start_time_str):
+        try:
+            results = self.simulation.run(start_time_str, on_event=self.post_progress)
+        except Exception as error:
+            self.ui_queue.put(("error", error))
+            return
+        self.ui_queue.put(("done", results))
+
+    # Post the number of packages still on the trucks after an event, only when it changes
+    def post_progress(self, event):
+        remaining = sum(len(truck.on_board) for truck in self.simulation.trucks)
+        if remaining != self.progress_remaining:
+            self.progress_remaining = remaining
+            self.progress_total = max(self.progress_total, remaining)
+            self.ui_queue.put(("progress", self.progress_total - remaining, self.progress_total))
+
+    # Share of the packages delivered so far, in percent
+    def progress_percent(self):
+        if not self.progress_total or self.progress_remaining is None:
+            return 0
+        return 100 * (self.progress_total - self.progress_remaining) / self.progress_total
+
+    # Handle what the worker posted, a frame's worth at a time so the window keeps drawing
+    def drain_ui_queue(self):
+        deadline = perf_counter() + self.drain_budget
+        lines = []
+        finished = None
+        while finished is None and perf_counter() < deadline:
+            try:
+                message = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            kind = message[0]
+            if kind == "log":
+                lines.append(message[1])
+            elif kind == "progress":
+                _, delivered, total = message
+                self.show_progress(100 * delivered / total if total else 0)
+            elif kind == "ask":
+                # Show what happened so far before asking
+                self.show_delivery_lines(lines)
+                lines = []
+                _, key, answer = message
+                answer.put("yes" if messagebox.askyesno("WGUPS", self.questions.get(key, key), parent=self.root) else "no")
+            else:
+                finished = message
+        # One insert for all the lines of this frame
+        self.show_delivery_lines(lines)
+        if finished is None:
+            self.root.after(self.frame_ms, self.drain_ui_queue)
+        else:
+            self.finish_delivery(*finished)
+
+    # Add lines to the delivery screen's log, if it is showing
+    def show_delivery_lines(self, lines):
+        if lines and self.delivery_text is not None and self.delivery_text.winfo_exists():
+            self.delivery_text.insert(tk.END, "\n".join(lines) + "\n")
+            self.delivery_text.see(tk.END)
+
+    # Move the progress bar, if it is showing
+    def show_progress(self, percent):
+        if self.progress is not None and self.progress.winfo_exists():
+            self.progress["value"] = percent
+
+    # Keep the day's results once the worker is done
+    def finish_delivery(self, kind, outcome):
+        # The worker is done with the packages
+        self.day_running = False
+        if kind == "error":
+            self.show_delivery_lines([f"Error: Delivery stopped: {outcome}"])
+            return
+        results = outcome
+        self.package_status_over_time = results["package_status_over_time"]
+        self.status_timeline = results["status_timeline"]
+        lines = [f"{truck_id} starting at {truck_result['departure_time'].strftime('%H:%M:%S')}" for truck_id, truck_result in results["trucks"].items()]
+        lines.append(f"Delivery finished, combined total distance: {results['combined_total_distance']:.2f} miles")
+        # Show where the time went when metrics are on
+        if "metrics_summary" in results:
+            lines.append("Metrics:\n" + results["metrics_summary"])
+        self.show_progress(100)
+        self.show_delivery_lines(lines)
 
     # Search for a package by ID
     def search_package_id(self):
+        if self.packages_busy():
+            return
         self.clear_screen()
         frame = tk.Frame(self.root)
         frame.pack(pady=30)
@@ -404,7 +453,8 @@ class DeliverySystemUI:
 def main():
     # Create the main window
     root = tk.Tk()
-    app = DeliverySystemUI(root)
+    # Set WGUPS_METRICS to a .json or .prom path to save timings and counters of every run
+    app = DeliverySystemUI(root, metrics_path=os.environ.get("WGUPS_METRICS"))
     root.mainloop()
 
 # Run the main function
@@ -3,6 +3,8 @@ from edge import Edge
 
 class Node:
     # Node class to represent a location in the graph
+    __slots__ = ("value", "edges", "visited")
+
     def __init__(self, value: str):
         self.value = value
         # Sore a List of Edge objects
@@ -0,0 +1,131 @@
+import tkinter as tk
+from tkinter import ttk
+
+class PackageListView:
+    # PackageListView class to show a long list of packages in a ttk.Treeview
+    # The tree only ever holds the rows that fit on screen. Scrolling moves a window over
+    # the list of keys and refills those rows, and each row is built by row_for(key) only
+    # when it is shown, so opening a list costs the same for 40 packages or 50,000
+    def __init__(self, parent, columns, keys, row_for, height=30, widths=None):
+        self.columns = list(columns)
+        # row_for(key) returns the values of one row, one per column
+        self.row_for = row_for
+        self.all_keys = list(keys)
+        # Keys of the rows that pass the filter, in the order shown
+        self.keys = self.all_keys
+        self.height = height
+        # Index in keys of the first row on screen
+        self.offset = 0
+        self.filter_text = ""
+        self.filter_job = None
+        self.sort_column = None
+        self.sort_reverse = False
+
+        self.frame = tk.Frame(parent)
+        # Filter box, the list is narrowed as you type
+        filter_frame = tk.Frame(self.frame)
+        filter_frame.pack(fill=tk.X)
+        tk.Label(filter_frame, text="Filter:").pack(side=tk.LEFT)
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add("write", lambda *_: self.schedule_filter())
+        tk.Entry(filter_frame, textvariable=self.filter_var, width=40).pack(side=tk.LEFT, padx=5)
+        self.count_label = tk.Label(filter_frame)
+        self.count_label.pack(side=tk.LEFT, padx=5)
+
+        tree_frame = tk.Frame(self.frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(tree_frame, columns=self.columns, show="headings", height=height, selectmode="browse")
+        for column in self.columns:
+            # Clicking a heading sorts by that column, clicking it again reverses the order
+            self.tree.heading(column, text=column, command=lambda column=column: self.sort_by(column))
+            self.tree.column(column, width=(widths or {}).get(column, 100), stretch=True)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar = tk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # The rows on screen, created once and refilled while scrolling
+        self.items = [self.tree.insert("", tk.END, values=()) for _ in range(height)]
+        for widget in (self.tree, self.scrollbar):
+            widget.bind("<MouseWheel>", lambda event: self.scroll_by(-1 if event.delta > 0 else 1, "units"))
+            widget.bind("<Button-4>", lambda event: self.scroll_by(-1, "units"))
+            widget.bind("<Button-5>", lambda event: self.scroll_by(1, "units"))
+        self.tree.bind("<Prior>", lambda event: self.scroll_by(-1, "pages"))
+        self.tree.bind("<Next>", lambda event: self.scroll_by(1, "pages"))
+        self.render()
+
+    # Place the list in its parent, takes the same options as pack
+    def pack(self, **options):
+        self.frame.pack(**options)
+        return self
+
+    # Give the list new keys (e.g. after the packages changed), keeping the filter and sort
+    def set_keys(self, keys):
+        self.all_keys = list(keys)
+        self.apply_filter(self.filter_text, narrow=False)
+
+    # Scrollbar command: ("moveto", fraction) or ("scroll", count, "units" or "pages")
+    def scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.offset = int(float(amount) * len(self.keys))
+            self.render()
+        elif action == "scroll":
+            self.scroll_by(int(amount), unit)
+
+    # Scroll by a number of rows or pages
+    def scroll_by(self, count, unit):
+        self.offset += count * (self.height if unit == "pages" else 1)
+        self.render()
+        return "break"
+
+    # Fill the rows on screen from the keys at the current offset
+    def render(self):
+        self.offset = max(0, min(self.offset, len(self.keys) - self.height))
+        visible = self.keys[self.offset:self.offset + self.height]
+        for index, item in enumerate(self.items):
+            self.tree.item(item, values=self.row_for(visible[index]) if index < len(visible) else ())
+        if self.keys:
+            self.scrollbar.set(self.offset / len(self.keys), min(1.0, (self.offset + self.height) / len(self.keys)))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self.count_label.config(text=f"{len(self.keys)} of {len(self.all_keys)} packages")
+
+    # Filter a moment after typing stops so a fast typist doesn't filter on every key
+    def schedule_filter(self):
+        if self.filter_job is not None:
+            self.frame.after_cancel(self.filter_job)
+        self.filter_job = self.frame.after(150, self.on_filter)
+
+    def on_filter(self):
+        self.filter_job = None
+        text = self.filter_var.get().strip().lower()
+        # Adding to the filter text only narrows the list, so only the shown rows are checked again
+        self.apply_filter(text, narrow=text.startswith(self.filter_text))
+
+    # Keep the rows that contain text in any column
+    def apply_filter(self, text, narrow):
+        keys = self.keys if narrow else self.all_keys
+        if text:
+            keys = [key for key in keys if any(text in str(value).lower() for value in self.row_for(key))]
+        self.filter_text = text
+        self.keys = keys
+        if self.sort_column is not None and not narrow:
+            self.sort_keys()
+        self.offset = 0
+        self.render()
+
+    # Sort by a column, or reverse the order when it is already sorted by it
+    def sort_by(self, column):
+        self.sort_reverse = not self.sort_reverse if column == self.sort_column else False
+        self.sort_column = column
+        self.sort_keys()
+        self.offset = 0
+        self.render()
+
+    def sort_keys(self):
+        position = self.columns.index(self.sort_column)
+        self.keys = sorted(self.keys, key=lambda key: self.sort_value(self.row_for(key)[position]), reverse=self.sort_reverse)
+
+    # Numbers sort by value and before text, text sorts without case
+    def sort_value(self, value):
+        if isinstance(value, (int, float)):
+            return 0, value, ""
+        return 1, 0, str(value).lower()
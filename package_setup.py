@@ -1,115 +1,280 @@
 from hash_table import HashTable
 from packages import Package
+from package_store import PackageStore, PackageView
 from trucks import Truck
 import csv
+from time import perf_counter
 from typing import Optional
 
 class PackageSetup:
     # PackageSetup class to setup and manage packages
-    def __init__(self, file_path="data/WGUPS_Package_File.csv"):
+    # With columnar the packages are kept in a PackageStore and handed out as lightweight views.
+    # The store is then the only copy: lookups by ID and by attribute go to the store, and the
+    # dict, hash table and secondary indexes below stay empty
+    # The package file is read in chunks of chunk_size rows, with progress going to ingest_sinks
+    # Pass address_names (address -> location name, e.g. from the graph) to skip reading the addresses file again
+    # Pass a SnapshotCache to load the parsed packages from a columnar snapshot instead of the CSV file,
+    # the snapshot is rebuilt whenever the package file (or the addresses) change
+    def __init__(self, file_path="data/WGUPS_Package_File.csv", columnar=False, chunk_size=10000, ingest_sinks=None, address_names=None, cache=None):
         self.TOTAL_PACKAGES = 40
+        self.store = PackageStore() if columnar else None
         self.packages = {}
         self.packages_hash_table = HashTable()
-        self.setup_packages_from_csv(file_path)
+        # Package attributes the supervisor can query, each gets an index of value -> set of package IDs
+        self.indexed_attributes = ("delivery_address", "city", "deadline", "zip_code", "weight", "delivery_status", "special_notes")
+        self.indexes = {attribute: {} for attribute in self.indexed_attributes}
+        # The values each package is currently indexed under
+        self.indexed_values = {}
+        # Where per-chunk loading progress goes, e.g. [print]
+        self.ingest_sinks = ingest_sinks if ingest_sinks is not None else []
+        # Row counts and timings of every chunk of the last load
+        self.chunk_stats = []
+        key = self.snapshot_key(cache, file_path, address_names) if cache is not None else None
+        if key is None or not self.load_snapshot(cache, key):
+            self.setup_packages_from_csv(file_path, chunk_size, address_names)
+            if key is not None:
+                self.save_snapshot(cache, key)
+
+    # Get the snapshot key of the package file and the address map its location names come from
+    def snapshot_key(self, cache, file_path, address_names):
+        if address_names is None:
+            return cache.key((file_path, "data/WGUPS_Addresses.csv"))
+        return cache.key((file_path,), sorted(address_names.items()))
+
+    # Load the packages from the manifest snapshot, returns False if there is none
+    def load_snapshot(self, cache, key):
+        snapshot = cache.load("manifest", key)
+        if snapshot is None:
+            return False
+        store = PackageStore.from_snapshot(*snapshot)
+        if self.store is not None:
+            self.store = store
+        else:
+            for view in store:
+                package = view.to_package()
+                # The CSV gives missing notes as an empty string
+                package.special_notes = package.special_notes or ""
+                self.insert(package)
+        for sink in self.ingest_sinks:
+            sink(f"Loaded {len(self)} packages from the snapshot cache")
+        return True
+
+    # Save the packages as a manifest snapshot of PackageStore columns
+    def save_snapshot(self, cache, key):
+        store = self.store
+        if store is None:
+            store = PackageStore(len(self.packages))
+            for package in self.packages.values():
+                store.add_package(package)
+        cache.save("manifest", key, *store.snapshot())
 
     # Get the packages dictionary
     def __iter__(self):
+        if self.store is not None:
+            return iter(self.store)
         return iter([package for id, package in self.packages.items()])
 
     # Get the length of the packages dictionary
     def __len__(self):
+        if self.store is not None:
+            return len(self.store)
         return len(self.packages)
     
     # Insert a package into the dictionary and hash table
     def insert(self, item):
+        # Columnar setups only need the package in the store
+        if self.store is not None:
+            if not (isinstance(item, PackageView) and item.store is self.store):
+                self.store.add_package(item)
+            return
         self.packages[item.package_id] = item
         self.packages_hash_table.insert(item.package_id, item)  
+        self.reindex(item)
+
+    # Make a package attribute usable as an index key
+    def index_key(self, value):
+        return tuple(value) if isinstance(value, list) else value
+
+    # Move a package in the secondary indexes to match its current attribute values
+    # The columnar store keeps its own lookups up to date as its columns change
+    def reindex(self, package):
+        if self.store is not None:
+            return
+        old_values = self.indexed_values.get(package.package_id)
+        new_values = tuple(self.index_key(getattr(package, attribute, None)) for attribute in self.indexed_attributes)
+        if old_values == new_values:
+            return
+        for position, attribute in enumerate(self.indexed_attributes):
+            new_value = new_values[position]
+            # Take the package out of the set for its old value
+            if old_values is not None:
+                old_value = old_values[position]
+                if old_value == new_value:
+                    continue
+                package_ids = self.indexes[attribute].get(old_value)
+                if package_ids is not None:
+                    package_ids.discard(package.package_id)
+                    if not package_ids:
+                        del self.indexes[attribute][old_value]
+            # Add the package to the set for its new value
+            self.indexes[attribute].setdefault(new_value, set()).add(package.package_id)
+        self.indexed_values[package.package_id] = new_values
+
+    # Remove a package from the secondary indexes
+    def unindex(self, package_id):
+        old_values = self.indexed_values.pop(package_id, None)
+        if old_values is None:
+            return
+        for attribute, old_value in zip(self.indexed_attributes, old_values):
+            package_ids = self.indexes[attribute].get(old_value)
+            if package_ids is not None:
+                package_ids.discard(package_id)
+                if not package_ids:
+                    del self.indexes[attribute][old_value]
+
+    # Get the packages whose attribute has the given value, sorted by package ID
+    def find_packages(self, attribute, value):
+        if self.store is not None:
+            return self.store.find(attribute, value)
+        package_ids = self.indexes[attribute].get(self.index_key(value), ())
+        return [self.packages[package_id] for package_id in sorted(package_ids)]
+
+    # Read a CSV file lazily and yield its rows in lists of at most chunk_size rows
+    def read_chunks(self, file_path, chunk_size, skip_header=False):
+        with open(file_path) as file:
+            reader = csv.reader(file)
+            if skip_header:
+                next(reader, None)
+            chunk = []
+            for entry in reader:
+                chunk.append(entry)
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+    # Check and convert one chunk of package rows, returns the packages and the number of bad rows
+    def parse_package_chunk(self, chunk, location_address_to_names):
+        packages = []
+        rejected = 0
+        # Columnar setups add the package to the store instead of creating an object
+        package_type = self.store.add if self.store is not None else Package
+        for entry in chunk:
+            # Skip blank lines
+            if len(entry) <= 1:
+                continue
+            try:
+                if len(entry) < 7:
+                    raise ValueError(f"expected at least 7 columns, got {len(entry)}")
+                package_id = int(entry[0])
+                weight = float(entry[6])
+            except ValueError as error:
+                print(f"Error: Skipping package row {entry}: {error}")
+                rejected += 1
+                continue
+            location_name = location_address_to_names.get(entry[1])
+            # Fallback to the original address if not found in the hash table
+            if location_name is None:
+                location_name = entry[1]
+            packages.append(package_type(
+                package_id=package_id,
+                location_name=location_name,
+                address=entry[1],
+                city=entry[2],
+                state=entry[3],
+                zip_code=entry[4],
+                deadline=entry[5],
+                weight=weight,
+                special_notes=entry[7] if len(entry) > 7 else "",
+                delivery_status="AT THE HUB"
+            ))
+        return packages, rejected
 
     # Setup the packages from a CSV file
-    def setup_packages_from_csv(self, file_path):
+    # The file is streamed in chunks of chunk_size rows, so only one chunk of raw rows is in
+    # memory at a time. Every chunk's row count and rows per second go to ingest_sinks and chunk_stats
+    def setup_packages_from_csv(self, file_path, chunk_size=10000, address_names=None):
         location_address_to_names = HashTable()
-        # Load location names from the CSV file
-        with open("data/WGUPS_Addresses.csv") as file:
-            names_reader = csv.reader(file)
-            raw_distance_names = list(names_reader)
-            for entry in raw_distance_names:
-                location_address_to_names.insert(entry[2], entry[1])
-
-        # Load package data from a CSV file
-        with open(file_path) as file:
-            packages_reader = csv.reader(file)
-            raw_package_data = list(packages_reader)
-
-        # Skip the header row
-        raw_package_data = raw_package_data[1:]
-
-        for entry in raw_package_data:
-            if len(entry) > 1:
-                location_name = location_address_to_names.get(entry[1])
-                # Fallback to the original address if not found in the hash table
-                if location_name is None:
-                    location_name = entry[1]  
-                package = Package(
-                    package_id=int(entry[0]), 
-                    location_name=location_name,
-                    address=entry[1],
-                    city=entry[2],
-                    state=entry[3],
-                    zip_code=entry[4],
-                    deadline=entry[5],  
-                    weight=float(entry[6]),  
-                    special_notes=entry[7],
-                    delivery_status="AT THE HUB"
-                )
-             # Use the insert package to both the dictionary and the hash table
-                self.insert(package) 
+        if address_names is not None:
+            location_address_to_names.update(address_names.items())
+        else:
+            # Load location names from the CSV file
+            for chunk in self.read_chunks("data/WGUPS_Addresses.csv", chunk_size):
+                for entry in chunk:
+                    location_address_to_names.insert(entry[2], entry[1])
+
+        # Load package data from a CSV file, skipping the header row
+        self.chunk_stats = []
+        chunk_start = perf_counter()
+        for chunk_number, chunk in enumerate(self.read_chunks(file_path, chunk_size, skip_header=True), start=1):
+            packages, rejected = self.parse_package_chunk(chunk, location_address_to_names)
+            # Use the insert package to both the dictionary and the hash table
+            for package in packages:
+                self.insert(package)
+            # Time includes reading the chunk from the file
+            chunk_end = perf_counter()
+            seconds = chunk_end - chunk_start
+            stats = {"chunk": chunk_number, "rows": len(chunk), "packages": len(packages), "rejected": rejected,
+                     "seconds": seconds, "rows_per_second": len(chunk) / seconds if seconds > 0 else float("inf")}
+            self.chunk_stats.append(stats)
+            for sink in self.ingest_sinks:
+                sink(f"Chunk {chunk_number}: {stats['packages']} packages ({rejected} rejected) in {seconds:.3f}s, {stats['rows_per_second']:.0f} rows/s")
+            chunk_start = chunk_end
 
     # Get a package by its ID
     def get_package_by_id(self, id):
+        if self.store is not None:
+            return self.store.get(int(id))
         return self.packages_hash_table.get(int(id))
 
     # Remove a package by its ID
     def remove_package_by_id(self, id):
+        if self.store is not None:
+            return self.store.remove(int(id))
         package = self.packages.pop(int(id), None)
         if package:
             self.packages_hash_table.remove(int(id))
+            self.unindex(int(id))
         return package
 
     # Get packages by address
     def get_packages_by_address(self, address):
-        return [self.get_package_by_id(id) for id in range(1, self.TOTAL_PACKAGES + 1) if self.get_package_by_id(id).delivery_address == address]
+        return self.find_packages("delivery_address", address)
 
     # Get packages by city
     def get_packages_by_city(self, city):
-        return [self.get_package_by_id(id) for id in range(1, self.TOTAL_PACKAGES + 1) if self.get_package_by_id(id).delivery_city == city]
+        return self.find_packages("city", city)
 
     # Get packages by deadline
     def get_packages_by_deadline(self, deadline):
-        return [self.get_package_by_id(id) for id in range(1, self.TOTAL_PACKAGES + 1) if self.get_package_by_id(id).deadline == deadline]
+        return self.find_packages("deadline", deadline)
 
     # Get packages by zip
     def get_packages_by_zip(self, zip):
-        return [self.get_package_by_id(id) for id in range(1, self.TOTAL_PACKAGES + 1) if self.get_package_by_id(id).delivery_zip == zip]
+        return self.find_packages("zip_code", zip)
 
     # Get packages by weight
     def get_packages_by_weight(self, weight):
-        return [self.get_package_by_id(id) for id in range(1, self.TOTAL_PACKAGES + 1) if self.get_package_by_id(id).weight == weight]
+        return self.find_packages("weight", weight)
 
     # Get packages by status
     def get_packages_by_status(self, status):
-        return [self.get_package_by_id(id) for id in range(1, self.TOTAL_PACKAGES + 1) if self.get_package_by_id(id).delivery_status == status]
+        return self.find_packages("delivery_status", status)
 
     # Get packages by special notes
     def get_packages_by_special_notes(self, special_notes):
-        return [self.get_package_by_id(id) for id in range(1, self.TOTAL_PACKAGES + 1) if self.get_package_by_id(id).special_notes == special_notes]
+        return self.find_packages("special_notes", special_notes)
     
     # Get all packages in the dictionary
     def get_all_packages(self):
+        if self.store is not None:
+            return list(self.store)
         return list(self.packages.values())
     
     # Get the packages assigned to a truck by truck ID
     def get_packages_by_truck_id(self, truck_id):
-        return [package for package in self.packages.values() if package.truck == truck_id]
+        return [package for package in self if package.truck == truck_id]
 
     # Get the status of a package by its ID
     def get_package_status(self, package_id):
@@ -124,10 +289,12 @@ class PackageSetup:
         if package:
             # If the package is already delivered, do not change its status
             if package.delivery_status == "DELIVERED":
+                # The truck may have set the status itself, keep the indexes in step
+                self.reindex(package)
                 return
 
             # Check if the truck is at the hub or at the package's delivery location
-            truck = next((truck for truck in Truck.trucks if truck.truck_id == package.truck), None)
+            truck = Truck.trucks.get(package.truck)
             if truck:
                 # Update to Deliver if the current location matches package location name
                 if truck.current_location == package.location_name:
@@ -150,22 +317,58 @@ class PackageSetup:
                 if delivery_time:
                     package.delivery_time = delivery_time
 
-            # Ensure the truck assignment is updated
-            package.truck = truck.truck_id if truck else package.truck
+            # The package is updated in place, only its index entries move
+            self.reindex(package)
+
+    # Update the statuses of a truck's packages for one stop in a single pass
+    # stop_event has the truck_id, the location the truck just reached, the from_location it came
+    # from and the time. Packages for the location are delivered, the others on board are AT HUB
+    # or IN TRANSIT by where the truck came from. Only packages whose status changes are touched:
+    # the truck files its packages by location, and the packages on board are walked only when
+    # the truck first leaves the hub, so after that a stop costs as much as the packages delivered
+    # there (plus any corrected on the way). Returns the (package, status) changes
+    def update_statuses(self, stop_event):
+        truck = Truck.trucks.get(stop_event["truck_id"])
+        if truck is None:
+            print(f"Error: No truck found with ID {stop_event['truck_id']}")
+            return []
+        delivered = truck.get_packages_currently_being_delivered(stop_event["location"])
+        changes = [(package, "DELIVERED") for package in delivered]
+        on_board_status = "AT HUB" if stop_event["from_location"] == "Western Governors University" else "IN TRANSIT"
+        if on_board_status != truck.on_board_status:
+            truck.on_board_status = on_board_status
+            riding = truck.on_board.values()
+        elif truck.status_pending:
+            riding = [truck.on_board[package_id] for package_id in truck.status_pending if package_id in truck.on_board]
+        else:
+            riding = []
+        truck.status_pending.clear()
+        if riding:
+            delivered_ids = {package.package_id for package in delivered}
+            changes += [(package, on_board_status) for package in riding if package.package_id not in delivered_ids]
 
-            # Update the package in the dictionary
-            self.packages[package_id] = package  
-            # Ensure the updated package is saved back to the hash table
-            self.packages_hash_table.insert(package_id, package) 
+        applied = []
+        for package, status in changes:
+            if package.delivery_status == status:
+                continue
+            package.delivery_status = status
+            package.delivery_time = stop_event["time"]
+            self.reindex(package)
+            applied.append((package, status))
+        return applied
 
     # Update the package in the dictionary and hash table        
     def update_package(self, package: Package):
-        self.packages[package.package_id] = package
-        self.packages_hash_table.insert(package.package_id, package)
+        # Copy the updated package into its row so the store stays the only copy
+        if self.store is not None:
+            package = self.store.add_package(package)
+        else:
+            self.packages[package.package_id] = package
+            self.packages_hash_table.insert(package.package_id, package)
+            self.reindex(package)
 
-        print(f"Package #{package.package_id} has been updated.")
         # Goes through all trucks and updates the package if it's found
-        for truck in Truck.trucks:
-            for i, pkg in enumerate(truck.packages):
-                if pkg.package_id == package.package_id:
-                    truck.packages[i] = package
+        for truck in Truck.trucks.values():
+            truck.update_package(package)
+        # Return the stored package, the caller reports the update
+        return package
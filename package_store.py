@@ -0,0 +1,412 @@
+from datetime import datetime
+from typing import Any, Iterator, List, Optional
+import numpy as np
+from packages import Package
+
+class PackageView:
+    # PackageView class to read and write one row of a PackageStore like a Package
+    # Only holds the store and the row number, the package data lives in the store's arrays
+    __slots__ = ("store", "row")
+
+    def __init__(self, store: "PackageStore", row: int):
+        self.store = store
+        self.row = row
+
+    @property
+    def package_id(self) -> int:
+        return int(self.store.package_ids[self.row])
+
+    @property
+    def weight(self) -> float:
+        return float(self.store.weights[self.row])
+
+    @weight.setter
+    def weight(self, value: float):
+        self.store.weights[self.row] = value
+        self.store.sorted_rows.pop("weight", None)
+
+    @property
+    def deadline(self) -> str:
+        return self.store.string(self.store.deadlines[self.row])
+
+    @deadline.setter
+    def deadline(self, value: str):
+        self.store.deadlines[self.row] = self.store.intern(value)
+        self.store.deadline_seconds[self.row] = self.store.parse_deadline(value)
+        self.store.sorted_rows.pop("deadline", None)
+
+    @property
+    def delivery_status(self) -> str:
+        return self.store.status_names[self.store.status_codes[self.row]]
+
+    @delivery_status.setter
+    def delivery_status(self, value: str):
+        self.store.status_codes[self.row] = self.store.status_code(value)
+        self.store.sorted_rows.pop("delivery_status", None)
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.store.loaded[self.row])
+
+    @loaded.setter
+    def loaded(self, value: bool):
+        self.store.loaded[self.row] = value
+
+    @property
+    def truck(self) -> Optional[str]:
+        return self.store.string(self.store.trucks[self.row])
+
+    @truck.setter
+    def truck(self, value: Optional[str]):
+        self.store.trucks[self.row] = self.store.intern(value)
+
+    @property
+    def special_notes(self) -> Any:
+        notes = self.store.string(self.store.special_notes[self.row])
+        return notes if notes is not None else []
+
+    @special_notes.setter
+    def special_notes(self, value: Any):
+        self.store.special_notes[self.row] = self.store.intern(value if value else None)
+        self.store.sorted_rows.pop("special_notes", None)
+
+    # Set status using the delivery status
+    def set_status(self, status: str):
+        self.delivery_status = status
+
+    # Get the status of the package
+    def get_status(self):
+        return self.delivery_status
+
+    # Copy the row into a standalone Package object
+    def to_package(self) -> Package:
+        package = Package(self.package_id, self.location_name, self.address, self.city, self.state, self.zip_code,
+                          self.deadline, self.weight, self.special_notes, self.delivery_status, self.delivery_time)
+        package.departure_time = self.departure_time
+        package.delivery_address = self.delivery_address
+        package.loaded = self.loaded
+        package.truck = self.truck
+        return package
+
+    # Check if two packages are equal, views and Package objects compare by their values
+    def __eq__(self, other):
+        if isinstance(other, (Package, PackageView)):
+            return all(getattr(self, attribute) == getattr(other, attribute) for attribute in PackageStore.compared_attributes)
+        return False
+
+    # Equal packages have the same ID, and a view's ID never changes
+    def __hash__(self):
+        return hash(self.package_id)
+
+    # repr method to represent the package the same way as a Package
+    def __repr__(self):
+        return (f"Package({self.package_id}, {self.location_name}, {self.address}, {self.city}, "
+                f"{self.state}, {self.zip_code}, {self.deadline}, {self.weight}, {self.delivery_status})")
+
+# Text columns are stored as codes into the store's interned strings
+def string_column(name: str):
+    def get(view: PackageView):
+        return view.store.string(view.store.text_columns[name][view.row])
+
+    def set(view: PackageView, value: str):
+        view.store.text_columns[name][view.row] = view.store.intern(value)
+        view.store.sorted_rows.pop(name, None)
+
+    return property(get, set)
+
+# Rarely set values are kept in a dict of row -> value instead of a column
+def sparse_column(name: str):
+    def get(view: PackageView):
+        return view.store.sparse_columns[name].get(view.row)
+
+    def set(view: PackageView, value: Any):
+        if value is None:
+            view.store.sparse_columns[name].pop(view.row, None)
+        else:
+            view.store.sparse_columns[name][view.row] = value
+
+    return property(get, set)
+
+for text_attribute in ("location_name", "address", "city", "state", "zip_code", "delivery_address"):
+    setattr(PackageView, text_attribute, string_column(text_attribute))
+for sparse_attribute in ("delivery_time", "departure_time"):
+    setattr(PackageView, sparse_attribute, sparse_column(sparse_attribute))
+
+class PackageStore:
+    # PackageStore class to keep many packages in columns (struct of arrays)
+    # Numbers live in NumPy arrays and every text value is stored once and referenced
+    # by a small integer code, so a package costs tens of bytes instead of a full object.
+    # Callers get PackageView objects that behave like Package objects, made when they ask for them.
+    # Lookups by ID go through a direct-address table and lookups by attribute binary search the
+    # column in a sorted order of the rows, so the store holds no Python object per package
+    compared_attributes = ("package_id", "location_name", "address", "city", "state", "zip_code", "deadline",
+                           "weight", "special_notes", "delivery_status", "delivery_time")
+    # Attributes the rows can be looked up by
+    indexed_attributes = ("delivery_address", "city", "deadline", "zip_code", "weight", "delivery_status", "special_notes")
+    # Columns with one entry per row besides the text columns
+    column_names = ("package_ids", "weights", "deadline_seconds", "deadlines", "status_codes", "loaded", "trucks", "special_notes", "removed")
+
+    def __init__(self, capacity: int = 64):
+        self.count = 0
+        self.capacity = max(capacity, 1)
+        # package ID -> row: a direct-address table (-1 for no row) for IDs from 0 up to a few
+        # times the number of packages, and a dict for any other IDs
+        self.row_by_id = np.full(self.capacity, -1, dtype=np.int32)
+        self.other_rows = {}
+        # Rows of removed packages stay in the columns but are skipped
+        self.removed = np.zeros(self.capacity, dtype=bool)
+        self.removed_count = 0
+        # attribute -> rows sorted by that attribute's column, built by the first lookup after the column changes
+        self.sorted_rows = {}
+        # Interned strings and their codes, code -1 means None
+        self.strings = []
+        self.string_codes = {}
+        # Status names and their codes
+        self.status_names = []
+        self.status_codes_by_name = {}
+        # Deadline text -> seconds since midnight
+        self.deadline_cache = {}
+        self.package_ids = np.zeros(self.capacity, dtype=np.int64)
+        self.weights = np.zeros(self.capacity, dtype=np.float64)
+        # Deadline as seconds since midnight, -1 for end of day
+        self.deadline_seconds = np.full(self.capacity, -1, dtype=np.int32)
+        self.deadlines = np.full(self.capacity, -1, dtype=np.int32)
+        self.status_codes = np.zeros(self.capacity, dtype=np.int8)
+        self.loaded = np.zeros(self.capacity, dtype=bool)
+        self.trucks = np.full(self.capacity, -1, dtype=np.int32)
+        self.special_notes = np.full(self.capacity, -1, dtype=np.int32)
+        self.text_columns = {name: np.full(self.capacity, -1, dtype=np.int32)
+                             for name in ("location_name", "address", "city", "state", "zip_code", "delivery_address")}
+        self.sparse_columns = {"delivery_time": {}, "departure_time": {}}
+
+    # Get the code of a string, adding it the first time it is seen
+    def intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        code = self.string_codes.get(value)
+        if code is None:
+            code = len(self.strings)
+            self.strings.append(value)
+            self.string_codes[value] = code
+        return code
+
+    # Get the string for a code
+    def string(self, code: int) -> Optional[str]:
+        return self.strings[code] if code >= 0 else None
+
+    # Get the code of a delivery status, adding it the first time it is seen
+    def status_code(self, status: str) -> int:
+        code = self.status_codes_by_name.get(status)
+        if code is None:
+            code = len(self.status_names)
+            self.status_names.append(status)
+            self.status_codes_by_name[status] = code
+        return code
+
+    # Turn a deadline such as "10:30 AM" into seconds since midnight, -1 for "EOD"
+    def parse_deadline(self, deadline: Optional[str]) -> int:
+        # Manifests repeat a handful of deadlines, parse each one once
+        seconds = self.deadline_cache.get(deadline)
+        if seconds is None:
+            seconds = self.deadline_cache[deadline] = self.parse_time(deadline)
+        return seconds
+
+    # Turn a time of day into seconds since midnight, -1 if it isn't a time
+    def parse_time(self, deadline: Optional[str]) -> int:
+        for time_format in ("%I:%M %p", "%H:%M:%S", "%H:%M"):
+            try:
+                parsed = datetime.strptime(str(deadline).strip(), time_format)
+                return parsed.hour * 3600 + parsed.minute * 60 + parsed.second
+            except ValueError:
+                continue
+        return -1
+
+    # Double the size of every column
+    def grow(self):
+        self.capacity *= 2
+        for name in self.column_names:
+            setattr(self, name, self.grown(getattr(self, name)))
+        for name, column in self.text_columns.items():
+            self.text_columns[name] = self.grown(column)
+
+    # Copy a column into a bigger one, filling the new rows like a new store would
+    def grown(self, column):
+        fill = -1 if column.dtype == np.int32 else 0
+        bigger = np.full(self.capacity, fill, dtype=column.dtype)
+        bigger[:len(column)] = column
+        return bigger
+
+    # Get the row of a package ID, None if it isn't in the store
+    def row_of(self, package_id: int) -> Optional[int]:
+        if 0 <= package_id < len(self.row_by_id):
+            row = int(self.row_by_id[package_id])
+            return row if row >= 0 else None
+        return self.other_rows.get(package_id)
+
+    # Point a package ID at a row, or at no row with None
+    def set_row(self, package_id: int, row: Optional[int]):
+        # Grow the table for IDs that are not much bigger than the number of packages
+        if len(self.row_by_id) <= package_id < 4 * (self.count + 64):
+            bigger = np.full(max(package_id + 1, 2 * len(self.row_by_id)), -1, dtype=np.int32)
+            bigger[:len(self.row_by_id)] = self.row_by_id
+            self.row_by_id = bigger
+        if 0 <= package_id < len(self.row_by_id):
+            self.row_by_id[package_id] = -1 if row is None else row
+        elif row is None:
+            self.other_rows.pop(package_id, None)
+        else:
+            self.other_rows[package_id] = row
+
+    # Add a package (or replace the package with the same ID) and return its view
+    def add(self, package_id: int, location_name: str, address: str, city: str, state: str, zip_code: str, deadline: str, weight: float,
+            special_notes: Optional[str] = None, delivery_status: str = "AT THE HUB", delivery_time: Optional[str] = None) -> PackageView:
+        package_id = int(package_id)
+        row = self.row_of(package_id)
+        if row is None:
+            if self.count == self.capacity:
+                self.grow()
+            row = self.count
+            self.count += 1
+            self.set_row(package_id, row)
+        self.package_ids[row] = package_id
+        view = PackageView(self, row)
+        view.location_name = location_name
+        view.address = address
+        view.delivery_address = address
+        view.city = city
+        view.state = state
+        view.zip_code = zip_code
+        view.deadline = deadline
+        view.weight = weight
+        view.special_notes = special_notes
+        view.delivery_status = delivery_status
+        view.delivery_time = delivery_time
+        view.departure_time = None
+        view.loaded = False
+        view.truck = None
+        return view
+
+    # Copy a Package object into the store and return its view
+    def add_package(self, package: Package) -> PackageView:
+        view = self.add(package.package_id, package.location_name, package.address, package.city, package.state, package.zip_code,
+                        package.deadline, package.weight, package.special_notes, package.delivery_status, package.delivery_time)
+        view.delivery_address = package.delivery_address
+        view.departure_time = package.departure_time
+        view.loaded = package.loaded
+        view.truck = package.truck
+        return view
+
+    # Get the view of a package by its ID, None if it isn't in the store
+    def get(self, package_id: int) -> Optional[PackageView]:
+        row = self.row_of(package_id)
+        return PackageView(self, row) if row is not None else None
+
+    # Remove a package by its ID and return its view (still readable), None if it isn't in the store
+    def remove(self, package_id: int) -> Optional[PackageView]:
+        row = self.row_of(package_id)
+        if row is None:
+            return None
+        self.set_row(package_id, None)
+        self.removed[row] = True
+        self.removed_count += 1
+        return PackageView(self, row)
+
+    # Get the column an indexed attribute is kept in
+    def column(self, attribute: str) -> np.ndarray:
+        if attribute in self.text_columns:
+            return self.text_columns[attribute]
+        return {"deadline": self.deadlines, "weight": self.weights, "delivery_status": self.status_codes,
+                "special_notes": self.special_notes}[attribute]
+
+    # Get the value an attribute's column holds for a value, None if no row can have it
+    def column_value(self, attribute: str, value: Any) -> Optional[Any]:
+        # Weights are numbers, like the weights of Package objects a text weight matches nothing
+        if attribute == "weight":
+            return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+        if attribute == "delivery_status":
+            return self.status_codes_by_name.get(value)
+        # Empty notes are stored as no string
+        if attribute == "special_notes" and not value:
+            return -1
+        if value is None:
+            return -1
+        return self.string_codes.get(value) if isinstance(value, str) else None
+
+    # Get the rows whose attribute has the given value with a binary search of the sorted rows
+    def rows_where(self, attribute: str, value: Any) -> np.ndarray:
+        code = self.column_value(attribute, value)
+        if code is None:
+            return np.zeros(0, dtype=np.int32)
+        column = self.column(attribute)[:self.count]
+        order = self.sorted_rows.get(attribute)
+        if order is None or len(order) != self.count:
+            order = self.sorted_rows[attribute] = np.argsort(column, kind="stable").astype(np.int32)
+        first = np.searchsorted(column, code, side="left", sorter=order)
+        last = np.searchsorted(column, code, side="right", sorter=order)
+        rows = order[first:last]
+        return rows[~self.removed[rows]]
+
+    # Get the views of the packages whose attribute has the given value, sorted by package ID
+    def find(self, attribute: str, value: Any) -> List[PackageView]:
+        rows = self.rows_where(attribute, value)
+        rows = rows[np.argsort(self.package_ids[rows], kind="stable")]
+        return [PackageView(self, row) for row in rows.tolist()]
+
+    # Rows of the packages in the store, in the order they were added
+    def live_rows(self) -> np.ndarray:
+        return np.flatnonzero(~self.removed[:self.count])
+
+    # Get the columns and the rest of the store for a SnapshotCache, returns (arrays, data)
+    # Delivery and departure times are not kept, a snapshot is taken before the day starts
+    def snapshot(self):
+        arrays = {name: getattr(self, name) for name in self.column_names}
+        arrays.update((f"text_{name}", column) for name, column in self.text_columns.items())
+        arrays["row_by_id"] = self.row_by_id
+        data = {"count": self.count, "removed_count": self.removed_count, "strings": self.strings,
+                "status_names": self.status_names, "other_rows": list(self.other_rows.items())}
+        return arrays, data
+
+    # Make a store from the arrays and data of a snapshot
+    # The columns are copied out of the memory-mapped files since the store writes to them
+    @classmethod
+    def from_snapshot(cls, arrays, data) -> "PackageStore":
+        store = cls(len(arrays["package_ids"]))
+        for name in cls.column_names:
+            setattr(store, name, np.array(arrays[name]))
+        for name in store.text_columns:
+            store.text_columns[name] = np.array(arrays[f"text_{name}"])
+        store.row_by_id = np.array(arrays["row_by_id"])
+        store.other_rows = {int(package_id): int(row) for package_id, row in data["other_rows"]}
+        store.count = data["count"]
+        store.removed_count = data["removed_count"]
+        store.strings = list(data["strings"])
+        store.string_codes = {value: code for code, value in enumerate(store.strings)}
+        store.status_names = list(data["status_names"])
+        store.status_codes_by_name = {status: code for code, status in enumerate(store.status_names)}
+        return store
+
+    # Get the package IDs whose status is the given status, straight from the status column
+    def package_ids_with_status(self, status: str) -> np.ndarray:
+        code = self.status_codes_by_name.get(status)
+        if code is None:
+            return np.zeros(0, dtype=np.int64)
+        return self.package_ids[:self.count][(self.status_codes[:self.count] == code) & ~self.removed[:self.count]]
+
+    # Get the package IDs due before a time given in seconds since midnight
+    def package_ids_due_before(self, seconds: int) -> np.ndarray:
+        deadlines = self.deadline_seconds[:self.count]
+        return self.package_ids[:self.count][(deadlines >= 0) & (deadlines < seconds) & ~self.removed[:self.count]]
+
+    # Get the number of packages in the store
+    def __len__(self) -> int:
+        return self.count - self.removed_count
+
+    # Iterate over the views of every package in the order they were added
+    def __iter__(self) -> Iterator[PackageView]:
+        if not self.removed_count:
+            return (PackageView(self, row) for row in range(self.count))
+        return (PackageView(self, row) for row in self.live_rows().tolist())
+
+    # Check if a package ID is in the store
+    def __contains__(self, package_id: int) -> bool:
+        return self.row_of(package_id) is not None
@@ -3,6 +3,10 @@ import csv
 
 class Package:
     # Package class to represent a package
+    # Slots instead of a per-object __dict__ keep each package small when there are many
+    __slots__ = ("package_id", "location_name", "address", "city", "state", "zip_code", "deadline", "weight",
+                 "special_notes", "delivery_status", "delivery_time", "departure_time", "delivery_address", "loaded", "truck")
+
     def __init__(self, package_id: int, location_name: str, address: str, city: str, state: str, zip_code: str, deadline: str, weight: float, special_notes: Optional[str] = None, delivery_status: str = "AT THE HUB", delivery_time: Optional[str] = None):
         # Setup the package with the package necessary information need to
         #track the package or deliver the package
@@ -44,7 +48,8 @@ class Package:
                     self.special_notes == other.special_notes and
                     self.delivery_status == other.delivery_status and
                     self.delivery_time == other.delivery_time)
-        return False
+        # Let other package types (e.g. store views) do the comparison
+        return NotImplemented
 
     # repr method to represent the package object
     def __repr__(self):
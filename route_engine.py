@@ -0,0 +1,247 @@
+from time import perf_counter
+import numpy as np
+
+class RouteEngine:
+    # RouteEngine class to build delivery routes over a distance matrix
+    # Most stops held_karp solves, its tables take 2^20 x 20 entries (about 190 MB) at this size
+    max_exact_stops = 20
+
+    def __init__(self, distance_matrix):
+        # Setup the engine with the graph's distance matrix (indexed by location index)
+        self.distance_matrix = distance_matrix
+
+    # Build a route using the Algorithm: Nearest Neighbor
+    # Returns the visiting order of the stop indexes and the distance of each leg,
+    # or (None, None) if a stop cannot be reached from the current location
+    def nearest_neighbor(self, start_index, stop_indexes):
+        # Sort the stops so ties go to the lowest location index
+        stops = np.unique(np.asarray(stop_indexes, dtype=np.intp))
+        # Boolean mask of the stops that still need to be visited
+        remaining = np.ones(len(stops), dtype=bool)
+        order = np.empty(len(stops), dtype=np.intp)
+        legs = np.empty(len(stops), dtype=np.float64)
+        current = start_index
+
+        # Loop until all stops have been visited
+        for step in range(len(stops)):
+            row = self.distance_matrix[current, stops]
+            # A zero distance to another location means there is no edge between them
+            reachable = remaining & ((row > 0) | (stops == current))
+            candidates = np.where(reachable, row, np.inf)
+            nearest = int(np.argmin(candidates))
+            # If no stop can be reached, let the caller report the connectivity issue
+            if not np.isfinite(candidates[nearest]):
+                return None, None
+            # Move to the nearest stop and remove it from the remaining stops
+            remaining[nearest] = False
+            current = stops[nearest]
+            order[step] = current
+            legs[step] = row[nearest]
+        return order, legs
+
+    # Distance of each leg when driving from start_index through the stops in order
+    def leg_distances(self, start_index, order):
+        order = np.asarray(order, dtype=np.intp)
+        previous = np.concatenate(([start_index], order))[:-1]
+        return self.distance_matrix[previous, order]
+
+    # Total length of a path that visits the location indexes in order
+    def path_length(self, path):
+        path = np.asarray(path, dtype=np.intp)
+        if len(path) < 2:
+            return 0.0
+        return float(self.distance_matrix[path[:-1], path[1:]].sum())
+
+    # Find where a stop adds the least distance to a path of location indexes
+    # Returns the position to insert it at and the distance it adds, the path's first location
+    # always stays first so a stop is never put behind where the truck already is
+    def cheapest_insertion(self, path, stop_index):
+        path = np.asarray(path, dtype=np.intp)
+        added = self.distance_matrix[path[:-1], stop_index] + self.distance_matrix[stop_index, path[1:]] - self.distance_matrix[path[:-1], path[1:]]
+        position = int(np.argmin(added))
+        return position + 1, float(added[position])
+
+    # Improve a route with 2-opt and Or-opt moves (local search)
+    # The route starts at start_index, visits the stops in order and ends at end_index,
+    # both ends stay fixed. Every move is scored with a constant-time delta against the
+    # distance matrix, only trying neighbors from each stop's nearest-neighbor list
+    # With a deadline (a perf_counter time) the search stops as soon as it is past it, even in the
+    # middle of a pass, keeping the moves made so far
+    def improve(self, start_index, order, end_index, neighbor_count=8, max_passes=50, deadline=None):
+        # Every position in the path gets a slot so the start and end can be the same location
+        path_nodes = np.concatenate(([start_index], np.asarray(order, dtype=np.intp), [end_index]))
+        size = len(path_nodes)
+        if size < 4:
+            return np.asarray(order, dtype=np.intp)
+        # Distances between slots, a zero between different locations means there is no edge
+        slot_distances = self.distance_matrix[np.ix_(path_nodes, path_nodes)].astype(np.float64)
+        same_location = path_nodes[:, None] == path_nodes[None, :]
+        slot_distances[(slot_distances <= 0) & ~same_location] = np.inf
+        neighbors = self.neighbor_lists(slot_distances, neighbor_count)
+        if deadline is not None and perf_counter() > deadline:
+            return np.asarray(order, dtype=np.intp)
+
+        # Current tour of slots and the position of each slot in it
+        tour = list(range(size))
+        position = list(range(size))
+        # Keep improving until neither move type finds a shorter route
+        for _ in range(max_passes):
+            improved_two_opt = self.two_opt_pass(tour, position, slot_distances, neighbors, deadline)
+            improved_or_opt = self.or_opt_pass(tour, position, slot_distances, neighbors, deadline)
+            if not improved_two_opt and not improved_or_opt:
+                break
+            if deadline is not None and perf_counter() > deadline:
+                break
+        return path_nodes[tour[1:-1]]
+
+    # Build the nearest-neighbor list of every slot, closest first
+    def neighbor_lists(self, slot_distances, neighbor_count):
+        size = len(slot_distances)
+        count = min(neighbor_count, size - 1)
+        # A slot is not its own neighbor, hide the diagonal in place instead of copying the matrix
+        diagonal = slot_distances.diagonal().copy()
+        np.fill_diagonal(slot_distances, np.inf)
+        nearest = np.argpartition(slot_distances, count - 1, axis=1)[:, :count]
+        rows = np.arange(size)[:, None]
+        nearest = np.take_along_axis(nearest, np.argsort(slot_distances[rows, nearest], axis=1), axis=1)
+        np.fill_diagonal(slot_distances, diagonal)
+        return nearest.tolist()
+
+    # One pass of 2-opt moves: reverse a part of the route to remove two crossing legs
+    # The pass ends early once it is past the deadline
+    def two_opt_pass(self, tour, position, slot_distances, neighbors, deadline=None):
+        size = len(tour)
+        improved = False
+        for i in range(size - 2):
+            if deadline is not None and perf_counter() > deadline:
+                break
+            a = tour[i]
+            a_next = tour[i + 1]
+            current_leg = slot_distances[a, a_next]
+            for c in neighbors[a]:
+                # Neighbors are sorted, so no later neighbor can shorten the leg from a
+                if slot_distances[a, c] >= current_leg:
+                    break
+                j = position[c]
+                if i + 1 < j <= size - 2:
+                    # Reverse tour[i + 1 .. j]: legs (a, a_next), (c, c_next) become (a, c), (a_next, c_next)
+                    c_next = tour[j + 1]
+                    delta = (slot_distances[a, c] + slot_distances[a_next, c_next]
+                             - current_leg - slot_distances[c, c_next])
+                    first, last = i + 1, j
+                elif j < i - 1:
+                    # Reverse tour[j + 1 .. i]: legs (c, c_next), (a, a_next) become (c, a), (c_next, a_next)
+                    c_next = tour[j + 1]
+                    delta = (slot_distances[c, a] + slot_distances[c_next, a_next]
+                             - slot_distances[c, c_next] - current_leg)
+                    first, last = j + 1, i
+                else:
+                    continue
+                if delta < -1e-9:
+                    tour[first:last + 1] = tour[first:last + 1][::-1]
+                    for k in range(first, last + 1):
+                        position[tour[k]] = k
+                    improved = True
+                    break
+        return improved
+
+    # One pass of Or-opt moves: move a run of 1 to 3 stops to a cheaper place in the route
+    # The pass ends early once it is past the deadline
+    def or_opt_pass(self, tour, position, slot_distances, neighbors, deadline=None):
+        improved = False
+        for segment_length in (1, 2, 3):
+            s = 1
+            while s + segment_length - 1 <= len(tour) - 2:
+                if deadline is not None and perf_counter() > deadline:
+                    return improved
+                e = s + segment_length - 1
+                before, first, last, after = tour[s - 1], tour[s], tour[e], tour[e + 1]
+                # Distance saved by taking the segment out of the route
+                removal_gain = (slot_distances[before, first] + slot_distances[last, after]
+                                - slot_distances[before, after])
+                best_delta, best_insert, best_reverse = -1e-9, None, False
+                if removal_gain > 1e-9:
+                    for c in neighbors[first] + neighbors[last]:
+                        k = position[c]
+                        # Try the legs on either side of the neighbor
+                        for insert_at in (k - 1, k):
+                            if insert_at < 0 or insert_at > len(tour) - 2 or s - 1 <= insert_at <= e:
+                                continue
+                            p, q = tour[insert_at], tour[insert_at + 1]
+                            forward = slot_distances[p, first] + slot_distances[last, q] - slot_distances[p, q]
+                            backward = slot_distances[p, last] + slot_distances[first, q] - slot_distances[p, q]
+                            delta = min(forward, backward) - removal_gain
+                            if delta < best_delta:
+                                best_delta, best_insert, best_reverse = delta, insert_at, backward < forward
+                if best_insert is None:
+                    s += 1
+                    continue
+                # Move the segment between tour[best_insert] and tour[best_insert + 1]
+                segment = tour[s:e + 1]
+                if best_reverse:
+                    segment.reverse()
+                anchor = tour[best_insert]
+                del tour[s:e + 1]
+                insert_position = tour.index(anchor) + 1
+                tour[insert_position:insert_position] = segment
+                for k, slot in enumerate(tour):
+                    position[slot] = k
+                improved = True
+        return improved
+
+    # Find the shortest route with the Algorithm: Held-Karp (bitmask dynamic programming)
+    # The route starts at start_index, visits every stop once and ends at end_index.
+    # Memory and time grow with 2^stops, so only use it for small stop sets (at most max_exact_stops)
+    def held_karp(self, start_index, stop_indexes, end_index):
+        stops = np.unique(np.asarray(stop_indexes, dtype=np.intp))
+        count = len(stops)
+        if count == 0:
+            return stops, 0.0
+        # The cap also keeps every stop number inside the int8 parent table
+        if count > self.max_exact_stops:
+            raise ValueError(f"Held-Karp is limited to {self.max_exact_stops} stops, got {count}")
+        # Distances between stops, a zero between different locations means there is no edge
+        stop_distances = self.distance_matrix[np.ix_(stops, stops)].astype(np.float64)
+        stop_distances[stop_distances <= 0] = np.inf
+        from_start = self.distance_matrix[start_index, stops].astype(np.float64)
+        from_start[(from_start <= 0) & (stops != start_index)] = np.inf
+        to_end = self.distance_matrix[stops, end_index].astype(np.float64)
+        to_end[(to_end <= 0) & (stops != end_index)] = np.inf
+
+        # cost[mask, j]: shortest path from the start through the stops in mask ending at stop j
+        full_mask = (1 << count) - 1
+        cost = np.full((full_mask + 1, count), np.inf)
+        parent = np.full((full_mask + 1, count), -1, dtype=np.int8)
+        singles = np.arange(count)
+        cost[1 << singles, singles] = from_start
+
+        # Number of stops in every mask, used to fill the table one subset size at a time
+        masks = np.arange(full_mask + 1)
+        stop_counts = np.zeros(full_mask + 1, dtype=np.int8)
+        for j in range(count):
+            stop_counts += (masks >> j) & 1
+        for subset_size in range(2, count + 1):
+            layer = masks[stop_counts == subset_size]
+            for j in range(count):
+                # Masks in this layer that end at stop j, and the same masks without j
+                ending = layer[(layer >> j) & 1 == 1]
+                previous = ending ^ (1 << j)
+                candidates = cost[previous] + stop_distances[:, j]
+                best = np.argmin(candidates, axis=1)
+                cost[ending, j] = candidates[np.arange(len(ending)), best]
+                parent[ending, j] = best
+
+        # Close the route at the end location and walk the parents back to the start
+        totals = cost[full_mask] + to_end
+        last = int(np.argmin(totals))
+        best_total = float(totals[last])
+        if not np.isfinite(best_total):
+            return None, None
+        order = []
+        mask = full_mask
+        while last >= 0:
+            order.append(last)
+            previous_last = int(parent[mask, last])
+            mask ^= 1 << last
+            last = previous_last
+        return stops[order[::-1]], best_total
@@ -0,0 +1,126 @@
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from graph import Graph
+from simulation import DeliverySimulation
+from snapshot_cache import SnapshotCache
+from truck_assignment import TruckAssignment
+
+# Graph each worker process runs its scenarios on, built once per worker
+worker_graph = None
+
+# Build (or load from the snapshot cache) the graph a worker reuses for every scenario
+def init_worker(cache_dir):
+    global worker_graph
+    worker_graph = Graph()
+    worker_graph.setup(SnapshotCache(cache_dir) if cache_dir else None)
+
+# Run the day for one scenario and measure it, returns the scenario with its results added
+def run_scenario(scenario, package_file="data/WGUPS_Package_File.csv", graph=None):
+    graph = graph if graph is not None else worker_graph
+    simulation = DeliverySimulation(package_file, graph=graph, auto_assign=True,
+                                    num_trucks=scenario["num_trucks"], num_drivers=scenario["num_drivers"],
+                                    speed=scenario["speed"], capacity=scenario["capacity"],
+                                    departure_offsets=list(scenario["departure_offsets"]))
+    results = simulation.run()
+    timeline = results["status_timeline"]
+    parse_time = TruckAssignment(graph).parse_time
+    on_time = 0
+    packages = simulation.all_packages
+    for package in packages:
+        deadline = parse_time(package.deadline)
+        statuses = timeline.statuses.get(package.package_id, [])
+        if "DELIVERED" not in statuses:
+            continue
+        delivered = timeline.times[package.package_id][statuses.index("DELIVERED")]
+        # EOD packages are on time whenever they are delivered
+        if deadline is None or delivered <= deadline.hour * 3600 + deadline.minute * 60 + deadline.second:
+            on_time += 1
+    # The day is over when the last truck is back at the hub
+    return_times = [truck["return_time"] for truck in results["trucks"].values() if truck["return_time"] is not None]
+    return dict(scenario,
+                total_miles=round(results["combined_total_distance"], 1),
+                on_time_rate=on_time / len(packages) if packages else 1.0,
+                finish_time=max(return_times).time() if return_times else None)
+
+class ScenarioSweep:
+    # ScenarioSweep class to run the headless simulation for many what-if scenarios at once
+    # A scenario sets the fleet (number of trucks and drivers, speed, capacity) and the
+    # departure offsets in minutes after 8:00. Scenarios come from a full grid or a random
+    # sample of the choices and run on a pool of processes, each building the graph only once
+    # With workers=0 the scenarios run one after another in this process
+    default_choices = {
+        "departure_offsets": [(0, 75, 180), (0, 0, 0), (0, 30, 60), (0, 65, 120), (30, 90, 150)],
+        "speed": [15, 18, 21, 25],
+        "capacity": [12, 16, 20],
+        "num_trucks": [2, 3, 4],
+        "num_drivers": [1, 2, 3],
+    }
+
+    def __init__(self, package_file="data/WGUPS_Package_File.csv", workers=None, cache_dir=".snapshot_cache"):
+        self.package_file = package_file
+        # Number of worker processes, None for one per CPU
+        self.workers = workers
+        self.cache_dir = cache_dir
+
+    # Get the choices for every parameter, given ones replace the defaults
+    def choices(self, **choices):
+        unknown = set(choices) - set(self.default_choices)
+        if unknown:
+            raise ValueError(f"Unknown scenario parameters: {', '.join(sorted(unknown))}")
+        return {name: list(choices.get(name, values)) for name, values in self.default_choices.items()}
+
+    # Every combination of the choices
+    def grid(self, **choices):
+        choices = self.choices(**choices)
+        return [dict(zip(choices, values)) for values in itertools.product(*choices.values())]
+
+    # count random combinations of the choices, the same seed gives the same scenarios
+    def sample(self, count, seed=0, **choices):
+        choices = self.choices(**choices)
+        rng = np.random.default_rng(seed)
+        picks = {name: rng.integers(len(values), size=count) for name, values in choices.items()}
+        return [{name: choices[name][int(picks[name][index])] for name in choices} for index in range(count)]
+
+    # Run every scenario, returns their results best first
+    def run(self, scenarios):
+        if self.workers == 0:
+            init_worker(self.cache_dir)
+            results = [run_scenario(scenario, self.package_file) for scenario in scenarios]
+        else:
+            # Save the graph snapshot first so the workers load it instead of parsing the CSV files
+            if self.cache_dir:
+                Graph().setup(SnapshotCache(self.cache_dir))
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker, initargs=(self.cache_dir,)) as pool:
+                results = list(pool.map(run_scenario, scenarios, itertools.repeat(self.package_file), chunksize=max(1, len(scenarios) // (8 * (self.workers or os.cpu_count() or 1)))))
+        return self.rank(results)
+
+    # Sort results by on-time rate, then total miles, then finish time
+    def rank(self, results):
+        return sorted(results, key=lambda result: (-result["on_time_rate"], result["total_miles"], str(result["finish_time"])))
+
+    # Get a text table of the results
+    def table(self, results, limit=None):
+        lines = [f"{'rank':>4} {'trucks':>6} {'drivers':>7} {'speed':>5} {'capacity':>8} {'departures':18} {'miles':>8} {'on time':>8} {'finish':>9}"]
+        for rank, result in enumerate(results[:limit], 1):
+            departures = ",".join(str(offset) for offset in result["departure_offsets"])
+            finish = result["finish_time"].strftime("%H:%M:%S") if result["finish_time"] else "-"
+            lines.append(f"{rank:>4} {result['num_trucks']:>6} {result['num_drivers']:>7} {result['speed']:>5} {result['capacity']:>8} {departures:18} "
+                         f"{result['total_miles']:>8.1f} {result['on_time_rate']:>8.1%} {finish:>9}")
+        return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the delivery day for many what-if scenarios and rank them")
+    parser.add_argument("--sample", type=int, default=None, help="run this many random scenarios instead of the full grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, 0 runs in this process")
+    parser.add_argument("--package-file", default="data/WGUPS_Package_File.csv")
+    parser.add_argument("--top", type=int, default=20, help="rows of the ranked table to show")
+    args = parser.parse_args()
+    sweep = ScenarioSweep(args.package_file, workers=args.workers)
+    scenarios = sweep.sample(args.sample, args.seed) if args.sample else sweep.grid()
+    results = sweep.run(scenarios)
+    print(f"Ran {len(results)} scenarios")
+    print(sweep.table(results, args.top))
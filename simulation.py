@@ -0,0 +1,301 @@
+from datetime import datetime, timedelta
+from time import sleep
+from event_scheduler import EventScheduler
+from package_setup import PackageSetup
+from graph import Graph
+from trucks import Truck
+from driver import Driver
+from truck_assignment import TruckAssignment
+from status_timeline import StatusTimeline, filter_duplicate_statuses
+from snapshot_cache import SnapshotCache
+from instrumentation import instrumentation
+from fleet_router import FleetRouter
+from event_log import EventLog
+
+class DeliverySimulation:
+    # DeliverySimulation class to run the day's deliveries without the UI
+    # Runs in virtual time: with realtime off there are no pauses, no console prompts
+    # and no printing, so a full day takes milliseconds and can run in tests or scripts
+    # With auto_assign the truck loads come from the package file's constraints instead of the fixed lists
+    # With columnar the packages are kept in a PackageStore to save memory on large manifests
+    # With cache_dir the parsed graph and package file are saved there and loaded on the next start while the CSV files are unchanged
+    # With metrics_path the hot paths are timed and counted, and every run's metrics are saved there (.json or Prometheus text)
+    # num_trucks, num_drivers, speed, capacity and departure_offsets (minutes after the start time, one per truck)
+    # change the fleet for what-if runs, the defaults are today's plan. Pass graph to reuse an already built graph
+    # With event_log_path every status change is also appended to that binary EventLog, so the history outlives the run
+    # With route_workers the routes are built on a FleetRouter pool that is started once and reused by every run,
+    # close the simulation (or use it in a with block) to stop it. Pass router to share a FleetRouter between simulations
+    def __init__(self, package_file="data/WGUPS_Package_File.csv", decisions=None, sinks=None, realtime=False, auto_assign=False, columnar=False, cache_dir=None, metrics_path=None, route_workers=0,
+                 graph=None, num_trucks=3, num_drivers=2, speed=None, capacity=None, departure_offsets=None, event_log_path=None, router=None):
+        self.auto_assign = auto_assign
+        # Processes used to build the truck routes, 0 builds them one after another in this process
+        self.route_workers = route_workers
+        # FleetRouter building the routes, the simulation only closes a router it started itself
+        self.router = router
+        self.owns_router = False
+        # Where each run's timings and counters are saved, "{run}" is replaced by the run number
+        self.metrics_path = metrics_path
+        self.run_count = 0
+        if metrics_path:
+            instrumentation.reset()
+            instrumentation.enable()
+        self.departure_offsets = departure_offsets
+        self.event_log_path = event_log_path
+        # Setup the graph and setup location data, from a snapshot in cache_dir when there is one
+        cache = SnapshotCache(cache_dir) if cache_dir else None
+        if graph is None:
+            graph = Graph()
+            graph.setup(cache)
+        self.graph = graph
+
+        # Setup package setup and load packages from CSV (or its snapshot), reusing the graph's address map
+        self.package_setup = PackageSetup(package_file, columnar=columnar, address_names=self.graph.address_names, cache=cache)
+        self.all_packages = self.package_setup.get_all_packages()
+
+        # Used for storing package status over time
+        self.package_status_over_time = {}
+        self.status_timeline = StatusTimeline()
+
+        # Start from an empty fleet so repeated runs in one process don't see old trucks
+        Truck.trucks.clear()
+        # Initialize trucks with the graph and all packages
+        self.trucks = [Truck(f"Truck {number}", self.graph, [], self.all_packages) for number in range(1, num_trucks + 1)]
+        self.truck1, self.truck2, self.truck3 = (self.trucks + [None] * 3)[:3]
+        for truck in self.trucks:
+            if speed is not None:
+                truck.speed = speed
+            if capacity is not None:
+                truck.capacity = capacity
+
+        # Initialize drivers and assign them to the first trucks, the other trucks wait for a driver
+        self.drivers = [Driver(f"Driver {number}") for number in range(1, num_drivers + 1)]
+        self.driver1, self.driver2 = (self.drivers + [None] * 2)[:2]
+        for driver, truck in zip(self.drivers, self.trucks):
+            driver.assign_truck(truck)
+
+        # Realtime keeps the console behavior: printing, pauses and asking about package #9
+        # Where the simulation's own messages go, the trucks get the same sinks
+        self.sinks = ([print] if realtime else []) if sinks is None else sinks
+        for truck in self.trucks:
+            truck.sinks = self.sinks
+            if realtime:
+                truck.decisions = decisions
+            else:
+                truck.stop_delay = 0
+                truck.update_delay = 0
+                # Apply the 10:20 address correction unless told otherwise
+                truck.decisions = {"package_9": "yes"} if decisions is None else decisions
+
+    # Run the day's deliveries and return the results of each truck
+    # All trucks drive at the same time on one virtual clock, pass until to stop the
+    # day early and look at the statuses and mileage at that instant. on_event is called
+    # with every event as it runs, e.g. to show progress while the day is still going
+    def run(self, start_time_str=None, until=None, on_event=None):
+        self.package_9_has_been_updated = False
+
+        # Start deliveries at 8:00 AM
+        day = datetime.combine(datetime.today(), datetime.min.time())
+        base_start_time = day + timedelta(hours=8)
+        start_time = datetime.combine(day, datetime.strptime(start_time_str, "%H:%M:%S").time()) if start_time_str else base_start_time
+        # To store status over time and combined total distance
+        self.package_status_over_time = {}
+        self.combined_total_distance = [0]
+
+        # Set staggered departure times
+        if self.departure_offsets is None:
+            departure_times = [
+                start_time,
+                start_time + timedelta(hours=1, minutes=15),
+                day + timedelta(hours=11, minutes=00),
+            ]
+        else:
+            departure_times = [start_time + timedelta(minutes=offset) for offset in self.departure_offsets]
+        # Trucks without a departure time of their own leave with the last one
+        departure_times = (departure_times + departure_times[-1:] * len(self.trucks))[:len(self.trucks)]
+
+        # Load the trucks, either from the package constraints or from the fixed lists
+        if self.auto_assign:
+            fleet = {"capacity": self.trucks[0].capacity, "speed": self.trucks[0].speed} if self.trucks else {}
+            assignment = TruckAssignment(self.graph, **fleet)
+            loads = assignment.assign(self.all_packages, {truck.truck_id: departure_time.time() for truck, departure_time in zip(self.trucks, departure_times)})
+            for package_id in assignment.unassigned:
+                for sink in self.sinks:
+                    sink(f"Package #{package_id} could not be loaded on any truck")
+            for package_id in assignment.late:
+                for sink in self.sinks:
+                    sink(f"Package #{package_id} is planned to arrive after its deadline")
+            for truck in self.trucks:
+                truck.load_packages_by_id(loads[truck.truck_id])
+        else:
+            for truck in self.trucks:
+                truck.load_packages_by_id()
+        # Loading sets the package statuses, bring the package indexes up to date
+        for truck in self.trucks:
+            for package in truck.packages:
+                self.package_setup.reindex(package)
+
+        # Start delivery routes for each truck
+        if self.route_workers and self.router is None:
+            self.router = FleetRouter(self.graph, workers=self.route_workers)
+            self.owns_router = True
+        if self.router is not None:
+            routes = self.router.route({truck.truck_id: (truck.delivery_nodes, truck.current_location) for truck in self.trucks})
+            for truck in self.trucks:
+                _, truck.delivery_route = routes[truck.truck_id]
+        else:
+            for truck in self.trucks:
+                _, truck.delivery_route = self.graph.start_delivery_route(truck.delivery_nodes, truck.current_location)
+
+        # Setup the event scheduler with a handler for every kind of event
+        self.scheduler = EventScheduler()
+        self.scheduler.on("depart", self.handle_depart)
+        self.scheduler.on("arrive", self.handle_arrive)
+        self.scheduler.on("deliver", self.handle_deliver)
+        self.scheduler.on("return", self.handle_return)
+        self.scheduler.on("address_correction", self.handle_address_correction)
+        if on_event is not None:
+            self.scheduler.listen(on_event)
+        self.departed = set()
+        self.return_times = {}
+        # Trucks at the hub waiting for a driver to come back
+        self.waiting_trucks = []
+        for truck, departure_time in zip(self.trucks, departure_times):
+            self.scheduler.schedule(departure_time, "depart", truck, first=True)
+        # The address of package #9 is corrected at 10:20 for whichever truck carries it
+        self.scheduler.schedule(day + timedelta(hours=10, minutes=20), "address_correction", package_id=9)
+        status_log = EventLog(self.event_log_path, self.graph.location_index) if self.event_log_path else None
+        for truck in self.trucks:
+            truck.status_log = status_log
+        try:
+            events = self.scheduler.run(until)
+        finally:
+            if status_log is not None:
+                status_log.close()
+            for truck in self.trucks:
+                truck.status_log = None
+
+        # Filter out duplicate statuses
+        filter_duplicate_statuses(self.package_status_over_time)
+        # Index the statuses by time for point-in-time and time frame lookups
+        self.status_timeline = StatusTimeline.from_status_history(self.package_status_over_time)
+
+        truck_results = {}
+        for truck, departure_time in zip(self.trucks, departure_times):
+            truck_results[truck.truck_id] = {
+                "departure_time": departure_time,
+                "return_time": self.return_times.get(truck.truck_id),
+                "hours": getattr(truck, "drive_distance", 0) / truck.speed,
+                "distance": getattr(truck, "drive_distance", 0),
+                "delivery_process": getattr(truck, "delivery_process", []),
+                "current_locations": getattr(truck, "current_locations", []),
+            }
+
+        results = {
+            "trucks": truck_results,
+            "combined_total_distance": self.combined_total_distance[0],
+            "package_status_over_time": self.package_status_over_time,
+            "status_timeline": self.status_timeline,
+            "package_9_has_been_updated": self.package_9_has_been_updated,
+            "events": events,
+            "delivery_process": [event["status"] for event in events if event.get("status")],
+        }
+        # Save this run's metrics and start counting the next run from zero
+        self.run_count += 1
+        if self.metrics_path and instrumentation.enabled:
+            results["metrics"] = instrumentation.to_dict()
+            results["metrics_summary"] = instrumentation.summary()
+            instrumentation.export(self.metrics_path.format(run=self.run_count))
+            instrumentation.reset()
+        return results
+
+    # Stop the route workers the simulation started
+    def close(self):
+        if self.owns_router:
+            self.router.close()
+            self.router = None
+            self.owns_router = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    # A truck leaves its current location for the next stop on its route
+    def handle_depart(self, event, truck):
+        if event.get("first"):
+            # A truck without a driver takes the first driver back at the hub (Driver 1 moves
+            # from Truck 1 to Truck 3 today), or waits until a driver gets back
+            if not any(driver.truck is truck for driver in self.drivers):
+                driver = self.free_driver()
+                if driver is None:
+                    self.waiting_trucks.append(truck)
+                    event["waiting"] = True
+                    return
+                driver.assign_truck(truck)
+            truck.begin_route(event["time"], self.package_status_over_time)
+            self.departed.add(truck.truck_id)
+        if truck.delivery_route.empty():
+            return
+        next_delivery, arrival_time = truck.next_stop(event["time"])
+        event["location"] = truck.current_location
+        event["next_location"] = next_delivery[0]
+        # The last leg of the route brings the truck back to the hub
+        kind = "return" if truck.delivery_route.empty() and next_delivery[0] == "Western Governors University" else "arrive"
+        self.scheduler.schedule(arrival_time, kind, truck, stop=next_delivery)
+
+    # A truck gets to a stop, the leg is added to its mileage
+    def handle_arrive(self, event, truck):
+        truck.arrive_at_stop(event["stop"], self.combined_total_distance)
+        self.record_position(event, truck)
+        self.scheduler.schedule(event["time"], "deliver", truck, stop=event["stop"])
+
+    # A truck delivers the packages for its stop and heads on
+    def handle_deliver(self, event, truck):
+        truck.deliver_at_stop(event["stop"], event["time"], self.package_setup, self.package_status_over_time, self.combined_total_distance)
+        event["status"] = truck.delivery_process[-1]
+        if truck.stop_delay:
+            sleep(truck.stop_delay)
+        self.scheduler.schedule(event["time"], "depart", truck)
+
+    # A truck gets back to the hub at the end of its route
+    def handle_return(self, event, truck):
+        truck.arrive_at_stop(event["stop"], self.combined_total_distance)
+        truck.deliver_at_stop(event["stop"], event["time"], self.package_setup, self.package_status_over_time, self.combined_total_distance)
+        self.record_position(event, truck)
+        event["status"] = truck.delivery_process[-1]
+        self.return_times[truck.truck_id] = event["time"]
+        # The driver is free again, the first waiting truck leaves now
+        if self.waiting_trucks:
+            self.scheduler.schedule(event["time"], "depart", self.waiting_trucks.pop(0), first=True)
+
+    # Get the first driver whose truck is back at the hub (or who has no truck), None if all are driving
+    def free_driver(self):
+        for driver in self.drivers:
+            if driver.truck is None or driver.truck.truck_id in self.return_times:
+                return driver
+        return None
+
+    # Correct a package's address for the truck that carries it
+    def handle_address_correction(self, event, truck):
+        package = self.package_setup.get_package_by_id(event["package_id"])
+        carrier = next((truck for truck in self.trucks if package and truck.truck_id == package.truck), None)
+        if carrier is None:
+            return
+        event["truck_id"] = carrier.truck_id
+        old_location = package.location_name
+        self.package_9_has_been_updated, _ = carrier.update_package_9(self.package_setup, carrier.packages)
+        # A truck still waiting at the hub gets its route rebuilt with the corrected address
+        if carrier.truck_id not in self.departed:
+            _, carrier.delivery_route = self.graph.start_delivery_route(carrier.delivery_nodes, carrier.current_location)
+        # A truck already out gets the corrected stop patched into the rest of its route
+        elif self.package_9_has_been_updated:
+            corrected = self.package_setup.get_package_by_id(event["package_id"])
+            event["mileage_delta"] = carrier.repair_route([old_location], [corrected.location_name])
+
+    # Add the truck's location and the mileage at this instant to the event
+    def record_position(self, event, truck):
+        event["location"] = event["stop"][0]
+        event["truck_distance"] = truck.drive_distance
+        event["combined_total_distance"] = self.combined_total_distance[0]
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+
+class SnapshotCache:
+    # SnapshotCache class to save parsed data as binary files and load it back quickly
+    # Every snapshot is stored under a key made from the contents of its source files, so
+    # editing a source file changes the key and the old snapshot is no longer used.
+    # Arrays are saved as .npy files and loaded memory-mapped, the rest as JSON
+    version = 1
+
+    def __init__(self, cache_dir=".snapshot_cache"):
+        self.cache_dir = cache_dir
+
+    # Hash the contents of the source files (and any extra settings) into a key
+    def key(self, source_paths, *settings):
+        digest = hashlib.sha256(f"snapshot-v{self.version}".encode())
+        for path in source_paths:
+            with open(path, "rb") as file:
+                for block in iter(lambda: file.read(1 << 20), b""):
+                    digest.update(block)
+            # Separate the files so moving bytes between them changes the key
+            digest.update(b"\0")
+        for setting in settings:
+            digest.update(repr(setting).encode())
+        return digest.hexdigest()[:32]
+
+    # Get the folder holding a snapshot
+    def path(self, name, key):
+        return os.path.join(self.cache_dir, f"{name}-{key}")
+
+    # Load a snapshot, returns (arrays, data) or None if there is no snapshot for the key
+    def load(self, name, key):
+        folder = self.path(name, key)
+        try:
+            with open(os.path.join(folder, "data.json")) as file:
+                data = json.load(file)
+            arrays = {array_name: np.load(os.path.join(folder, f"{array_name}.npy"), mmap_mode="r") for array_name in data.pop("arrays")}
+        except (OSError, ValueError, KeyError) as error:
+            if os.path.isdir(folder):
+                print(f"Error: Ignoring unreadable snapshot {folder}: {error}")
+            return None
+        return arrays, data
+
+    # Save a snapshot and remove the older snapshots with the same name
+    def save(self, name, key, arrays, data):
+        folder = self.path(name, key)
+        # Write into a temporary folder first so a crash never leaves half a snapshot
+        temporary = f"{folder}.tmp{os.getpid()}"
+        try:
+            os.makedirs(temporary, exist_ok=True)
+            for array_name, array in arrays.items():
+                np.save(os.path.join(temporary, f"{array_name}.npy"), np.ascontiguousarray(array))
+            with open(os.path.join(temporary, "data.json"), "w") as file:
+                json.dump(dict(data, arrays=list(arrays)), file)
+            shutil.rmtree(folder, ignore_errors=True)
+            os.replace(temporary, folder)
+        except OSError as error:
+            print(f"Error: Could not save snapshot {folder}: {error}")
+            shutil.rmtree(temporary, ignore_errors=True)
+            return
+        # Snapshots of older versions of the source files can never be used again
+        for entry in os.listdir(self.cache_dir):
+            if entry.startswith(f"{name}-") and entry != os.path.basename(folder) and ".tmp" not in entry:
+                shutil.rmtree(os.path.join(self.cache_dir, entry), ignore_errors=True)
@@ -0,0 +1,54 @@
+import json
+import os
+import subprocess
+import sys
+
+# Code run in a fresh interpreter so every measurement starts with nothing imported
+# The networkx export is only built when export is True
+STARTUP_SCRIPT = """
+import json, sys, time, tracemalloc
+export = sys.argv[1] == "1"
+tracemalloc.start()
+start = time.perf_counter()
+from simulation import DeliverySimulation
+imported = time.perf_counter()
+simulation = DeliverySimulation()
+ready = time.perf_counter()
+if export:
+    simulation.graph.graph
+exported = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - start,
+    "setup_seconds": ready - imported,
+    "export_seconds": exported - ready,
+    "total_seconds": exported - start,
+    "peak_mb": tracemalloc.get_traced_memory()[1] / 1e6,
+    "networkx_imported": "networkx" in sys.modules,
+}))
+"""
+
+# Run the startup in a new process and return its measurements
+# cwd is the folder holding the data folder, the code is always imported from this repository
+def measure_startup(export, cwd=None):
+    environment = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, "1" if export else "0"],
+                            cwd=cwd, env=environment, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+# Compare starting the simulation without and with the networkx export, best of repeats runs
+def run_startup_benchmark(repeats=5, cwd=None):
+    results = {}
+    for name, export in (("core", False), ("with_networkx", True)):
+        runs = [measure_startup(export, cwd) for _ in range(repeats)]
+        best = min(runs, key=lambda run: run["total_seconds"])
+        results[name] = best
+    return results
+
+if __name__ == "__main__":
+    results = run_startup_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
+    for name, result in results.items():
+        print(f"{name}: total {result['total_seconds'] * 1000:.1f} ms (import {result['import_seconds'] * 1000:.1f} ms, "
+              f"setup {result['setup_seconds'] * 1000:.1f} ms, networkx export {result['export_seconds'] * 1000:.1f} ms), "
+              f"peak {result['peak_mb']:.1f} MB, networkx imported: {result['networkx_imported']}")
+    saved = results["with_networkx"]["total_seconds"] - results["core"]["total_seconds"]
+    print(f"Skipping networkx saves {saved * 1000:.1f} ms at startup")
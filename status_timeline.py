@@ -0,0 +1,176 @@
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, time
+import numpy as np
+
+# Keep only the first time each status shows up for every package, for the whole fleet's
+# package_status_over_time dict of (time, status) lists
+def filter_duplicate_statuses(package_status_over_time):
+    for package_id, statuses in package_status_over_time.items():
+        seen_statuses = set()
+        unique_statuses = []
+        for time, status in statuses:
+            # Only add unique statuses
+            if status not in seen_statuses:
+                unique_statuses.append((time, status))
+                seen_statuses.add(status)
+        # Update the package status over time
+        package_status_over_time[package_id] = unique_statuses
+
+class StatusTimeline:
+    # StatusTimeline class to answer "what was the status at time T" questions quickly
+    # Every package keeps its status changes sorted by time, so the status at any time is
+    # one bisect. A global time index answers "what changed between two times", and a
+    # grid of snapshots answers "status of every package at T" without replaying the day
+    def __init__(self, snapshot_interval=300):
+        # Seconds between the precomputed snapshots of all packages
+        self.snapshot_interval = snapshot_interval
+        # package ID -> sorted change times (seconds since midnight) and the matching statuses
+        self.times = {}
+        self.statuses = {}
+        # Global index of (seconds, package ID, status) for every change, sorted by time
+        self.transitions = []
+        # Status names and their small integer codes used by the snapshot grid
+        self.status_names = []
+        self.status_codes = {}
+        # Snapshot grid, rebuilt lazily after new changes are recorded
+        self.snapshot_times = None
+        self.snapshot_grid = None
+        self.package_order = None
+
+    # Build a timeline from a package_status_over_time dict of (time, status) lists
+    @classmethod
+    def from_status_history(cls, package_status_over_time, snapshot_interval=300):
+        timeline = cls(snapshot_interval)
+        for package_id, statuses in package_status_over_time.items():
+            times = timeline.times.setdefault(package_id, [])
+            package_statuses = timeline.statuses.setdefault(package_id, [])
+            for seconds, status in sorted(((timeline.seconds(status_time), status) for status_time, status in statuses), key=lambda change: change[0]):
+                # Keep only the changes of status
+                if package_statuses and package_statuses[-1] == status:
+                    continue
+                times.append(seconds)
+                package_statuses.append(status)
+                timeline.transitions.append((seconds, package_id, status))
+                if status not in timeline.status_codes:
+                    timeline.status_codes[status] = len(timeline.status_names)
+                    timeline.status_names.append(status)
+        # Sort the global index once instead of inserting every change in order
+        timeline.transitions.sort()
+        return timeline
+
+    # Seconds since midnight for a time, datetime or number of seconds
+    def seconds(self, when):
+        if isinstance(when, datetime):
+            when = when.time()
+        if isinstance(when, time):
+            return when.hour * 3600 + when.minute * 60 + when.second + when.microsecond / 1e6
+        return float(when)
+
+    # Turn seconds since midnight back into a time of day
+    def to_time(self, seconds):
+        seconds = int(seconds)
+        return time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+    # Record a package's status at a time, only changes of status are kept
+    def record(self, package_id, when, status):
+        seconds = self.seconds(when)
+        times = self.times.setdefault(package_id, [])
+        statuses = self.statuses.setdefault(package_id, [])
+        position = bisect_right(times, seconds)
+        # Skip it if the package already had this status at that time
+        if position > 0 and statuses[position - 1] == status:
+            return
+        times.insert(position, seconds)
+        statuses.insert(position, status)
+        insort(self.transitions, (seconds, package_id, status))
+        if status not in self.status_codes:
+            self.status_codes[status] = len(self.status_names)
+            self.status_names.append(status)
+        # The snapshots no longer match the changes
+        self.snapshot_grid = None
+
+    # Get the status of a package at a time, None if it had no status yet
+    def status_at(self, package_id, when):
+        last = self.last_change(package_id, when)
+        return last[1] if last else None
+
+    # Get the (time, status) of the last change of a package at or before a time
+    def last_change(self, package_id, when):
+        times = self.times.get(package_id)
+        if not times:
+            return None
+        position = bisect_right(times, self.seconds(when))
+        if position == 0:
+            return None
+        return (self.to_time(times[position - 1]), self.statuses[package_id][position - 1])
+
+    # Get a package's (time, status) changes between two times, both included
+    def history_between(self, package_id, start, end):
+        times = self.times.get(package_id, [])
+        first = bisect_left(times, self.seconds(start))
+        last = bisect_right(times, self.seconds(end))
+        statuses = self.statuses[package_id] if times else []
+        return [(self.to_time(times[position]), statuses[position]) for position in range(first, last)]
+
+    # Get every (time, package ID, status) change between two times, both included, in time order
+    def transitions_between(self, start, end):
+        first = bisect_left(self.transitions, (self.seconds(start),))
+        last = bisect_left(self.transitions, (self.seconds(end) + 1e-9,))
+        return [(self.to_time(seconds), package_id, status) for seconds, package_id, status in self.transitions[first:last]]
+
+    # Precompute the status of every package at regular times through the day
+    def build_snapshots(self):
+        self.package_order = sorted(self.times)
+        positions = {package_id: position for position, package_id in enumerate(self.package_order)}
+        if not self.transitions:
+            self.snapshot_times = np.zeros(0)
+            self.snapshot_grid = np.zeros((0, len(self.package_order)), dtype=np.int16)
+            return
+        start = self.transitions[0][0]
+        end = self.transitions[-1][0]
+        self.snapshot_times = np.arange(start, end + self.snapshot_interval, self.snapshot_interval, dtype=np.float64)
+        self.snapshot_grid = np.full((len(self.snapshot_times), len(self.package_order)), -1, dtype=np.int16)
+        # Replay the changes once, copying the current statuses at every grid time
+        current = np.full(len(self.package_order), -1, dtype=np.int16)
+        change = 0
+        for row, snapshot_time in enumerate(self.snapshot_times):
+            while change < len(self.transitions) and self.transitions[change][0] <= snapshot_time:
+                seconds, package_id, status = self.transitions[change]
+                current[positions[package_id]] = self.status_codes[status]
+                change += 1
+            self.snapshot_grid[row] = current
+
+    # Get the status of every package at a time as a package ID -> status dict
+    def snapshot(self, when):
+        if self.snapshot_grid is None:
+            self.build_snapshots()
+        seconds = self.seconds(when)
+        row = bisect_right(self.snapshot_times, seconds) - 1
+        if row < 0:
+            return {}
+        current = self.snapshot_grid[row].copy()
+        # Apply the few changes between the grid time and the requested time
+        positions = None
+        for change_seconds, package_id, status in self.transitions[bisect_right(self.transitions, (self.snapshot_times[row], float("inf"))):]:
+            if change_seconds > seconds:
+                break
+            if positions is None:
+                positions = {package_id: position for position, package_id in enumerate(self.package_order)}
+            current[positions[package_id]] = self.status_codes[status]
+        return {package_id: self.status_names[code] for package_id, code in zip(self.package_order, current.tolist()) if code >= 0}
+
+    # Get the full (time, status) history of a package
+    def history(self, package_id):
+        return [(self.to_time(seconds), status) for seconds, status in zip(self.times.get(package_id, []), self.statuses.get(package_id, []))]
+
+    # Get the package IDs in the timeline
+    def package_ids(self):
+        return list(self.times)
+
+    # Check if a package has any recorded status
+    def __contains__(self, package_id):
+        return package_id in self.times
+
+    # Get the number of packages in the timeline
+    def __len__(self):
+        return len(self.times)
@@ -0,0 +1,57 @@
+import os
+from datetime import datetime
+import pytest
+from event_log import EventLog, EventLogReader
+
+START = datetime(2021, 7, 1, 8)
+LOCATIONS = {"Western Governors University": 0, "Council Hall": 1}
+
+# Write one run with a package at the hub and delivered
+def write_run(path, package_id=1):
+    with EventLog(path, LOCATIONS) as log:
+        log.append(package_id, "Truck 1", "AT HUB", START, "Western Governors University")
+        log.append_batch([package_id], "Truck 1", ["DELIVERED"], START.replace(hour=9), "Council Hall")
+
+def test_append_after_torn_tail_then_replay(tmp_path):
+    path = str(tmp_path / "events.log")
+    write_run(path)
+    # A crash in the middle of a record leaves part of it at the end
+    with open(path, "ab") as file:
+        file.write(EventLog.record.pack(2, 1, 1, 0, 0, 1)[:7])
+    write_run(path, package_id=3)
+    assert (os.path.getsize(path) - EventLog.header.size) % EventLog.record.size == 0
+    with EventLogReader(path, location_names=list(LOCATIONS)) as reader:
+        assert reader.runs() == [1, 2]
+        assert reader.history(3) == [(START, "AT HUB"), (START.replace(hour=9), "DELIVERED")]
+        assert reader.package_state(3)["location"] == "Council Hall"
+        assert reader.package_state(1) is None
+        assert len(reader) == 2
+
+def test_runs_are_replayed_apart(tmp_path):
+    path = str(tmp_path / "events.log")
+    write_run(path)
+    write_run(path)
+    with EventLogReader(path, run=1) as reader:
+        assert reader.history(1) == [(START, "AT HUB"), (START.replace(hour=9), "DELIVERED")]
+    with EventLogReader(path) as reader:
+        assert reader.run == 2
+        assert list(reader.fleet_state(START)) == [1]
+        assert reader.fleet_state(START)[1]["status"] == "AT HUB"
+
+def test_torn_header_starts_the_log_again(tmp_path):
+    path = str(tmp_path / "events.log")
+    with open(path, "wb") as file:
+        file.write(EventLog.header.pack(EventLog.magic, EventLog.version, EventLog.record.size)[:5])
+    write_run(path)
+    with EventLogReader(path) as reader:
+        assert reader.run == 1
+        assert len(reader) == 2
+
+def test_short_file_that_is_not_a_log(tmp_path):
+    path = str(tmp_path / "events.log")
+    with open(path, "wb") as file:
+        file.write(b"hello")
+    with pytest.raises(ValueError):
+        EventLog(path)
+    with pytest.raises(ValueError):
+        EventLogReader(path)
@@ -0,0 +1,54 @@
+import numpy as np
+from graph import Graph
+
+# Close a random graph where about half the pairs have no direct edge
+def random_graph(count, seed):
+    rng = np.random.default_rng(seed)
+    direct = np.triu(rng.random((count, count)) * 10 + 0.5, 1)
+    direct[np.triu(rng.random((count, count)) < 0.5, 1)] = 0.0
+    # A chain keeps every location reachable
+    direct[np.arange(count - 1), np.arange(1, count)] = rng.random(count - 1) * 10 + 0.5
+    graph = Graph()
+    graph.location_names = [f"Location {index}" for index in range(count)]
+    graph.location_index = {name: index for index, name in enumerate(graph.location_names)}
+    graph.direct_distance_matrix = direct + direct.T
+    graph.close_distance_matrix()
+    return graph
+
+# Shortest distances with the plain triple loop
+def floyd_warshall(direct):
+    distances = np.where(direct > 0, direct, np.inf)
+    np.fill_diagonal(distances, 0.0)
+    for k in range(len(distances)):
+        for i in range(len(distances)):
+            for j in range(len(distances)):
+                distances[i, j] = min(distances[i, j], distances[i, k] + distances[k, j])
+    return distances
+
+def check_closed(graph):
+    matrix = graph.distance_matrix.astype(np.float64)
+    direct = graph.direct_distance_matrix
+    # Triangle inequality: no detour through k is shorter than the matrix entry
+    assert (matrix[:, None, :] <= matrix[:, :, None] + matrix[None, :, :] + 1e-9).all()
+    # No distance is longer than the direct edge
+    assert (matrix[direct > 0] <= direct[direct > 0] + 1e-9).all()
+    # Every shortest path drives over direct edges and adds up to the matrix
+    for from_node in graph.location_names:
+        for to_node in graph.location_names:
+            path = graph.shortest_path(from_node, to_node)
+            assert path[0] == from_node and path[-1] == to_node
+            hops = [graph.location_index[name] for name in path]
+            assert all(direct[a, b] > 0 for a, b in zip(hops, hops[1:]))
+            length = sum(direct[a, b] for a, b in zip(hops, hops[1:]))
+            assert abs(length - matrix[hops[0], hops[-1]]) < 1e-9
+
+def test_closed_matrix_matches_the_triple_loop():
+    for seed in range(5):
+        graph = random_graph(12, seed)
+        assert np.allclose(graph.distance_matrix, floyd_warshall(graph.direct_distance_matrix))
+        check_closed(graph)
+
+def test_todays_graph_is_closed(data_folder):
+    graph = Graph()
+    graph.setup()
+    check_closed(graph)
@@ -0,0 +1,42 @@
+import random
+import pytest
+from hash_table import HashTable
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_a_dict(seed):
+    rng = random.Random(seed)
+    # A small table so the random operations make it grow and reuse removed slots many times
+    table = HashTable(size=8)
+    expected = {}
+    keys = list(range(300)) + [f"key {index}" for index in range(100)]
+    for _ in range(5000):
+        key = rng.choice(keys)
+        operation = rng.random()
+        if operation < 0.5:
+            table.insert(key, operation)
+            expected[key] = operation
+        elif operation < 0.75:
+            if key in expected:
+                table.remove(key)
+                del expected[key]
+            else:
+                with pytest.raises(KeyError):
+                    table.remove(key)
+        else:
+            assert table.search(key) == expected.get(key)
+            assert (key in table) == (key in expected)
+        assert len(table) == len(expected)
+    assert table.size > 8
+    assert dict(table.items()) == expected
+    assert sorted(table.keys(), key=str) == sorted(expected, key=str)
+    for key in keys:
+        if key in expected:
+            assert table[key] == expected[key]
+        else:
+            with pytest.raises(KeyError):
+                table[key]
+
+def test_from_items_keeps_the_last_value():
+    table = HashTable.from_items((index % 50, index) for index in range(200))
+    assert len(table) == 50
+    assert all(table.get(key) == 150 + key for key in range(50))
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from graph import Graph
+
+HUB = "Western Governors University"
+
+@pytest.fixture
+def graph(data_folder):
+    graph = Graph()
+    graph.setup()
+    return graph
+
+# The remaining path of a route queue from the truck's location
+def route_path(graph, current_location, delivery_route):
+    return [graph.location_index[current_location]] + [graph.location_index[stop[0]] for stop in delivery_route.queue]
+
+def test_corrected_address_replaces_the_old_stop(graph):
+    stops = {"Council Hall", "Sugar House Park", "Deker Lake", "Columbus Library", "Redwood Park", "Murray City Museum"}
+    _, delivery_route = graph.start_delivery_route(stops, HUB)
+    # The truck has reached its first stop when package #9's address is corrected
+    current_location = delivery_route.get()[0]
+    if current_location == "Council Hall":
+        current_location = delivery_route.get()[0]
+    before = graph.route_engine.path_length(route_path(graph, current_location, delivery_route))
+    mileage_delta = graph.repair_route(delivery_route, current_location, add_nodes=["Third District Juvenile Court"], remove_nodes=["Council Hall"])
+
+    remaining = [stop[0] for stop in delivery_route.queue]
+    assert remaining[-1] == HUB
+    assert sorted(remaining[:-1]) == sorted(stops - {"Council Hall", current_location} | {"Third District Juvenile Court"})
+    # Every leg is the matrix distance from the stop before it
+    path = route_path(graph, current_location, delivery_route)
+    legs = [stop[1] for stop in delivery_route.queue]
+    assert np.allclose(legs, graph.distance_matrix[path[:-1], path[1:]])
+    assert mileage_delta == pytest.approx(sum(legs) - before)
+
+def test_new_stop_goes_where_it_adds_the_least(graph):
+    _, delivery_route = graph.start_delivery_route({"Sugar House Park", "Deker Lake", "Redwood Park"}, HUB)
+    path = route_path(graph, HUB, delivery_route)
+    new_stop = graph.location_index["Third District Juvenile Court"]
+    cheapest = min(graph.route_engine.path_length(path[:position] + [new_stop] + path[position:]) for position in range(1, len(path)))
+    graph.repair_route(delivery_route, HUB, add_nodes=["Third District Juvenile Court"])
+    assert graph.route_engine.path_length(route_path(graph, HUB, delivery_route)) == pytest.approx(cheapest)
+    assert delivery_route.queue[-1][0] == HUB
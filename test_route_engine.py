@@ -0,0 +1,31 @@
+import itertools
+import numpy as np
+import pytest
+from route_engine import RouteEngine
+
+# Straight-line distances between random points, location 0 is the hub
+def random_engine(count, seed):
+    points = np.random.default_rng(seed).random((count, 2)) * 20
+    difference = points[:, None, :] - points[None, :, :]
+    return RouteEngine(np.hypot(difference[..., 0], difference[..., 1]))
+
+# Length of the shortest hub to hub loop through the stops, trying every order
+def brute_force(engine, stops):
+    orders = np.array(list(itertools.permutations(stops)))
+    matrix = engine.distance_matrix
+    lengths = matrix[0, orders[:, 0]] + matrix[orders[:, :-1], orders[:, 1:]].sum(axis=1) + matrix[orders[:, -1], 0]
+    return lengths.min()
+
+@pytest.mark.parametrize("seed", range(10))
+def test_held_karp_matches_brute_force(seed):
+    engine = random_engine(12, seed)
+    stops = np.random.default_rng(seed).choice(np.arange(1, 12), size=8, replace=False)
+    order, total = engine.held_karp(0, stops, 0)
+    assert sorted(order.tolist()) == sorted(stops.tolist())
+    assert total == pytest.approx(engine.path_length([0, *order, 0]))
+    assert total == pytest.approx(brute_force(engine, stops))
+
+def test_held_karp_refuses_too_many_stops():
+    engine = random_engine(RouteEngine.max_exact_stops + 2, 0)
+    with pytest.raises(ValueError):
+        engine.held_karp(0, range(1, RouteEngine.max_exact_stops + 2), 0)
@@ -0,0 +1,23 @@
+import pytest
+from package_setup import PackageSetup
+from snapshot_cache import SnapshotCache
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_manifest_snapshot_gives_the_parsed_packages(data_folder, columnar):
+    parsed = PackageSetup(columnar=columnar).get_all_packages()
+    cache = SnapshotCache(str(data_folder / "cache"))
+    PackageSetup(columnar=columnar, cache=cache)
+    loaded = PackageSetup(columnar=columnar, cache=cache)
+    assert len(list((data_folder / "cache").glob("manifest-*"))) == 1
+    assert loaded.get_all_packages() == parsed
+    assert [package.special_notes for package in loaded] == [package.special_notes for package in parsed]
+    assert loaded.get_package_by_id(9).location_name == "Council Hall"
+    assert [package.package_id for package in loaded.get_packages_by_deadline("10:30:00")] == \
+        [package.package_id for package in parsed if package.deadline == "10:30:00"]
+
+def test_manifest_snapshot_follows_the_package_file(data_folder):
+    cache = SnapshotCache(str(data_folder / "cache"))
+    PackageSetup(cache=cache)
+    with open(data_folder / "data" / "WGUPS_Package_File.csv", "a") as file:
+        file.write("\n41,300 State St,Salt Lake City,UT,84103,EOD,3,None\n")
+    assert len(PackageSetup(cache=cache)) == 41
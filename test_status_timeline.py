@@ -0,0 +1,50 @@
+import random
+import pytest
+from status_timeline import StatusTimeline
+
+STATUSES = ["AT THE HUB", "AT HUB", "IN TRANSIT", "DELIVERED"]
+
+# Every package goes through the statuses in order at random times of the day
+def random_changes(seed, packages=30):
+    rng = random.Random(seed)
+    changes = []
+    for package_id in range(1, packages + 1):
+        times = sorted(rng.sample(range(8 * 3600, 17 * 3600), len(STATUSES)))
+        changes += [(seconds, package_id, status) for seconds, status in zip(times, STATUSES)]
+    return changes
+
+# Linear scans over all the changes
+def status_at(changes, package_id, seconds):
+    statuses = [(when, status) for when, changed_id, status in changes if changed_id == package_id and when <= seconds]
+    return max(statuses)[1] if statuses else None
+
+@pytest.mark.parametrize("seed", range(5))
+def test_queries_match_a_linear_scan(seed):
+    rng = random.Random(seed)
+    changes = random_changes(seed)
+    recorded = StatusTimeline(snapshot_interval=600)
+    # Changes can be recorded out of order
+    for seconds, package_id, status in rng.sample(changes, len(changes)):
+        recorded.record(package_id, seconds, status)
+    history = {}
+    for seconds, package_id, status in changes:
+        history.setdefault(package_id, []).append((recorded.to_time(seconds), status))
+    built = StatusTimeline.from_status_history(history, snapshot_interval=600)
+    for timeline in (recorded, built):
+        for _ in range(200):
+            seconds = rng.randrange(7 * 3600, 18 * 3600)
+            package_id = rng.randrange(1, 32)
+            assert timeline.status_at(package_id, seconds) == status_at(changes, package_id, seconds)
+            assert timeline.snapshot(seconds) == {changed_id: status_at(changes, changed_id, seconds)
+                                                  for changed_id in {change[1] for change in changes if change[0] <= seconds}}
+            end = seconds + rng.randrange(0, 3 * 3600)
+            assert timeline.history_between(package_id, seconds, end) == \
+                [(timeline.to_time(when), status) for when, changed_id, status in sorted(changes) if changed_id == package_id and seconds <= when <= end]
+            assert timeline.transitions_between(seconds, end) == \
+                [(timeline.to_time(when), changed_id, status) for when, changed_id, status in sorted(changes) if seconds <= when <= end]
+
+def test_repeated_statuses_are_kept_once():
+    timeline = StatusTimeline.from_status_history({1: [(28800, "AT HUB"), (29000, "AT HUB"), (30000, "DELIVERED")]})
+    assert timeline.history(1) == [(timeline.to_time(28800), "AT HUB"), (timeline.to_time(30000), "DELIVERED")]
+    timeline.record(1, 29500, "AT HUB")
+    assert len(timeline.history(1)) == 2
@@ -0,0 +1,46 @@
+from datetime import time
+from graph import Graph
+from package_setup import PackageSetup
+from simulation import DeliverySimulation
+from truck_assignment import TruckAssignment
+
+DEPARTURES = {"Truck 1": time(8), "Truck 2": time(9, 15), "Truck 3": time(11)}
+
+def load_today():
+    graph = Graph()
+    graph.setup()
+    assignment = TruckAssignment(graph)
+    packages = PackageSetup().get_all_packages()
+    loads = assignment.assign(packages, DEPARTURES)
+    trucks = {package_id: truck_id for truck_id, package_ids in loads.items() for package_id in package_ids}
+    return assignment, packages, trucks
+
+def test_every_package_is_loaded_on_time(data_folder):
+    assignment, packages, trucks = load_today()
+    assert assignment.unassigned == []
+    assert assignment.late == []
+    assert sorted(trucks) == sorted(package.package_id for package in packages)
+
+def test_special_notes_are_kept(data_folder):
+    _, packages, trucks = load_today()
+    for package in packages:
+        notes = package.special_notes
+        if "only be on truck 2" in notes:
+            assert trucks[package.package_id] == "Truck 2"
+        if "until 9:05" in notes:
+            assert DEPARTURES[trucks[package.package_id]] >= time(9, 5)
+        if "Wrong address" in notes:
+            assert DEPARTURES[trucks[package.package_id]] >= time(10, 20)
+    # 13, 14, 15, 16, 19 and 20 must all be delivered together
+    assert len({trucks[package_id] for package_id in (13, 14, 15, 16, 19, 20)}) == 1
+
+def test_driven_day_meets_every_deadline(data_folder):
+    simulation = DeliverySimulation(sinks=[], auto_assign=True)
+    results = simulation.run()
+    parse_time = TruckAssignment(simulation.graph).parse_time
+    for package in simulation.all_packages:
+        deadline = parse_time(package.deadline)
+        delivered = [when for when, status in results["package_status_over_time"][package.package_id] if status == "DELIVERED"]
+        assert delivered, package.package_id
+        if deadline is not None:
+            assert delivered[0] <= deadline, package.package_id
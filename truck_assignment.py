@@ -0,0 +1,240 @@
+import re
+from datetime import datetime, time
+import numpy as np
+
+class PackageConstraints:
+    # PackageConstraints class to hold the loading rules of one package
+    def __init__(self, package_id, deadline=None, weight=0.0, truck_id=None, available_time=None, delivered_with=None, wrong_address=False):
+        self.package_id = package_id
+        # Latest delivery time, None for end of day
+        self.deadline = deadline
+        self.weight = weight
+        # The only truck the package can be on, None for any truck
+        self.truck_id = truck_id
+        # Earliest time the package is at the hub with a correct address
+        self.available_time = available_time
+        # Other package IDs that must be on the same truck
+        self.delivered_with = delivered_with if delivered_with is not None else set()
+        self.wrong_address = wrong_address
+
+    def __repr__(self):
+        return (f"PackageConstraints({self.package_id}, deadline={self.deadline}, truck={self.truck_id}, "
+                f"available={self.available_time}, with={sorted(self.delivered_with)}, wrong_address={self.wrong_address})")
+
+class TruckAssignment:
+    # TruckAssignment class to load trucks automatically from the package file's rules
+    # Reads the special notes, deadline and weight of every package, keeps packages that
+    # must travel together in one group and loads the groups onto trucks under capacity.
+    # The loads are then checked against the routes the trucks will drive: a truck that gets
+    # to a deadline package too late hands packages without a deadline to other trucks
+    def __init__(self, graph, capacity=16, correction_time=time(10, 20), weight_limit=None, speed=18):
+        self.graph = graph
+        # Most packages a truck can carry, and optionally the most weight
+        self.capacity = capacity
+        self.weight_limit = weight_limit
+        # Truck speed in miles per hour, used to plan arrival times
+        self.speed = speed
+        # Time a wrong address gets corrected, the package can't leave before that
+        self.correction_time = correction_time
+        # Packages that could not be loaded under the constraints and capacity
+        self.unassigned = []
+        # Loaded packages whose planned arrival is still after their deadline
+        self.late = []
+
+    # Parse a time such as "10:30:00", "9:05 am" or "EOD" (returns None)
+    def parse_time(self, text):
+        text = str(text).strip().lower().replace(".", "")
+        for time_format in ("%H:%M:%S", "%H:%M", "%I:%M %p", "%I:%M%p", "%I:%M:%S %p"):
+            try:
+                return datetime.strptime(text, time_format).time()
+            except ValueError:
+                continue
+        return None
+
+    # Turn a package's deadline, weight and special notes into constraints
+    def parse_constraints(self, package):
+        constraints = PackageConstraints(package.package_id, deadline=self.parse_time(package.deadline), weight=float(package.weight))
+        notes = package.special_notes if isinstance(package.special_notes, str) else ""
+        # "Can only be on truck 2"
+        match = re.search(r"only be on truck\s*(\d+)", notes, re.IGNORECASE)
+        if match:
+            constraints.truck_id = f"Truck {match.group(1)}"
+        # "Delayed on flight---will not arrive to depot until 9:05 am"
+        match = re.search(r"until\s*(\d{1,2}:\d{2}(?::\d{2})?\s*(?:[ap]\.?m\.?)?)", notes, re.IGNORECASE)
+        if match:
+            constraints.available_time = self.parse_time(match.group(1))
+        # "Must be delivered with 13 & 15"
+        match = re.search(r"delivered with\s*([\d\s,&and]+)", notes, re.IGNORECASE)
+        if match:
+            constraints.delivered_with = {int(package_id) for package_id in re.findall(r"\d+", match.group(1))}
+        # "Wrong address listed", the package waits for the correction
+        if re.search(r"wrong address", notes, re.IGNORECASE):
+            constraints.wrong_address = True
+            if constraints.available_time is None or constraints.available_time < self.correction_time:
+                constraints.available_time = self.correction_time
+        return constraints
+
+    # Put packages that must be delivered together into the same group (union-find)
+    def build_groups(self, constraints):
+        parent = {package_id: package_id for package_id in constraints}
+
+        # Find the root of a package's group, halving the path as we go
+        def find(package_id):
+            while parent[package_id] != package_id:
+                parent[package_id] = parent[parent[package_id]]
+                package_id = parent[package_id]
+            return package_id
+
+        for package_id, package_constraints in constraints.items():
+            for other_id in package_constraints.delivered_with:
+                if other_id in parent:
+                    parent[find(other_id)] = find(package_id)
+
+        groups = {}
+        for package_id in constraints:
+            groups.setdefault(find(package_id), []).append(package_id)
+        return list(groups.values())
+
+    # Load the packages onto the trucks
+    # departures maps truck ID to the time the truck leaves the hub, returns truck ID -> package IDs
+    def assign(self, packages, departures):
+        packages = {package.package_id: package for package in packages}
+        constraints = {package_id: self.parse_constraints(package) for package_id, package in packages.items()}
+        truck_ids = list(departures)
+        truck_positions = {truck_id: position for position, truck_id in enumerate(truck_ids)}
+        loads = {truck_id: [] for truck_id in truck_ids}
+        self.unassigned = []
+        self.late = []
+
+        # Per truck arrays so every group checks all trucks with a few vectorized operations
+        departure_seconds = np.array([self.seconds(departures[truck_id]) for truck_id in truck_ids], dtype=np.float64)
+        load_counts = np.zeros(len(truck_ids), dtype=np.int64)
+        load_weights = np.zeros(len(truck_ids), dtype=np.float64)
+        # For every truck, the distance from its closest stop so far to every location
+        hub_index = self.graph.location_index.get("Western Governors University", 0)
+        closest_stop = np.tile(self.graph.distance_matrix[hub_index].astype(np.float64), (len(truck_ids), 1))
+
+        # Work out the combined rules of every group and which trucks could ever take it
+        group_rules = []
+        for group in self.build_groups(constraints):
+            group_constraints = [constraints[package_id] for package_id in group]
+            required_trucks = {rule.truck_id for rule in group_constraints if rule.truck_id}
+            deadlines = [rule.deadline for rule in group_constraints if rule.deadline]
+            available_times = [rule.available_time for rule in group_constraints if rule.available_time]
+            deadline = min(deadlines) if deadlines else None
+            available_time = max(available_times) if available_times else None
+            allowed = np.ones(len(truck_ids), dtype=bool)
+            if required_trucks:
+                # A group that must be on two different trucks can't be loaded at all
+                allowed[:] = False
+                if len(required_trucks) == 1 and next(iter(required_trucks)) in truck_positions:
+                    allowed[truck_positions[next(iter(required_trucks))]] = True
+            if available_time is not None:
+                allowed &= departure_seconds >= self.seconds(available_time)
+            weight = sum(rule.weight for rule in group_constraints)
+            locations = sorted({self.graph.location_index.get(packages[package_id].location_name, hub_index) for package_id in group})
+            if deadline is not None:
+                # Even driving straight from the hub the truck has to get to every stop in time
+                drive_seconds = float(self.graph.distance_matrix[hub_index, locations].max()) / self.speed * 3600
+                allowed &= departure_seconds + drive_seconds <= self.seconds(deadline)
+            group_rules.append((group, deadline, allowed, weight, locations))
+
+        # Earliest deadlines first, then the groups with the fewest trucks to choose from, then the biggest
+        group_rules.sort(key=lambda rule: (rule[1] or time.max, int(rule[2].sum()), -len(rule[0]), min(rule[0])))
+
+        # Truck position each loaded group is on
+        placed = {}
+        for index, (group, deadline, allowed, weight, locations) in enumerate(group_rules):
+            # Only trucks with room left for the whole group
+            candidates = allowed & (load_counts + len(group) <= self.capacity)
+            if self.weight_limit is not None:
+                candidates &= load_weights + weight <= self.weight_limit
+            candidates = np.flatnonzero(candidates)
+            if len(candidates) == 0:
+                self.unassigned.extend(group)
+                continue
+            if deadline is not None:
+                # Deadline packages ride on the earliest truck, closest stops break ties
+                candidates = candidates[departure_seconds[candidates] == departure_seconds[candidates].min()]
+            # Pick the truck that already stops closest to the group
+            distances = closest_stop[np.ix_(candidates, locations)].min(axis=1)
+            position = int(candidates[np.argmin(distances)])
+            loads[truck_ids[position]].extend(group)
+            load_counts[position] += len(group)
+            load_weights[position] += weight
+            placed[index] = position
+            # The truck now also stops at the group's locations
+            for location in locations:
+                np.minimum(closest_stop[position], self.graph.distance_matrix[location], out=closest_stop[position])
+
+        # Plan every truck's route and move packages without a deadline off the trucks that are late
+        for position, truck_id in enumerate(truck_ids):
+            lateness = self.lateness(loads[truck_id], packages, constraints, departures[truck_id])
+            while lateness > 0:
+                best = None
+                for index, (group, deadline, allowed, weight, locations) in enumerate(group_rules):
+                    if placed.get(index) != position or deadline is not None:
+                        continue
+                    remaining = [package_id for package_id in loads[truck_id] if package_id not in group]
+                    remaining_lateness = self.lateness(remaining, packages, constraints, departures[truck_id])
+                    if remaining_lateness >= lateness or (best is not None and remaining_lateness >= best[0]):
+                        continue
+                    # Another truck with room that stays on time with the group added
+                    for other in np.flatnonzero(allowed & (load_counts + len(group) <= self.capacity)):
+                        other_id = truck_ids[other]
+                        if other == position or (self.weight_limit is not None and load_weights[other] + weight > self.weight_limit):
+                            continue
+                        if self.lateness(loads[other_id] + group, packages, constraints, departures[other_id]) > 0:
+                            continue
+                        best = (remaining_lateness, index, int(other))
+                        break
+                if best is None:
+                    break
+                lateness, index, other = best
+                group, weight = group_rules[index][0], group_rules[index][3]
+                loads[truck_id] = [package_id for package_id in loads[truck_id] if package_id not in group]
+                loads[truck_ids[other]].extend(group)
+                load_counts[position] -= len(group)
+                load_counts[other] += len(group)
+                load_weights[position] -= weight
+                load_weights[other] += weight
+                placed[index] = other
+            self.late.extend(self.late_packages(loads[truck_id], packages, constraints, departures[truck_id]))
+        return loads
+
+    # Plan the route a truck drives for a load, returns location name -> arrival in seconds since midnight
+    def planned_arrivals(self, package_ids, packages, departure):
+        locations = {packages[package_id].location_name for package_id in package_ids}
+        _, route = self.graph.start_delivery_route(locations, "Western Governors University")
+        arrivals = {}
+        clock = self.seconds(departure)
+        for location_name, distance in route.queue:
+            clock += distance / self.speed * 3600
+            arrivals.setdefault(location_name, clock)
+        return arrivals
+
+    # Get how many seconds late each deadline package of a load gets there, package ID -> seconds
+    def delays(self, package_ids, packages, constraints, departure):
+        if not any(constraints[package_id].deadline is not None for package_id in package_ids):
+            return {}
+        arrivals = self.planned_arrivals(package_ids, packages, departure)
+        delays = {}
+        for package_id in package_ids:
+            deadline = constraints[package_id].deadline
+            if deadline is not None:
+                delay = arrivals.get(packages[package_id].location_name, self.seconds(departure)) - self.seconds(deadline)
+                if delay > 0:
+                    delays[package_id] = delay
+        return delays
+
+    # Total seconds the deadline packages of a load are late
+    def lateness(self, package_ids, packages, constraints, departure):
+        return sum(self.delays(package_ids, packages, constraints, departure).values())
+
+    # Deadline packages of a load the planned route gets to after their deadline
+    def late_packages(self, package_ids, packages, constraints, departure):
+        return sorted(self.delays(package_ids, packages, constraints, departure))
+
+    # Seconds since midnight for a time of day
+    def seconds(self, time_of_day):
+        return time_of_day.hour * 3600 + time_of_day.minute * 60 + time_of_day.second
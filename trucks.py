@@ -1,19 +1,29 @@
 from datetime import datetime, timedelta
+from itertools import islice
 from queue import Queue
 from time import sleep
 from typing import List
 from graph import Graph
 from packages import Package
+from status_timeline import filter_duplicate_statuses
 
 class Truck:
-    # keep track of all truck instances
-    trucks = []
+    # Registry of truck instances by truck ID, a new truck replaces an old one with the same ID
+    trucks = {}
 
     # Setup the truck with the truck ID, graph, packages, all packages, and special notes
     def __init__(self, truck_id: str, graph: Graph, packages: List[Package], all_packages: List[Package], special_notes: List[str] = None):
         self.truck_id = truck_id
         self.graph = graph
-        self.packages = packages
+        # Packages on board by package ID, in the order they were loaded
+        self.on_board = {}
+        # Packages on board by the location they go to (location name -> {package ID: package}),
+        # so a stop only looks at the packages delivered there
+        self.packages_by_location = {}
+        # Location each package on board is filed under and its place in the loading order
+        self.package_locations = {}
+        self.load_order = {}
+        self.loaded_count = 0
         self.all_packages = all_packages
         self.special_notes = special_notes if special_notes else []
         # Truck capacity for packages
@@ -28,8 +38,59 @@ class Truck:
         self.delivery_nodes = set()
         # Queue to keep track of the delivery route
         self.delivery_route = Queue()
-        # Add the truck to the list of trucks
-        Truck.trucks.append(self)
+        # The stop the truck is driving to or has just reached, None before the route starts
+        self.heading_to = None
+        # Status of the packages riding on the truck (AT HUB until it leaves the hub, then IN TRANSIT)
+        self.on_board_status = "AT HUB"
+        # IDs of packages put on board after the route started whose status still has to follow the truck
+        self.status_pending = set()
+        # EventLog every status change is also written to, None to keep the history in memory only
+        self.status_log = None
+        # Where progress messages go, e.g. print or a log collector
+        self.sinks = [print]
+        # Wall clock pause in seconds at each stop and after the package #9 update (0 to run as fast as possible)
+        self.stop_delay = .5
+        self.update_delay = 1
+        # Scripted answers for address corrections, e.g. {"package_9": "yes"}. None asks on the console
+        self.decisions = None
+        # Package IDs listed in a progress message before the rest are only counted
+        self.report_limit = 50
+        for package in packages:
+            self.put_on_board(package)
+        # Add the truck to the registry of trucks
+        Truck.trucks[truck_id] = self
+
+    # Packages on the truck in the order they were loaded (a new list)
+    @property
+    def packages(self):
+        return list(self.on_board.values())
+
+    # File a package under its ID and its location
+    def put_on_board(self, package: Package):
+        package_id = package.package_id
+        if package_id not in self.load_order:
+            self.load_order[package_id] = self.loaded_count
+            self.loaded_count += 1
+        self.on_board[package_id] = package
+        location_name = package.location_name
+        old_location = self.package_locations.get(package_id)
+        moved = old_location is not None and old_location != location_name
+        if moved:
+            self.take_off_location(package_id, old_location)
+        self.package_locations[package_id] = location_name
+        at_location = self.packages_by_location.setdefault(location_name, {})
+        at_location[package_id] = package
+        # A package moved to a stop others go to keeps its place in the loading order among them
+        if moved and len(at_location) > 1:
+            self.packages_by_location[location_name] = dict(sorted(at_location.items(), key=lambda item: self.load_order[item[0]]))
+
+    # Take a package off the list of packages for a location
+    def take_off_location(self, package_id, location_name):
+        at_location = self.packages_by_location.get(location_name)
+        if at_location is not None:
+            at_location.pop(package_id, None)
+            if not at_location:
+                del self.packages_by_location[location_name]
 
     # Load the package onto the truck
     def load_package(self, package: Package):
@@ -37,15 +98,19 @@ class Truck:
         package.delivery_status = "AT HUB"  
         # Assign the truck ID to the package
         package.truck = self.truck_id 
-        # Add the package to the truck's package list
-        self.packages.append(package)
+        # Add the package to the truck's packages
+        self.put_on_board(package)
         # Add the location name to delivery nodes
         self.delivery_nodes.add(package.location_name)
 
     # Load packages onto the truck based on package IDs
-    def load_packages_by_id(self):
-        # Clear the truck's package list 
-        self.packages.clear()
+    # Pass the package IDs to load (e.g. from TruckAssignment), otherwise today's fixed lists are used
+    def load_packages_by_id(self, package_ids=None):
+        # Clear the truck's packages
+        self.on_board.clear()
+        self.packages_by_location.clear()
+        self.package_locations.clear()
+        self.load_order.clear()
         # Define package IDs for each truck
         truck_packages = {
             "Truck 1": [15, 16, 13, 14, 20, 21, 29, 19, 17, 24, 30, 31, 1, 22],
@@ -54,15 +119,20 @@ class Truck:
         }
 
         # Get the package IDs for the current truck
-        current_truck_packages = truck_packages.get(self.truck_id, [])
+        current_truck_packages = package_ids if package_ids is not None else truck_packages.get(self.truck_id, [])
+        # Find the packages not loaded yet by ID with one pass over all packages, the first one with an ID wins
+        unloaded = {}
+        for pkg in self.all_packages:
+            if not pkg.loaded and pkg.package_id not in unloaded:
+                unloaded[pkg.package_id] = pkg
         # Load packages based on the package IDs
         for package_id in current_truck_packages:
-            package = next((pkg for pkg in self.all_packages if pkg.package_id == package_id and not pkg.loaded), None)
+            package = unloaded.pop(package_id, None)
             # Load the package if it is not already loaded
-            if package and len(self.packages) < self.capacity:
+            if package and len(self.on_board) < self.capacity:
                 self.load_package(package)
                 package.loaded = True
-        print(f"Final packages for {self.truck_id}: {[pkg.package_id for pkg in self.get_packages()]}")
+        self.report(f"Final packages for {self.truck_id}: {[pkg.package_id for pkg in self.get_packages()]}")
     
     # Get the packages on the truck
     def get_packages(self):
@@ -70,132 +140,168 @@ class Truck:
 
     # Get the packages currently being delivered
     def get_packages_currently_being_delivered(self, location_name):
-        return [package for package in self.packages if package.location_name == location_name]
+        return list(self.packages_by_location.get(location_name, {}).values())
 
     # Get the truck ID and the number of packages remaining
     def __str__(self):
-        return f"Truck {self.truck_id} has {len(self.packages)} packages remaining."
+        return f"Truck {self.truck_id} has {len(self.on_board)} packages remaining."
 
     # Remove a package from the truck
     def remove_package(self, package):
-        # Remove the package from the truck's package list
-        if package in self.packages:
-            # Remove the package from the truck's package list
-            self.packages.remove(package)
+        # Remove the package from the truck's packages
+        if self.on_board.pop(package.package_id, None) is not None:
+            self.take_off_location(package.package_id, self.package_locations.pop(package.package_id))
             # Remove the location name from delivery nodes
             self.delivery_nodes.discard(package.location_name)
 
     # Update a package on the truck
     def update_package(self, updated_package: Package):
-        for i, pkg in enumerate(self.packages):
-            # Update the package if the package ID matches
-            if pkg.package_id == updated_package.package_id:
-                self.packages[i] = updated_package
-                self.delivery_nodes.add(updated_package.location_name)
-                return True
+        # Update the package if the package ID is on board
+        if updated_package.package_id in self.on_board:
+            self.put_on_board(updated_package)
+            self.delivery_nodes.add(updated_package.location_name)
+            self.status_pending.add(updated_package.package_id)
+            return True
         return False
 
     # Get all packages on board the truck
     def get_all_packages_on_board(self):
-        return [pkg.package_id for pkg in self.packages]
+        return list(self.on_board)
+
+    # Get the package IDs on board for a progress message, only the first report_limit are listed
+    def packages_on_board_text(self):
+        package_ids = list(islice(self.on_board, self.report_limit))
+        more = len(self.on_board) - len(package_ids)
+        return f"{package_ids} and {more} more" if more else f"{package_ids}"
 
     # Deliver packages based on the delivery route
     def deliver_packages(self, departure_time, package_setup, package_status_over_time, package_9_has_been_updated, combined_total_distance, current_packages):
         # Setup package statuses
-        self.setup_package_status(package_status_over_time, departure_time)
-        in_transit_begin = departure_time.strftime("%H:%M:%S")
-        drive_distance = 0
+        self.begin_route(departure_time, package_status_over_time)
         dont_ask_to_update_9 = False
-        delivery_process = []
-        current_locations = []
         return_time = departure_time 
 
         # Deliver packages based on the delivery route
         while not self.delivery_route.empty():
-            next_delivery = self.delivery_route.get()
-            current_location = next_delivery[0]
-            distance_to_next = float(next_delivery[1])
-            current_packages = self.get_packages_currently_being_delivered(current_location)
-
-            # Update time and distance for the trip
-            time_spent = timedelta(hours=distance_to_next / self.speed)
-            departure_time += time_spent
-            drive_distance += distance_to_next  # Increment drive_distance for the truck
-            combined_total_distance[0] += distance_to_next  # Update combined total distance
+            next_delivery, departure_time = self.next_stop(departure_time)
+            self.arrive_at_stop(next_delivery, combined_total_distance)
 
             if self.should_update_package_9(departure_time, package_9_has_been_updated, dont_ask_to_update_9):
+                old_locations = [self.package_locations[9]] if self.carries_package_9() else []
                 package_9_has_been_updated, dont_ask_to_update_9 = self.update_package_9(package_setup, current_packages)
-                # Recalculate the delivery route if package 9 is updated
-                self.graph.start_delivery_route(self.delivery_nodes, self.current_location)
-
-            # Correct the method call here
-            for package in current_packages:
-                package_setup.update_package_status(package.package_id, "DELIVERED", departure_time)
-                if package.package_id in package_status_over_time:
-                    package_status_over_time[package.package_id].append((departure_time.time(), "DELIVERED"))
-                else:
-                    package_status_over_time[package.package_id] = [(departure_time.time(), "DELIVERED")]
-                self.remove_package(package)
-
-            # Mark all packages as "IN TRANSIT" after the start of delivery
-            for package in self.packages:
-                if package.delivery_status != "DELIVERED":  # Ensure not to update already delivered packages
-                    # Check if the truck is at the hub or at the package's delivery location
-                    if self.current_location == 'Western Governors University':
-                        package.delivery_status = "AT HUB"
-                        package_setup.update_package_status(package.package_id, "AT HUB", departure_time)
-                    elif self.current_location == package.location_name:
-                        package.delivery_status = "DELIVERED"
-                        package_setup.update_package_status(package.package_id, "DELIVERED", departure_time)
-                    else:
-                        package.delivery_status = "IN TRANSIT"
-                        package_setup.update_package_status(package.package_id, "IN TRANSIT", departure_time)
-                    
-                    # Update the package status over time
-                    if package.package_id in package_status_over_time:
-                        package_status_over_time[package.package_id].append((departure_time.time(), package.delivery_status))
-                    else:
-                        package_status_over_time[package.package_id] = [(departure_time.time(), package.delivery_status)]
-            
-            # Update package status based on truck location
-            for package in self.packages:
-                package_setup.update_package_status(package.package_id, package.delivery_status, package.delivery_time)
-
-            self.current_location = current_location
-
-            delivery_status = self.print_delivery_status(departure_time, next_delivery, drive_distance, combined_total_distance[0], package_id=current_packages)
-            delivery_process.append(delivery_status)
-            current_locations.append((departure_time, current_location))
-            sleep(.5)
+                # Patch the corrected address into the rest of the route
+                if package_9_has_been_updated:
+                    self.repair_route(old_locations, [self.package_locations[9]] if self.carries_package_9() else [])
+
+            self.deliver_at_stop(next_delivery, departure_time, package_setup, package_status_over_time, combined_total_distance)
+            if self.stop_delay:
+                sleep(self.stop_delay)
         # Calculate return trip to the hub
         if self.current_location != "Western Governors University":
-            return_distance = self.graph.return_to_hub(self.current_location)
-            drive_distance += return_distance
-            combined_total_distance[0] += return_distance
-            return_time = departure_time + timedelta(hours=return_distance / self.speed)
-            # Print return trip status without updating package statuses
-            return_trip_status = self.print_delivery_status(return_time, ['Western Governors University', return_distance], drive_distance, combined_total_distance[0], package_id=None)
-            delivery_process.append(return_trip_status)
-            current_locations.append((return_time, 'Western Governors University'))
+            return_time = self.return_to_hub(departure_time, combined_total_distance)
 
         # Filter out duplicate statuses
-        for package_id, statuses in package_status_over_time.items():
-            seen_statuses = set()
-            unique_statuses = []
-            for time, status in statuses:
-                # Only add unique statuses
-                if status not in seen_statuses:
-                    unique_statuses.append((time, status))
-                    seen_statuses.add(status)
-            # Update the package status over time
-            package_status_over_time[package_id] = unique_statuses
-
-        return [return_time, drive_distance / self.speed, drive_distance, package_9_has_been_updated, delivery_process, current_locations]
+        filter_duplicate_statuses(package_status_over_time)
+
+        return [return_time, self.drive_distance / self.speed, self.drive_distance, package_9_has_been_updated, self.delivery_process, self.current_locations]
+
+    # Get ready to drive the delivery route, leaving the hub at departure_time
+    def begin_route(self, departure_time, package_status_over_time):
+        self.setup_package_status(package_status_over_time, departure_time)
+        # Distance driven, delivery log and (time, location) history for this route
+        self.drive_distance = 0
+        self.delivery_process = []
+        self.current_locations = []
+        self.heading_to = None
+        self.on_board_status = "AT HUB"
+        self.status_pending.clear()
+
+    # Take the next stop off the delivery route, returns the stop and the arrival time
+    def next_stop(self, current_time):
+        next_delivery = self.delivery_route.get()
+        self.heading_to = next_delivery[0]
+        # Record the intermediate waypoints driven through on the way to the next stop
+        self.current_locations.extend(self.waypoints_to(next_delivery[0], current_time))
+        # Update time for the trip
+        time_spent = timedelta(hours=float(next_delivery[1]) / self.speed)
+        return next_delivery, current_time + time_spent
+
+    # Add the distance of the leg to the next stop once the truck gets there
+    def arrive_at_stop(self, next_delivery, combined_total_distance):
+        distance_to_next = float(next_delivery[1])
+        self.drive_distance += distance_to_next  # Increment drive_distance for the truck
+        combined_total_distance[0] += distance_to_next  # Update combined total distance
+
+    # Deliver the packages for the stop and update the status of the packages still on board
+    def deliver_at_stop(self, next_delivery, departure_time, package_setup, package_status_over_time, combined_total_distance):
+        current_location = next_delivery[0]
+        current_packages = self.get_packages_currently_being_delivered(current_location)
+
+        # Deliver the packages for this stop and move the ones on board along, in one batch that
+        # only touches the packages whose status changes
+        stop_event = {"truck_id": self.truck_id, "location": current_location, "from_location": self.current_location, "time": departure_time}
+        changes = package_setup.update_statuses(stop_event)
+        stop_time = departure_time.time()
+        for package, status in changes:
+            package_status_over_time.setdefault(package.package_id, []).append((stop_time, status))
+        # The stop's changes go to the log as one batch
+        if self.status_log is not None and changes:
+            self.status_log.append_batch([package.package_id for package, _ in changes], self.truck_id,
+                                         [status for _, status in changes], departure_time, current_location)
+        for package in current_packages:
+            self.remove_package(package)
+
+        self.current_location = current_location
+
+        delivery_status = self.print_delivery_status(departure_time, next_delivery, self.drive_distance, combined_total_distance[0], package_id=current_packages)
+        self.delivery_process.append(delivery_status)
+        self.current_locations.append((departure_time, current_location))
+
+    # Patch the rest of the route after package locations change instead of building it again
+    # Stops no package on board needs any more are dropped, new stops go where they add the
+    # least distance. Returns the change in miles
+    def repair_route(self, old_locations, new_locations):
+        removed = [location_name for location_name in old_locations if location_name not in self.packages_by_location]
+        self.delivery_nodes.difference_update(removed)
+        self.delivery_nodes.update(new_locations)
+        # A truck between stops can only change the route after the stop it is driving to
+        origin = self.heading_to if self.heading_to is not None else self.current_location
+        mileage_delta = self.graph.repair_route(self.delivery_route, origin, add_nodes=new_locations, remove_nodes=removed)
+        self.report(f"{self.truck_id} route repaired: {mileage_delta:+.2f} miles")
+        return mileage_delta
+
+    # Drive back to the hub from the current location, returns the time the truck gets there
+    def return_to_hub(self, departure_time, combined_total_distance):
+        return_distance = self.graph.return_to_hub(self.current_location)
+        self.current_locations.extend(self.waypoints_to('Western Governors University', departure_time))
+        self.drive_distance += return_distance
+        combined_total_distance[0] += return_distance
+        return_time = departure_time + timedelta(hours=return_distance / self.speed)
+        # Print return trip status without updating package statuses
+        return_trip_status = self.print_delivery_status(return_time, ['Western Governors University', return_distance], self.drive_distance, combined_total_distance[0], package_id=[])
+        self.delivery_process.append(return_trip_status)
+        self.current_locations.append((return_time, 'Western Governors University'))
+        self.current_location = 'Western Governors University'
+        return return_time
+
+    # Get the intermediate waypoints on the shortest path to the next location with their arrival times
+    def waypoints_to(self, next_location, leave_time):
+        waypoints = []
+        path = self.graph.shortest_path(self.current_location, next_location)
+        for previous_location, waypoint in zip(path, path[1:-1]):
+            leave_time += timedelta(hours=self.graph.distance_between(previous_location, waypoint) / self.speed)
+            waypoints.append((leave_time, waypoint))
+        return waypoints
+
+    # Send a progress message to every sink
+    def report(self, message):
+        for sink in self.sinks:
+            sink(message)
 
     # Print the delivery status for the truck
     def print_delivery_status(self, current_time, next_delivery, truck_total_distance, combined_total_distance, package_id):
-        # Get all package IDs on board
-        all_package_ids = self.get_all_packages_on_board()
+        # Get the package IDs on board
+        all_package_ids = self.packages_on_board_text()
         # Extract current package IDs
         current_package_ids = [pkg.package_id for pkg in package_id]  
         # Extract current package locations
@@ -207,7 +313,7 @@ class Truck:
                     f"\tTotal distance traveled by {self.truck_id}: {truck_total_distance:.2f} miles\n"
                     f"\tCombined total distance of all trucks: {combined_total_distance:.2f} miles\n"
                     f"\tUpdated truck packages left: {all_package_ids}\n")
-            print(status)
+            self.report(status)
             return status
         # Print the delivery status for the truck
         elif current_package_ids and current_package_locations:
@@ -216,52 +322,66 @@ class Truck:
                     f"\tTotal distance traveled by {self.truck_id}: {truck_total_distance:.2f} miles\n"
                     f"\tCombined total distance of all trucks: {combined_total_distance:.2f} miles\n"
                     f"\tUpdated truck packages left: {all_package_ids}\n")
-            print(status)
+            self.report(status)
             return status
         return ""
 
     # Setup the package status for the truck
     def setup_package_status(self, package_status_over_time, departure_time):
-        for pkg in self.packages:
+        for pkg in self.on_board.values():
             package_status_over_time[pkg.package_id] = [(departure_time.time(), "AT HUB")]
+        if self.status_log is not None and self.on_board:
+            self.status_log.append_batch(list(self.on_board), self.truck_id, "AT HUB", departure_time, self.current_location)
+
+    # Check if this truck carries package #9 (it is still on board)
+    def carries_package_9(self):
+        return 9 in self.on_board
 
-    # Check if package #9 for Truck 3 should be updated
+    # Check if package #9 on this truck should be updated
     def should_update_package_9(self, current_time, package_9_has_been_updated, dont_ask_to_update_9):
         ten_twenty_am = datetime(2021, 7, 1, 10, 20, 0)
-        return current_time >= ten_twenty_am and not package_9_has_been_updated and self.truck_id == "Truck 3" and not dont_ask_to_update_9
+        return current_time >= ten_twenty_am and not package_9_has_been_updated and not dont_ask_to_update_9 and self.carries_package_9()
 
-    # Update package #9 for Truck 3 to the correct address if user chooses
+    # Update package #9 on the truck that carries it to the correct address if user chooses
     def update_package_9(self, package_setup, current_packages):
-        # Only update package #9 for Truck 3
-        if self.truck_id != "Truck 3":
+        # Only the truck carrying package #9 can update it
+        if not self.carries_package_9():
             return False, False  
-        print("Currently it is 10:20, there is an update to package #9!")
-        print("Correct package #9? Enter 'yes' or 'no'")
-        answer = input(">")
-        while answer not in ("yes", "no"):
-            print("Invalid Response. 'yes' or 'no' correct the address for package #9? Enter 'yes' or 'no'")
+        self.report("Currently it is 10:20, there is an update to package #9!")
+        # Use the scripted answer if there is one, otherwise ask on the console
+        answer = self.decisions.get("package_9") if self.decisions is not None else None
+        if answer is None:
+            print("Correct package #9? Enter 'yes' or 'no'")
             answer = input(">")
+            while answer not in ("yes", "no"):
+                print("Invalid Response. 'yes' or 'no' correct the address for package #9? Enter 'yes' or 'no'")
+                answer = input(">")
         # User decided to update the package # 9
         if answer == "yes":
             # Update the package #9 address
             updated_package = Package(9, "Third District Juvenile Court", "410 S State St", "Salt Lake City", "UT", "84111", "EOD", 5, "AT HUB")
             # Ensure the truck ID is set
             updated_package.truck = self.truck_id 
-            print(f"Inserting updated package: {updated_package}")
+            self.report(f"Inserting updated package: {updated_package}")
             # Update the package in the package_setup.py
             package_setup.update_package(updated_package)
-            print("Package #9's address is now 410 S State St. Salt Lake City, UT 84111.")
+            self.report(f"Package #{updated_package.package_id} has been updated.")
+            self.report("Package #9's address is now 410 S State St. Salt Lake City, UT 84111.")
         # User decided not to update the package # 9
         else:
             updated_package = Package(9, "Council Hall", "300 State St", "Salt Lake City", "UT", "84103", "EOD", 2, "Wrong address listed")
             # Ensure the truck ID is set
             updated_package.truck = self.truck_id
-            print(f"Inserting updated package: {updated_package}")
+            self.report(f"Inserting updated package: {updated_package}")
             # Update the package in the package_setup.py
             package_setup.update_package(updated_package)
-        # Ensure the updated package is added to the truck's package list
-        if updated_package.package_id not in [pkg.package_id for pkg in self.packages]:
-            self.packages.append(updated_package)
-            self.delivery_nodes.add(updated_package.location_name)
-        sleep(1)
+            self.report(f"Package #{updated_package.package_id} has been updated.")
+        # Ensure the updated package is added to the truck's packages
+        if updated_package.package_id not in self.on_board:
+            self.put_on_board(updated_package)
+            self.status_pending.add(updated_package.package_id)
+        # Make sure the truck also stops at the package's (corrected) location
+        self.delivery_nodes.add(updated_package.location_name)
+        if self.update_delay:
+            sleep(self.update_delay)
         return True, False if answer == "yes" else False
\ No newline at end of file